@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, BackgroundTasks, Request, Response, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
 from app.database import get_db
 from app.models.models import KnowledgeDoc, User
 from app.services.auth import get_current_user
+from app.services.knowledge_ingest import knowledge_ingestor, content_hash, INGEST_MAX_URLS
+from app.services.bulk_import import BulkImporter, detect_format, run_import
+from app.services.change_versions import cache_headers, collection_etag, etag_matches, not_modified
 
 router = APIRouter(prefix="/api/knowledge", tags=["Knowledge Base"])
 
@@ -15,6 +19,11 @@ class KnowledgeCreate(BaseModel):
     category: Optional[str] = None
     keywords: Optional[list] = None
 
+class KnowledgeIngest(BaseModel):
+    urls: List[str]
+    category: Optional[str] = None
+    keywords: Optional[list] = None
+
 async def get_authenticated_user(db: Session, authorization: str = None):
     if not authorization:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -25,8 +34,12 @@ async def get_authenticated_user(db: Session, authorization: str = None):
     return user
 
 @router.get("/")
-async def list_knowledge(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def list_knowledge(request: Request, response: Response, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
+    etag = collection_etag(user, "knowledge", request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     docs = db.query(KnowledgeDoc).filter(KnowledgeDoc.user_id == user.id, KnowledgeDoc.is_active == True).all()
     
     return [
@@ -51,7 +64,8 @@ async def create_knowledge(doc_data: KnowledgeCreate, authorization: str = Heade
         content=doc_data.content,
         source_url=doc_data.source_url,
         category=doc_data.category,
-        keywords=doc_data.keywords or []
+        keywords=doc_data.keywords or [],
+        content_hash=content_hash(doc_data.content)
     )
     
     db.add(new_doc)
@@ -60,6 +74,80 @@ async def create_knowledge(doc_data: KnowledgeCreate, authorization: str = Heade
     
     return {"id": new_doc.id, "message": "Knowledge document created successfully"}
 
+@router.post("/import")
+async def import_knowledge(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import documents from an NDJSON or CSV upload.
+    
+    CSV uploads need a header row; keywords are separated by semicolons.
+    """
+    user = await get_authenticated_user(db, authorization)
+    
+    upload_format = detect_format(request.headers.get("content-type"), fmt)
+    if not upload_format:
+        raise HTTPException(status_code=415, detail="Upload must be NDJSON or CSV")
+    
+    def build_row(record: dict) -> dict:
+        if isinstance(record.get("keywords"), str):
+            record["keywords"] = [k.strip() for k in record["keywords"].split(";") if k.strip()]
+        doc_data = KnowledgeCreate(**record)
+        return {
+            "user_id": user.id,
+            "title": doc_data.title,
+            "content": doc_data.content,
+            "source_url": doc_data.source_url,
+            "category": doc_data.category,
+            "keywords": doc_data.keywords or [],
+            "content_hash": content_hash(doc_data.content),
+            "is_active": True,
+            "created_at": datetime.utcnow()
+        }
+    
+    return await run_import(request.stream(), upload_format, BulkImporter(db, KnowledgeDoc), build_row)
+
+@router.post("/ingest")
+async def ingest_urls(
+    ingest_data: KnowledgeIngest,
+    background_tasks: BackgroundTasks,
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    user = await get_authenticated_user(db, authorization)
+    
+    urls = [url.strip() for url in ingest_data.urls if url.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(urls) > INGEST_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {INGEST_MAX_URLS} URLs per request")
+    if any(not url.startswith(("http://", "https://")) for url in urls):
+        raise HTTPException(status_code=400, detail="URLs must start with http:// or https://")
+    
+    job = knowledge_ingestor.create_job(user.id, urls)
+    background_tasks.add_task(
+        knowledge_ingestor.run_job,
+        job["id"],
+        urls,
+        ingest_data.category,
+        ingest_data.keywords
+    )
+    
+    return {"job_id": job["id"], "total": job["total"], "status": job["status"]}
+
+@router.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str, authorization: str = Header(None), db: Session = Depends(get_db)):
+    user = await get_authenticated_user(db, authorization)
+    
+    job = knowledge_ingestor.get_job(job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    
+    return job
+
 @router.delete("/{doc_id}")
 async def delete_knowledge(doc_id: int, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
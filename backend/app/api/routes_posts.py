@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, Query
 from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
+import time
 from app.database import get_db
-from app.models.models import Post, PostStatus, SocialPlatform, User
+from app.models.models import Post, PostMetric, PostStatus, SocialPlatform, SocialAccount, User
 from app.services.auth import get_current_user
 from app.services.ai_generator import AIContentGenerator
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.bulk_import import BulkImporter, detect_format, run_import
+from app.services.change_versions import cache_headers, collection_etag, etag_matches, not_modified
+from app.services.post_stats import count_inserted_posts, user_post_stats
+from app.services.post_archive import post_archiver
+from app.services.trend_relevance import trend_matcher
+from app.services.dedup import duplicate_index, content_signature
+from app.services.tracing import ExecutionTrace
 
 router = APIRouter(prefix="/api/posts", tags=["Posts"])
 
@@ -36,8 +47,29 @@ async def get_authenticated_user(db: Session, authorization: str = None):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+def get_knowledge_context(db: Session, user: User, request: AIGenerateRequest) -> List[str]:
+    if not request.use_knowledge_base:
+        return []
+    from app.models.models import KnowledgeDoc
+    kb_docs = db.query(KnowledgeDoc).filter(
+        KnowledgeDoc.user_id == user.id,
+        KnowledgeDoc.is_active == True
+    ).limit(3).all()
+    return [doc.content for doc in kb_docs]
+
+async def get_trending_context(user_id: int, knowledge_version: int, request: AIGenerateRequest) -> List[str]:
+    if not request.use_trending:
+        return []
+    # Precomputed by the trend refresh job; only rescored here after knowledge base edits
+    return await trend_matcher.topics_for(user_id, knowledge_version)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.get("/")
 async def list_posts(
+    request: Request,
+    response: Response,
     authorization: str = Header(None),
     db: Session = Depends(get_db),
     status: Optional[str] = None,
@@ -45,6 +77,10 @@ async def list_posts(
     limit: int = 50
 ):
     user = await get_authenticated_user(db, authorization)
+    etag = collection_etag(user, "posts", request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     
     query = db.query(Post).filter(Post.user_id == user.id)
     
@@ -70,6 +106,102 @@ async def list_posts(
         for p in posts
     ]
 
+@router.get("/stats")
+async def post_stats(
+    request: Request,
+    response: Response,
+    authorization: str = Header(None),
+    db: Session = Depends(get_db),
+    days: int = 30
+):
+    """Post counts by status, platform and creation day, read from the rollup table."""
+    user = await get_authenticated_user(db, authorization)
+    # The daily window moves at midnight even when no post changed
+    today = datetime.utcnow().date()
+    etag = collection_etag(user, "posts", request, view=f"stats-{today.isoformat()}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+    
+    since = today - timedelta(days=min(max(days, 1), 366) - 1)
+    return user_post_stats(db, user.id, since)
+
+@router.get("/archive")
+async def list_archived_months(authorization: str = Header(None), db: Session = Depends(get_db)):
+    """Months of the user's posts moved out of the database to the archive."""
+    user = await get_authenticated_user(db, authorization)
+    return {"months": post_archiver.archived_months(user.id)}
+
+@router.get("/archive/{month}")
+async def read_archived_posts(month: str, authorization: str = Header(None), db: Session = Depends(get_db)):
+    """The user's archived posts for a "YYYY-MM" month, with their engagement samples, as NDJSON."""
+    user = await get_authenticated_user(db, authorization)
+    
+    lines = post_archiver.read_archive(user.id, month)
+    if lines is None:
+        raise HTTPException(status_code=404, detail="No archived posts for that month")
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@router.get("/executions/slowest")
+async def slowest_executions(
+    authorization: str = Header(None),
+    db: Session = Depends(get_db),
+    hours: int = 24,
+    limit: int = 20
+):
+    """Slowest scheduled executions in the last `hours`, with their stage breakdown."""
+    user = await get_authenticated_user(db, authorization)
+    
+    since = datetime.utcnow() - timedelta(hours=hours)
+    posts = db.query(Post).filter(
+        Post.user_id == user.id,
+        Post.execution_ms.isnot(None),
+        Post.created_at >= since
+    ).order_by(Post.execution_ms.desc()).limit(min(limit, 100)).all()
+    
+    return [
+        {
+            "post_id": p.id,
+            "platform": p.platform.value,
+            "status": p.status.value,
+            "execution_ms": p.execution_ms,
+            "trace": p.execution_trace,
+            "created_at": p.created_at.isoformat()
+        }
+        for p in posts
+    ]
+
+@router.get("/{post_id}/metrics")
+async def post_metrics(
+    post_id: int,
+    authorization: str = Header(None),
+    db: Session = Depends(get_db),
+    limit: int = 500
+):
+    """Engagement samples collected for a published post, oldest first."""
+    user = await get_authenticated_user(db, authorization)
+    
+    post = db.query(Post.id).filter(Post.id == post_id, Post.user_id == user.id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    samples = db.query(PostMetric).filter(PostMetric.post_id == post_id).order_by(
+        PostMetric.collected_at.desc()
+    ).limit(min(limit, 5000)).all()
+    
+    return [
+        {
+            "collected_at": m.collected_at.isoformat(),
+            "impressions": m.impressions,
+            "likes": m.likes,
+            "replies": m.replies,
+            "reposts": m.reposts,
+            "quotes": m.quotes,
+            "bookmarks": m.bookmarks
+        }
+        for m in reversed(samples)
+    ]
+
 @router.post("/")
 async def create_post(
     post_data: PostCreate,
@@ -82,6 +214,7 @@ async def create_post(
         user_id=user.id,
         social_account_id=post_data.social_account_id,
         content=post_data.content,
+        content_signature=content_signature(post_data.content),
         platform=SocialPlatform(post_data.platform),
         status=PostStatus.SCHEDULED if post_data.scheduled_at else PostStatus.DRAFT,
         scheduled_at=datetime.fromisoformat(post_data.scheduled_at) if post_data.scheduled_at else None
@@ -90,9 +223,55 @@ async def create_post(
     db.add(new_post)
     db.commit()
     db.refresh(new_post)
+    duplicate_index.add(new_post)
     
     return {"id": new_post.id, "message": "Post created successfully"}
 
+@router.post("/import")
+async def import_posts(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Bulk import posts from an NDJSON or CSV upload (CSV needs a header row)."""
+    user = await get_authenticated_user(db, authorization)
+    
+    upload_format = detect_format(request.headers.get("content-type"), fmt)
+    if not upload_format:
+        raise HTTPException(status_code=415, detail="Upload must be NDJSON or CSV")
+    
+    account_ids = {
+        row.id for row in db.query(SocialAccount.id).filter(SocialAccount.user_id == user.id)
+    }
+    
+    def build_row(record: dict) -> dict:
+        post_data = PostCreate(**record)
+        if post_data.social_account_id not in account_ids:
+            raise ValueError(f"Unknown social account {post_data.social_account_id}")
+        scheduled_at = datetime.fromisoformat(post_data.scheduled_at) if post_data.scheduled_at else None
+        now = datetime.utcnow()
+        return {
+            "user_id": user.id,
+            "social_account_id": post_data.social_account_id,
+            "content": post_data.content,
+            "content_signature": content_signature(post_data.content),
+            "platform": SocialPlatform(post_data.platform),
+            "status": PostStatus.SCHEDULED if scheduled_at else PostStatus.DRAFT,
+            "scheduled_at": scheduled_at,
+            "ai_generated": False,
+            "created_at": now,
+            "updated_at": now
+        }
+    
+    report = await run_import(request.stream(), upload_format, BulkImporter(db, Post, on_insert=count_inserted_posts), build_row)
+    
+    # Imported rows have no ids here, so rebuild the indexes on next use
+    for account_id in account_ids:
+        duplicate_index.invalidate(account_id)
+    
+    return report
+
 @router.post("/generate")
 async def generate_post(
     request: AIGenerateRequest,
@@ -103,32 +282,86 @@ async def generate_post(
     
     ai_gen = AIContentGenerator()
     
-    knowledge_base = []
-    if request.use_knowledge_base:
-        from app.models.models import KnowledgeDoc
-        kb_docs = db.query(KnowledgeDoc).filter(
-            KnowledgeDoc.user_id == user.id,
-            KnowledgeDoc.is_active == True
-        ).limit(3).all()
-        knowledge_base = [doc.content for doc in kb_docs]
-    
-    trending_topics = []
-    if request.use_trending:
-        from app.services.scraper import WebScraper
-        scraper = WebScraper()
-        trends = await scraper.get_trending_topics()
-        trending_topics = [f"{t['topic']}: {t['description']}" for t in trends[:3]]
-    
-    content = await ai_gen.generate_post(
-        platform=request.platform,
-        knowledge_base=knowledge_base,
-        trending_topics=trending_topics,
-        custom_prompt=request.custom_prompt,
-        tone=request.tone
-    )
+    knowledge_base = get_knowledge_context(db, user, request)
+    user_id, knowledge_version = user.id, user.knowledge_version
+    # Return the pooled connection before the slow awaits below; holding
+    # one per in-flight generation exhausts the pool under bursts
+    db.close()
+    trending_topics = await get_trending_context(user_id, knowledge_version, request)
+    
+    try:
+        content = await ai_gen.generate_post(
+            platform=request.platform,
+            knowledge_base=knowledge_base,
+            trending_topics=trending_topics,
+            custom_prompt=request.custom_prompt,
+            tone=request.tone
+        )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {"content": content, "platform": request.platform}
 
+@router.post("/generate/stream")
+async def generate_post_stream(
+    request: AIGenerateRequest,
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /generate, as server-sent events.
+    
+    Sends a `token` event ({"text": ...}) for each fragment the model
+    produces, then a single `done` event with the assembled content and
+    metadata, or an `error` event if generation fails.
+    """
+    user = await get_authenticated_user(db, authorization)
+    
+    ai_gen = AIContentGenerator()
+    knowledge_base = get_knowledge_context(db, user, request)
+    user_id, knowledge_version = user.id, user.knowledge_version
+    db.close()
+    
+    async def events():
+        started = time.perf_counter()
+        first_token_ms = None
+        parts = []
+        trace = ExecutionTrace()
+        try:
+            # Fetched after the response has started so headers go out immediately
+            trending_topics = await get_trending_context(user_id, knowledge_version, request)
+            async for text in ai_gen.stream_post(
+                platform=request.platform,
+                knowledge_base=knowledge_base,
+                trending_topics=trending_topics,
+                custom_prompt=request.custom_prompt,
+                tone=request.tone,
+                trace=trace
+            ):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        
+        yield sse_event("done", {
+            "content": "".join(parts).strip(),
+            "platform": request.platform,
+            "model": trace.model,
+            "path": trace.llm_paths[-1] if trace.llm_paths else None,
+            "first_token_ms": first_token_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so events reach the client as they're sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.delete("/{post_id}")
 async def delete_post(
     post_id: int,
@@ -141,6 +374,8 @@ async def delete_post(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    duplicate_index.remove(post)
+    db.query(PostMetric).filter(PostMetric.post_id == post.id).delete(synchronize_session=False)
     db.delete(post)
     db.commit()
     
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 from app.database import get_db
-from app.models.models import Schedule, User, FrequencyType, SocialPlatform
+from app.models.models import Schedule, User, FrequencyType, SocialPlatform, Post, PostStatus
 from app.services.auth import get_current_user
 from app.services.scheduler import post_scheduler
+from app.services.dedup import duplicate_index
+from app.services.schedule_slots import schedule_trigger
+from app.services.change_versions import cache_headers, collection_etag, etag_matches, not_modified
 
 router = APIRouter(prefix="/api/schedules", tags=["Schedules"])
 
@@ -19,6 +22,15 @@ class ScheduleCreate(BaseModel):
     use_knowledge_base: bool = True
     content_template: Optional[str] = None
 
+class ScheduleUpdate(BaseModel):
+    name: Optional[str] = None
+    frequency_type: Optional[str] = None
+    frequency_value: Optional[int] = None
+    time_slots: Optional[List[str]] = None
+    use_trending_data: Optional[bool] = None
+    use_knowledge_base: Optional[bool] = None
+    content_template: Optional[str] = None
+
 async def get_authenticated_user(db: Session, authorization: str = None):
     if not authorization:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -28,9 +40,20 @@ async def get_authenticated_user(db: Session, authorization: str = None):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+def validate_timing(frequency_type: str, time_slots: Optional[List[str]]):
+    """Raise 422 unless the values compile into a trigger, so a schedule is never saved without its job."""
+    try:
+        schedule_trigger(frequency_type, time_slots)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid time_slots, expected \"HH:MM\" values: {e}")
+
 @router.get("/")
-async def list_schedules(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def list_schedules(request: Request, response: Response, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
+    etag = collection_etag(user, "schedules", request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     schedules = db.query(Schedule).filter(Schedule.user_id == user.id).all()
     
     return [
@@ -52,11 +75,21 @@ async def list_schedules(authorization: str = Header(None), db: Session = Depend
 async def create_schedule(schedule_data: ScheduleCreate, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
     
+    try:
+        platform = SocialPlatform(schedule_data.platform)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid platform: {schedule_data.platform}")
+    try:
+        frequency_type = FrequencyType(schedule_data.frequency_type)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid frequency_type: {schedule_data.frequency_type}")
+    validate_timing(frequency_type, schedule_data.time_slots)
+    
     new_schedule = Schedule(
         user_id=user.id,
         name=schedule_data.name,
-        platform=SocialPlatform(schedule_data.platform),
-        frequency_type=FrequencyType(schedule_data.frequency_type),
+        platform=platform,
+        frequency_type=frequency_type,
         frequency_value=schedule_data.frequency_value,
         time_slots=schedule_data.time_slots,
         use_trending_data=schedule_data.use_trending_data,
@@ -73,6 +106,30 @@ async def create_schedule(schedule_data: ScheduleCreate, authorization: str = He
     
     return {"id": new_schedule.id, "message": "Schedule created successfully"}
 
+@router.put("/{schedule_id}")
+async def update_schedule(schedule_id: int, schedule_data: ScheduleUpdate, authorization: str = Header(None), db: Session = Depends(get_db)):
+    user = await get_authenticated_user(db, authorization)
+    
+    schedule = db.query(Schedule).filter(Schedule.id == schedule_id, Schedule.user_id == user.id).first()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    
+    updates = schedule_data.model_dump(exclude_unset=True)
+    if "frequency_type" in updates:
+        try:
+            updates["frequency_type"] = FrequencyType(updates["frequency_type"])
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid frequency_type: {updates['frequency_type']}")
+    validate_timing(updates.get("frequency_type", schedule.frequency_type), updates.get("time_slots", schedule.time_slots))
+    for field, value in updates.items():
+        setattr(schedule, field, value)
+    db.commit()
+    
+    # Reschedules the existing job in place; a no-op unless timing changed
+    post_scheduler.add_schedule(schedule.id, user.id)
+    
+    return {"id": schedule.id, "message": "Schedule updated successfully"}
+
 @router.put("/{schedule_id}/toggle")
 async def toggle_schedule(schedule_id: int, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
@@ -100,6 +157,12 @@ async def delete_schedule(schedule_id: int, authorization: str = Header(None), d
         raise HTTPException(status_code=404, detail="Schedule not found")
     
     post_scheduler.remove_schedule(schedule.id)
+    
+    # Unclaimed pre-generated drafts have no slot left to fill
+    for draft in db.query(Post).filter(Post.schedule_id == schedule.id, Post.status == PostStatus.DRAFT).all():
+        duplicate_index.remove(draft)
+        db.delete(draft)
+    db.query(Post).filter(Post.schedule_id == schedule.id).update({Post.schedule_id: None})
     db.delete(schedule)
     db.commit()
     
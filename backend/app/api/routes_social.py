@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from datetime import datetime, timedelta
 from app.database import get_db
 from app.models.models import SocialAccount, User, SocialPlatform
 from app.services.auth import get_current_user
+from app.services.change_versions import cache_headers, collection_etag, etag_matches, not_modified
 from app.integrations.twitter import get_twitter_oauth_url, handle_twitter_callback
 from app.integrations.tiktok import get_tiktok_oauth_url, exchange_tiktok_code
 
@@ -26,8 +28,12 @@ async def get_authenticated_user(db: Session, authorization: str = None):
     return user
 
 @router.get("/")
-async def list_accounts(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def list_accounts(request: Request, response: Response, authorization: str = Header(None), db: Session = Depends(get_db)):
     user = await get_authenticated_user(db, authorization)
+    etag = collection_etag(user, "social", request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     accounts = db.query(SocialAccount).filter(SocialAccount.user_id == user.id).all()
     
     return [
@@ -93,15 +99,21 @@ async def tiktok_callback(callback: TikTokCallback, authorization: str = Header(
         SocialAccount.platform == SocialPlatform.TIKTOK
     ).first()
     
+    token_expires_at = None
+    if result.get("expires_in"):
+        token_expires_at = datetime.utcnow() + timedelta(seconds=int(result["expires_in"]))
+    
     if account:
         account.access_token = result["access_token"]
         account.refresh_token = result["refresh_token"]
+        account.token_expires_at = token_expires_at
     else:
         account = SocialAccount(
             user_id=user.id,
             platform=SocialPlatform.TIKTOK,
             access_token=result["access_token"],
-            refresh_token=result["refresh_token"]
+            refresh_token=result["refresh_token"],
+            token_expires_at=token_expires_at
         )
         db.add(account)
     
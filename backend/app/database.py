@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -13,6 +13,21 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def init_db():
+    """Create any missing tables. Run at startup rather than at import time."""
+    # Register every model on Base.metadata before creating tables
+    import app.models.models  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+
+def check_db() -> bool:
+    """True if the database answers a trivial query."""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
 def get_db():
     db = SessionLocal()
     try:
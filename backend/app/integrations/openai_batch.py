@@ -0,0 +1,88 @@
+import httpx
+from typing import Optional
+import os
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+class OpenAIBatchClient:
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Client for the OpenAI Batch API (file upload, batch create/poll, result download).
+
+        The pinned openai SDK predates batches, so this talks to the HTTP API
+        directly. Any service exposing the same endpoints works via OPENAI_BASE_URL.
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = OPENAI_BASE_URL.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {self.api_key}"}
+
+    async def submit(self, requests_jsonl: bytes, endpoint: str = "/v1/chat/completions") -> dict:
+        """
+        Upload a JSONL file of requests and start a batch over it.
+
+        Returns:
+            dict with batch_id, input_file_id and status
+        """
+        try:
+            async with httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=120.0) as client:
+                upload = await client.post(
+                    "/files",
+                    data={"purpose": "batch"},
+                    files={"file": ("batch.jsonl", requests_jsonl, "application/jsonl")}
+                )
+                if upload.status_code != 200:
+                    return {"success": False, "error": f"File upload failed: {upload.text}"}
+                input_file_id = upload.json()["id"]
+
+                response = await client.post("/batches", json={
+                    "input_file_id": input_file_id,
+                    "endpoint": endpoint,
+                    "completion_window": "24h"
+                })
+                if response.status_code != 200:
+                    return {"success": False, "error": f"Batch creation failed: {response.text}"}
+
+                data = response.json()
+                return {
+                    "success": True,
+                    "batch_id": data["id"],
+                    "input_file_id": input_file_id,
+                    "status": data.get("status")
+                }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_batch(self, batch_id: str) -> dict:
+        """
+        Fetch the current state of a batch.
+
+        Returns:
+            dict with status, output_file_id, error_file_id and request_counts
+        """
+        try:
+            async with httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=30.0) as client:
+                response = await client.get(f"/batches/{batch_id}")
+                if response.status_code != 200:
+                    return {"success": False, "error": response.text}
+
+                data = response.json()
+                return {
+                    "success": True,
+                    "status": data.get("status"),
+                    "output_file_id": data.get("output_file_id"),
+                    "error_file_id": data.get("error_file_id"),
+                    "request_counts": data.get("request_counts") or {}
+                }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_file_content(self, file_id: str) -> dict:
+        """Download a result file; returns dict with its text content."""
+        try:
+            async with httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=120.0) as client:
+                response = await client.get(f"/files/{file_id}/content")
+                if response.status_code != 200:
+                    return {"success": False, "error": response.text}
+                return {"success": True, "content": response.text}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
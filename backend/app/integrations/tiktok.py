@@ -1,6 +1,25 @@
 import httpx
 from typing import Optional
 import os
+import time
+from app.services.circuit_breaker import circuit_breakers, http_check
+
+TIKTOK_API_BASE_URL = os.getenv("TIKTOK_API_BASE_URL", "https://open.tiktokapis.com/v2")
+
+tiktok_breaker = circuit_breakers.register("tiktok", lambda: http_check(TIKTOK_API_BASE_URL), slow_call_seconds=10.0)
+
+async def _request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a TikTok API request behind the TikTok circuit breaker; 4xx doesn't count against it."""
+    tiktok_breaker.check()
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.request(method, url, **kwargs)
+    except Exception as e:
+        tiktok_breaker.record(False, time.perf_counter() - started, str(e))
+        raise
+    tiktok_breaker.record(response.status_code < 500, time.perf_counter() - started, f"HTTP {response.status_code}")
+    return response
 
 class TikTokClient:
     def __init__(self, access_token: str):
@@ -13,7 +32,7 @@ class TikTokClient:
         - Approved for Content Posting API access
         """
         self.access_token = access_token
-        self.base_url = "https://open.tiktokapis.com/v2"
+        self.base_url = TIKTOK_API_BASE_URL
     
     async def post_video(
         self,
@@ -53,26 +72,26 @@ class TikTokClient:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/post/publish/video/init/",
-                    headers=headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "success": True,
-                        "publish_id": data.get("data", {}).get("publish_id"),
-                        "upload_url": data.get("data", {}).get("upload_url")
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": response.text
-                    }
+            response = await _request(
+                "POST",
+                f"{self.base_url}/post/publish/video/init/",
+                headers=headers,
+                json=payload,
+                timeout=30.0
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    "success": True,
+                    "publish_id": data.get("data", {}).get("publish_id"),
+                    "upload_url": data.get("data", {}).get("upload_url")
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": response.text
+                }
         except Exception as e:
             return {
                 "success": False,
@@ -86,24 +105,24 @@ class TikTokClient:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/user/info/",
-                    headers=headers,
-                    params={"fields": "open_id,union_id,avatar_url,display_name"},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    user_data = data.get("data", {}).get("user", {})
-                    return {
-                        "id": user_data.get("open_id"),
-                        "username": user_data.get("display_name"),
-                        "avatar_url": user_data.get("avatar_url")
-                    }
-                else:
-                    return {"error": response.text}
+            response = await _request(
+                "GET",
+                f"{self.base_url}/user/info/",
+                headers=headers,
+                params={"fields": "open_id,union_id,avatar_url,display_name"},
+                timeout=10.0
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                user_data = data.get("data", {}).get("user", {})
+                return {
+                    "id": user_data.get("open_id"),
+                    "username": user_data.get("display_name"),
+                    "avatar_url": user_data.get("avatar_url")
+                }
+            else:
+                return {"error": response.text}
         except Exception as e:
             return {"error": str(e)}
 
@@ -144,22 +163,59 @@ async def exchange_tiktok_code(code: str) -> dict:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://open.tiktokapis.com/v2/oauth/token/",
-                json=payload,
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "access_token": data.get("access_token"),
-                    "refresh_token": data.get("refresh_token"),
-                    "expires_in": data.get("expires_in"),
-                    "token_type": data.get("token_type")
-                }
-            else:
-                return {"error": response.text}
+        response = await _request(
+            "POST",
+            f"{TIKTOK_API_BASE_URL}/oauth/token/",
+            json=payload,
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "access_token": data.get("access_token"),
+                "refresh_token": data.get("refresh_token"),
+                "expires_in": data.get("expires_in"),
+                "token_type": data.get("token_type")
+            }
+        else:
+            return {"error": response.text}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def refresh_tiktok_token(refresh_token: str) -> dict:
+    """
+    Exchange a refresh token for a new access token.
+    """
+    client_key = os.getenv("TIKTOK_CLIENT_KEY")
+    client_secret = os.getenv("TIKTOK_CLIENT_SECRET")
+    
+    payload = {
+        "client_key": client_key,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token
+    }
+    
+    try:
+        response = await _request(
+            "POST",
+            f"{TIKTOK_API_BASE_URL}/oauth/token/",
+            data=payload,
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if not data.get("access_token"):
+                return {"error": data.get("error_description") or response.text}
+            return {
+                "access_token": data.get("access_token"),
+                "refresh_token": data.get("refresh_token"),
+                "expires_in": data.get("expires_in"),
+                "token_type": data.get("token_type")
+            }
+        else:
+            return {"error": response.text}
     except Exception as e:
         return {"error": str(e)}
@@ -1,6 +1,41 @@
-import tweepy
 from typing import Optional, List
+import asyncio
 import os
+import time
+from app.services.circuit_breaker import circuit_breakers, http_check
+
+# tweepy (and requests under it) is imported inside the functions that use
+# it, so importing this module doesn't slow down app startup.
+
+TWITTER_API_HOST = "https://api.twitter.com"
+# Point at a local stand-in for load tests; unset in production
+TWITTER_API_BASE_URL = os.getenv("TWITTER_API_BASE_URL")
+# GET /2/tweets accepts up to 100 ids; its rate limits reset every 15 minutes
+TWEET_LOOKUP_MAX_IDS = 100
+TWITTER_RATE_LIMIT_WINDOW_SECONDS = 900
+
+# Publicly readable, so the probe needs no credentials
+twitter_breaker = circuit_breakers.register(
+    "twitter",
+    lambda: http_check(f"{(TWITTER_API_BASE_URL or TWITTER_API_HOST).rstrip('/')}/2/openapi.json"),
+    slow_call_seconds=10.0
+)
+
+def _is_client_error(error: Exception) -> bool:
+    """4xx responses reflect the request or account, not Twitter's health."""
+    from tweepy.errors import HTTPException, TwitterServerError
+    return isinstance(error, HTTPException) and not isinstance(error, TwitterServerError)
+
+def _rebase_adapter():
+    """Transport adapter that rewrites api.twitter.com requests onto TWITTER_API_BASE_URL."""
+    from requests.adapters import HTTPAdapter
+    
+    class RebaseAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = TWITTER_API_BASE_URL.rstrip("/") + request.url[len(TWITTER_API_HOST):]
+            return super().send(request, **kwargs)
+    
+    return RebaseAdapter()
 
 class TwitterClient:
     def __init__(self, access_token: str, access_token_secret: str):
@@ -18,12 +53,15 @@ class TwitterClient:
         self.access_token_secret = access_token_secret
         
         # Initialize Tweepy client
+        import tweepy
         self.client = tweepy.Client(
             consumer_key=self.api_key,
             consumer_secret=self.api_secret,
             access_token=self.access_token,
             access_token_secret=self.access_token_secret
         )
+        if TWITTER_API_BASE_URL:
+            self.client.session.mount(TWITTER_API_HOST, _rebase_adapter())
     
     async def post_tweet(self, text: str, media_ids: Optional[List[str]] = None) -> dict:
         """
@@ -37,7 +75,8 @@ class TwitterClient:
             dict with tweet_id and tweet_url
         """
         try:
-            response = self.client.create_tweet(
+            response = await self._call(
+                self.client.create_tweet,
                 text=text,
                 media_ids=media_ids
             )
@@ -56,8 +95,54 @@ class TwitterClient:
                 "error": str(e)
             }
     
+    async def get_tweet_metrics(self, tweet_ids: List[str]) -> dict:
+        """
+        Look up public engagement metrics for up to TWEET_LOOKUP_MAX_IDS tweets.
+
+        Returns:
+            dict with metrics per tweet id and the ids Twitter no longer returns
+            (deleted or protected); on a 429, rate_limited_until as a Unix time
+        """
+        import tweepy
+        try:
+            response = await self._call(
+                self.client.get_tweets,
+                tweet_ids[:TWEET_LOOKUP_MAX_IDS],
+                tweet_fields=["public_metrics"],
+                user_auth=True
+            )
+        except tweepy.errors.TooManyRequests as e:
+            reset = e.response.headers.get("x-rate-limit-reset")
+            return {
+                "success": False,
+                "error": str(e),
+                "rate_limited_until": float(reset) if reset else time.time() + TWITTER_RATE_LIMIT_WINDOW_SECONDS
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        metrics = {str(tweet.id): tweet.public_metrics or {} for tweet in response.data or []}
+        return {
+            "success": True,
+            "metrics": metrics,
+            "missing": [tweet_id for tweet_id in tweet_ids[:TWEET_LOOKUP_MAX_IDS] if tweet_id not in metrics]
+        }
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run a blocking tweepy call off the event loop, behind the Twitter circuit breaker."""
+        twitter_breaker.check()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            twitter_breaker.record(_is_client_error(e), time.perf_counter() - started, str(e))
+            raise
+        twitter_breaker.record(True, time.perf_counter() - started)
+        return result
+    
     async def upload_media(self, media_path: str) -> Optional[str]:
         """Upload media and return media_id."""
+        import tweepy
         try:
             # For media upload, we need API v1.1 with OAuth 1.0a
             auth = tweepy.OAuth1UserHandler(
@@ -68,7 +153,7 @@ class TwitterClient:
             )
             api = tweepy.API(auth)
             
-            media = api.media_upload(media_path)
+            media = await self._call(api.media_upload, media_path)
             return media.media_id_string
         except Exception as e:
             print(f"Media upload failed: {e}")
@@ -77,7 +162,7 @@ class TwitterClient:
     async def get_user_info(self) -> dict:
         """Get authenticated user's info."""
         try:
-            user = self.client.get_me()
+            user = await self._call(self.client.get_me)
             return {
                 "id": user.data.id,
                 "username": user.data.username,
@@ -92,6 +177,7 @@ def get_twitter_oauth_url() -> str:
     Generate Twitter OAuth URL for user authorization.
     User should call this to start the OAuth flow.
     """
+    import tweepy
     api_key = os.getenv("TWITTER_API_KEY")
     api_secret = os.getenv("TWITTER_API_SECRET")
     callback_url = os.getenv("TWITTER_CALLBACK_URL", "http://localhost:3000/auth/twitter/callback")
@@ -108,6 +194,7 @@ def handle_twitter_callback(oauth_token: str, oauth_verifier: str) -> dict:
     """
     Handle Twitter OAuth callback and exchange for access tokens.
     """
+    import tweepy
     api_key = os.getenv("TWITTER_API_KEY")
     api_secret = os.getenv("TWITTER_API_SECRET")
     
@@ -1,14 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from app.database import init_db, check_db
 from app.api import routes_auth, routes_posts, routes_schedules, routes_knowledge, routes_social
 from app.services.scheduler import post_scheduler
+from app.services.metrics import HTTP_REQUEST_SECONDS
+from app.services.circuit_breaker import circuit_breakers
+from app.services.post_stats import backfill_post_stats
+from app.services.post_archive import post_archiver
+import asyncio
 import logging
+import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-Base.metadata.create_all(bind=engine)
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
 
 app = FastAPI(title="Posting Agent API", version="1.0.0")
 
@@ -20,21 +28,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=str(status)
+        ).observe(time.perf_counter() - started)
+
 app.include_router(routes_auth.router)
 app.include_router(routes_posts.router)
 app.include_router(routes_schedules.router)
 app.include_router(routes_knowledge.router)
 app.include_router(routes_social.router)
 
+async def initialize():
+    """Create the schema, start the scheduler and load schedules, retrying until the database is reachable."""
+    while True:
+        try:
+            await asyncio.to_thread(init_db)
+            break
+        except Exception as e:
+            logger.error(f"Database initialization failed, retrying in {STARTUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+    
+    # Before the scheduler starts writing posts
+    await asyncio.to_thread(post_archiver.ensure_partitions)
+    await asyncio.to_thread(backfill_post_stats)
+    post_scheduler.start()
+    await asyncio.to_thread(post_scheduler.load_schedules)
+    app.state.initialized = True
+    logger.info("Posting Agent API ready")
+    await post_scheduler.catch_up_missed_runs()
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Posting Agent API")
-    post_scheduler.start()
-    logger.info("Scheduler started")
+    # Initialize in the background so /health answers immediately;
+    # /ready reports when the app can take traffic.
+    app.state.initialized = False
+    app.state.init_task = asyncio.create_task(initialize())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Posting Agent API")
+    app.state.init_task.cancel()
     post_scheduler.shutdown()
 
 @app.get("/")
@@ -43,4 +90,33 @@ async def root():
 
 @app.get("/health")
 async def health():
+    """Liveness: the process is up and serving. Checks no dependencies."""
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness: schema created, scheduler running and database reachable."""
+    checks = {
+        "initialized": getattr(app.state, "initialized", False),
+        "scheduler": post_scheduler.running,
+        "database": await asyncio.to_thread(check_db)
+    }
+    is_ready = all(checks.values())
+    if not is_ready:
+        response.status_code = 503
+    return {"status": "ready" if is_ready else "not ready", "checks": checks}
+
+@app.get("/health/dependencies")
+async def dependencies():
+    """
+    Circuit breaker state for each external dependency.
+    
+    Informational: an open breaker degrades features but doesn't fail /ready,
+    since taking instances out of rotation wouldn't bring the dependency back.
+    """
+    return circuit_breakers.snapshot()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    post_scheduler.update_metrics()
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Index, JSON, Enum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
-from app.database import Base
+from app.database import Base, engine
+
+# On PostgreSQL posts is range-partitioned by month on created_at, which then
+# has to be part of the table's primary key; SQLite keeps a plain table
+POSTS_PARTITIONED = engine.dialect.name == "postgresql"
 
 class User(Base):
     __tablename__ = "users"
@@ -14,6 +18,12 @@ class User(Base):
     full_name = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever the user's posts, schedules, knowledge docs or social
+    # accounts change; list endpoints derive their ETags from these
+    posts_version = Column(Integer, default=0, nullable=False)
+    schedules_version = Column(Integer, default=0, nullable=False)
+    knowledge_version = Column(Integer, default=0, nullable=False)
+    social_version = Column(Integer, default=0, nullable=False)
     
     social_accounts = relationship("SocialAccount", back_populates="user")
     posts = relationship("Post", back_populates="user")
@@ -49,11 +59,19 @@ class PostStatus(str, enum.Enum):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"} if POSTS_PARTITIONED else {}
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # Posts are still identified by id alone, whatever the table's key
+    __mapper_args__ = {"primary_key": [id]}
     user_id = Column(Integer, ForeignKey("users.id"))
     social_account_id = Column(Integer, ForeignKey("social_accounts.id"))
+    schedule_id = Column(Integer, ForeignKey("schedules.id"), index=True)  # Set on drafts pre-generated for a schedule slot
     content = Column(Text, nullable=False)
+    content_signature = Column(JSON)  # MinHash LSH band keys, for near-duplicate checks
     media_urls = Column(JSON)  # List of media URLs
     platform = Column(Enum(SocialPlatform), nullable=False)
     status = Column(Enum(PostStatus), default=PostStatus.DRAFT)
@@ -64,12 +82,41 @@ class Post(Base):
     error_message = Column(Text)
     ai_generated = Column(Boolean, default=False)
     generation_prompt = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    execution_ms = Column(Integer, index=True)  # Wall time of the scheduled execution that produced this post
+    execution_trace = Column(JSON)  # Stage timings and token usage for that execution
+    metrics_next_at = Column(DateTime, index=True)  # When engagement is next collected; None once no longer polled
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=POSTS_PARTITIONED)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="posts")
     social_account = relationship("SocialAccount", back_populates="posts")
 
+class PostMetric(Base):
+    __tablename__ = "post_metrics"
+    
+    # One narrow row per collection; the composite key doubles as the time-series index.
+    # No foreign key: a partitioned posts table has no unique constraint on id alone,
+    # and archived posts take their samples with them
+    post_id = Column(Integer, primary_key=True)
+    collected_at = Column(DateTime, primary_key=True)
+    impressions = Column(Integer)
+    likes = Column(Integer)
+    replies = Column(Integer)
+    reposts = Column(Integer)
+    quotes = Column(Integer)
+    bookmarks = Column(Integer)
+
+class PostStat(Base):
+    __tablename__ = "post_stats"
+    
+    # Post counts per user, creation day, platform and status, kept current on
+    # every post write; the all-time row per user uses day 0001-01-01
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    platform = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    post_count = Column(Integer, nullable=False, default=0)
+
 class FrequencyType(str, enum.Enum):
     HOURLY = "hourly"
     DAILY = "daily"
@@ -91,10 +138,27 @@ class Schedule(Base):
     use_knowledge_base = Column(Boolean, default=True)
     content_template = Column(Text)
     last_run = Column(DateTime)
+    # Next fire time for the database scheduling engine; NULL while inactive
+    next_run_at = Column(DateTime, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="schedules")
 
+class GenerationBatch(Base):
+    __tablename__ = "generation_batches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    provider_batch_id = Column(String, index=True, nullable=False)
+    input_file_id = Column(String)
+    output_file_id = Column(String)
+    status = Column(String, index=True)  # Provider status: validating, in_progress, completed, failed, ...
+    request_count = Column(Integer, default=0)
+    created_count = Column(Integer, default=0)  # Draft posts stored from the results
+    slot_keys = Column(JSON)  # "<schedule_id>:<slot iso time>" for every request in the batch
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    completed_at = Column(DateTime)
+
 class KnowledgeDoc(Base):
     __tablename__ = "knowledge_docs"
     
@@ -102,10 +166,11 @@ class KnowledgeDoc(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    source_url = Column(String)
+    source_url = Column(String, index=True)
     file_url = Column(String)
     category = Column(String)
     keywords = Column(JSON)  # List of keywords for context matching
+    content_hash = Column(String(64), index=True)  # SHA-256 of normalized content, for dedup
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
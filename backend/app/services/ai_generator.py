@@ -1,12 +1,12 @@
-from openai import OpenAI
-import os
-from typing import List, Optional
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from typing import AsyncIterator, List, Optional
+from app.services.tracing import ExecutionTrace
+from app.services.llm_policy import generation_policy
+from app.services.circuit_breaker import CircuitOpenError
 
 class AIContentGenerator:
     def __init__(self):
-        self.model = "gpt-4o-mini"
+        self.policy = generation_policy
+        self.model = self.policy.model
     
     async def generate_post(
         self,
@@ -14,7 +14,8 @@ class AIContentGenerator:
         knowledge_base: Optional[List[str]] = None,
         trending_topics: Optional[List[str]] = None,
         custom_prompt: Optional[str] = None,
-        tone: str = "professional"
+        tone: str = "professional",
+        trace: Optional[ExecutionTrace] = None
     ) -> str:
         """
         Generate social media post content using AI.
@@ -25,7 +26,78 @@ class AIContentGenerator:
             trending_topics: List of trending topic descriptions
             custom_prompt: User's custom instructions
             tone: Tone of the post (professional, casual, funny, etc.)
+            trace: Optional execution trace to record token usage on
+        """
+        messages = self.build_messages(platform, knowledge_base, trending_topics, custom_prompt, tone)
+        
+        try:
+            response, path = await self.policy.complete(
+                messages=messages,
+                temperature=0.8,
+                max_tokens=500
+            )
+            
+            if trace:
+                trace.record_usage(response.model, response.usage, path)
+            
+            return response.choices[0].message.content.strip()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise Exception(f"AI generation failed: {str(e)}")
+    
+    async def stream_post(
+        self,
+        platform: str,
+        knowledge_base: Optional[List[str]] = None,
+        trending_topics: Optional[List[str]] = None,
+        custom_prompt: Optional[str] = None,
+        tone: str = "professional",
+        trace: Optional[ExecutionTrace] = None
+    ) -> AsyncIterator[str]:
+        """
+        Same as generate_post, but yields content fragments as the model produces them.
+        
+        The winning model and policy path are recorded on `trace` once the
+        first fragment arrives.
         """
+        messages = self.build_messages(platform, knowledge_base, trending_topics, custom_prompt, tone)
+        
+        try:
+            first_chunk, stream, path = await self.policy.open_stream(
+                messages=messages,
+                temperature=0.8,
+                max_tokens=500
+            )
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise Exception(f"AI generation failed: {str(e)}")
+        
+        if trace:
+            trace.record_usage(first_chunk.model, None, path)
+        
+        try:
+            if self._delta(first_chunk):
+                yield self._delta(first_chunk)
+            async for chunk in stream:
+                if self._delta(chunk):
+                    yield self._delta(chunk)
+        finally:
+            await stream.response.aclose()
+    
+    def _delta(self, chunk) -> Optional[str]:
+        return chunk.choices[0].delta.content if chunk.choices else None
+    
+    def build_messages(
+        self,
+        platform: str,
+        knowledge_base: Optional[List[str]],
+        trending_topics: Optional[List[str]],
+        custom_prompt: Optional[str],
+        tone: str
+    ) -> List[dict]:
+        """Build the system and user messages for a post generation request."""
         # Build context from knowledge base
         kb_context = ""
         if knowledge_base:
@@ -64,20 +136,10 @@ Guidelines:
 
 Generate only the post content, no explanations."""
         
-        try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=500
-            )
-            
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            raise Exception(f"AI generation failed: {str(e)}")
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
     
     async def generate_multiple_posts(
         self,
@@ -102,8 +164,7 @@ Feedback: {feedback}
 Please improve the post based on the feedback. Return only the improved post."""
         
         try:
-            response = client.chat.completions.create(
-                model=self.model,
+            response, _ = await self.policy.complete(
                 messages=[
                     {"role": "system", "content": "You are a social media content editor."},
                     {"role": "user", "content": prompt}
@@ -113,5 +174,7 @@ Please improve the post based on the feedback. Return only the improved post."""
             )
             
             return response.choices[0].message.content.strip()
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise Exception(f"Post improvement failed: {str(e)}")
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.models import GenerationBatch, KnowledgeDoc, Post, PostStatus, Schedule, SocialAccount
+from app.integrations.openai_batch import OpenAIBatchClient
+from app.services.ai_generator import AIContentGenerator
+from app.services.dedup import duplicate_index, content_signature
+from app.services.schedule_slots import upcoming_slots
+from app.services.trend_relevance import trend_matcher
+
+logger = logging.getLogger(__name__)
+
+BATCH_PREGEN_ENABLED = os.getenv("BATCH_PREGEN_ENABLED", "false").lower() == "true"
+BATCH_PREGEN_INTERVAL_MINUTES = int(os.getenv("BATCH_PREGEN_INTERVAL_MINUTES", "30"))
+# Slots closer than this are left to live generation; batches can take hours
+BATCH_PREGEN_MIN_LEAD_HOURS = float(os.getenv("BATCH_PREGEN_MIN_LEAD_HOURS", "2"))
+BATCH_PREGEN_HORIZON_HOURS = float(os.getenv("BATCH_PREGEN_HORIZON_HOURS", "26"))
+BATCH_PREGEN_MAX_REQUESTS = int(os.getenv("BATCH_PREGEN_MAX_REQUESTS", "10000"))
+# How far a slot's fire time may drift from the draft's scheduled_at and still claim it
+BATCH_PREGEN_MATCH_WINDOW_MINUTES = int(os.getenv("BATCH_PREGEN_MATCH_WINDOW_MINUTES", "10"))
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+PATH_BATCH = "batch"
+
+def slot_key(schedule_id: int, slot: datetime) -> str:
+    return f"{schedule_id}:{slot.isoformat()}"
+
+def parse_slot_key(key: str) -> Tuple[int, datetime]:
+    schedule_id, slot = key.split(":", 1)
+    return int(schedule_id), datetime.fromisoformat(slot)
+
+class BatchPregenerator:
+    def __init__(self, client: Optional[OpenAIBatchClient] = None):
+        """
+        Pre-generates content for upcoming schedule slots through the Batch API.
+
+        Each run collects finished batches into draft posts, then submits one
+        batch covering every slot between the minimum lead and the horizon that
+        hasn't been submitted yet. When a slot fires, the scheduler claims its
+        draft instead of calling the model; slots without one fall back to live
+        generation as before.
+        """
+        self.client = client or OpenAIBatchClient()
+        self.ai_generator = AIContentGenerator()
+
+    async def run(self):
+        """Collect finished batches, then submit newly uncovered slots."""
+        await self.collect()
+        await self.submit()
+
+    async def submit(self) -> Optional[int]:
+        """
+        Submit one batch for upcoming slots not covered by a draft or earlier batch.
+
+        Returns:
+            GenerationBatch id, or None if there was nothing to submit
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            start = now + timedelta(hours=BATCH_PREGEN_MIN_LEAD_HOURS)
+            end = now + timedelta(hours=BATCH_PREGEN_HORIZON_HOURS)
+            covered = self._covered_slots(db, now, start, end)
+
+            lines: List[str] = []
+            keys: List[str] = []
+            knowledge: Dict[int, List[str]] = {}
+
+            schedules = db.query(Schedule).filter(Schedule.is_active == True).order_by(Schedule.id).yield_per(500)
+            for schedule in schedules:
+                slots = [slot for slot in upcoming_slots(schedule, start, end) if slot_key(schedule.id, slot) not in covered]
+                if not slots:
+                    continue
+
+                # Context is gathered once per run and shared by every request in the batch
+                knowledge_base = []
+                if schedule.use_knowledge_base:
+                    if schedule.user_id not in knowledge:
+                        kb_docs = db.query(KnowledgeDoc.content).filter(
+                            KnowledgeDoc.user_id == schedule.user_id,
+                            KnowledgeDoc.is_active == True
+                        ).limit(3).all()
+                        knowledge[schedule.user_id] = [doc.content for doc in kb_docs]
+                    knowledge_base = knowledge[schedule.user_id]
+
+                topics = []
+                if schedule.use_trending_data:
+                    topics = await trend_matcher.topics_for(schedule.user_id, schedule.user.knowledge_version)
+
+                body = {
+                    "model": self.ai_generator.model,
+                    "messages": self.ai_generator.build_messages(
+                        schedule.platform.value, knowledge_base, topics, schedule.content_template, "professional"
+                    ),
+                    "temperature": 0.8,
+                    "max_tokens": 500
+                }
+                for slot in slots:
+                    key = slot_key(schedule.id, slot)
+                    lines.append(json.dumps({"custom_id": key, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+                    keys.append(key)
+
+                if len(keys) >= BATCH_PREGEN_MAX_REQUESTS:
+                    break
+
+            if not keys:
+                return None
+
+            result = await self.client.submit("\n".join(lines).encode())
+            if not result["success"]:
+                logger.error(f"Failed to submit generation batch of {len(keys)} requests: {result['error']}")
+                return None
+
+            batch = GenerationBatch(
+                provider_batch_id=result["batch_id"],
+                input_file_id=result["input_file_id"],
+                status=result["status"],
+                request_count=len(keys),
+                slot_keys=keys
+            )
+            db.add(batch)
+            db.commit()
+            logger.info(f"Submitted generation batch {batch.id} ({batch.provider_batch_id}) with {len(keys)} requests")
+            return batch.id
+        finally:
+            db.close()
+
+    async def collect(self) -> int:
+        """
+        Poll unfinished batches and store the results of finished ones as drafts.
+
+        Returns:
+            Number of draft posts created
+        """
+        db = SessionLocal()
+        created = 0
+        try:
+            batches = db.query(GenerationBatch).filter(GenerationBatch.status.notin_(TERMINAL_STATUSES)).all()
+            for batch in batches:
+                info = await self.client.get_batch(batch.provider_batch_id)
+                if not info["success"]:
+                    logger.error(f"Failed to poll generation batch {batch.id}: {info['error']}")
+                    continue
+
+                batch.status = info["status"]
+                if batch.status in TERMINAL_STATUSES:
+                    batch.completed_at = datetime.utcnow()
+                    # Expired and cancelled batches still return their finished requests
+                    if info["output_file_id"]:
+                        batch.output_file_id = info["output_file_id"]
+                        output = await self.client.get_file_content(info["output_file_id"])
+                        if output["success"]:
+                            batch.created_count = await self._store_results(db, batch, output["content"])
+                            created += batch.created_count
+                        else:
+                            batch.error = output["error"]
+                    logger.info(f"Generation batch {batch.id} {batch.status}: {batch.created_count} drafts from {batch.request_count} requests")
+                db.commit()
+            return created
+        finally:
+            db.close()
+
+    def claim_draft(self, schedule: Schedule, social_account: SocialAccount, db: Session) -> Optional[Post]:
+        """Take the pre-generated draft for a slot firing now, marking it scheduled."""
+        now = datetime.utcnow()
+        window = timedelta(minutes=BATCH_PREGEN_MATCH_WINDOW_MINUTES)
+        post = db.query(Post).filter(
+            Post.schedule_id == schedule.id,
+            Post.status == PostStatus.DRAFT,
+            Post.ai_generated == True,
+            Post.scheduled_at >= now - window,
+            Post.scheduled_at <= now + window
+        ).order_by(Post.scheduled_at).first()
+        if post is None:
+            return None
+
+        post.status = PostStatus.SCHEDULED
+        post.social_account_id = social_account.id
+        db.commit()
+        return post
+
+    def _covered_slots(self, db: Session, now: datetime, start: datetime, end: datetime) -> Set[str]:
+        """Slots that already have a draft or were submitted in a recent batch."""
+        covered = set()
+        drafts = db.query(Post.schedule_id, Post.scheduled_at).filter(
+            Post.schedule_id.isnot(None),
+            Post.scheduled_at >= start,
+            Post.scheduled_at < end
+        )
+        for schedule_id, scheduled_at in drafts:
+            covered.add(slot_key(schedule_id, scheduled_at))
+
+        # Each slot is submitted at most once; failed requests fall back to live generation
+        recent = db.query(GenerationBatch.slot_keys).filter(
+            GenerationBatch.created_at >= now - timedelta(hours=BATCH_PREGEN_HORIZON_HOURS)
+        )
+        for (keys,) in recent:
+            covered.update(keys or [])
+        return covered
+
+    def _parse_results(self, batch: GenerationBatch, content: str) -> Tuple[Dict[str, Tuple[int, datetime, str]], int]:
+        """Successful results by slot key as (schedule_id, slot, text), and how many lines couldn't be read."""
+        results = {}
+        unreadable = 0
+        for line_number, line in enumerate(content.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.warning(f"Batch {batch.id} request {record.get('custom_id')} failed: {record.get('error') or response}")
+                    continue
+                key = record["custom_id"]
+                schedule_id, slot = parse_slot_key(key)
+                results[key] = (schedule_id, slot, response["body"]["choices"][0]["message"]["content"].strip())
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                # Only this slot goes without a draft; it falls back to live generation
+                unreadable += 1
+                logger.warning(f"Batch {batch.id} result line {line_number} could not be read: {e!r}")
+        return results, unreadable
+
+    async def _store_results(self, db: Session, batch: GenerationBatch, content: str) -> int:
+        """
+        Turn batch output lines into draft posts, dropping failures, past slots and duplicates.
+
+        Every await happens before the first write, so the transaction isn't
+        held open while other coroutines write to the same rows.
+        """
+        results, unreadable = self._parse_results(batch, content)
+        if unreadable:
+            batch.error = f"{unreadable} results could not be read"
+
+        now = datetime.utcnow()
+        candidates = []
+        # Reads only; batch.status stays pending until the single commit
+        with db.no_autoflush:
+            schedule_ids = {schedule_id for schedule_id, _, _ in results.values()}
+            schedules = {
+                schedule.id: schedule
+                for schedule in db.query(Schedule).filter(Schedule.id.in_(schedule_ids), Schedule.is_active == True)
+            }
+            accounts: Dict[Tuple[int, str], Optional[SocialAccount]] = {}
+            for key, (schedule_id, slot, text) in results.items():
+                schedule = schedules.get(schedule_id)
+                if schedule is None or slot <= now:
+                    continue
+
+                account_key = (schedule.user_id, schedule.platform)
+                if account_key not in accounts:
+                    accounts[account_key] = db.query(SocialAccount).filter(
+                        SocialAccount.user_id == schedule.user_id,
+                        SocialAccount.platform == schedule.platform,
+                        SocialAccount.is_active == True
+                    ).first()
+                social_account = accounts[account_key]
+                if social_account is not None:
+                    candidates.append((key, schedule, slot, social_account.id, text))
+
+        account_ids = {social_account_id for _, _, _, social_account_id, _ in candidates}
+        # Repeated in case an index was invalidated while another was loading
+        while not account_ids.issubset(duplicate_index.accounts):
+            for social_account_id in account_ids:
+                await duplicate_index.load(social_account_id)
+
+        posts = []
+        for key, schedule, slot, social_account_id, text in candidates:
+            signature = content_signature(text)
+            duplicate_of = duplicate_index.find_loaded(social_account_id, signature)
+            if duplicate_of is not None:
+                logger.warning(f"Dropping batch result for {key}: duplicates post {duplicate_of}")
+                continue
+
+            post = Post(
+                user_id=schedule.user_id,
+                social_account_id=social_account_id,
+                schedule_id=schedule.id,
+                content=text,
+                content_signature=signature,
+                platform=schedule.platform,
+                status=PostStatus.DRAFT,
+                ai_generated=True,
+                generation_prompt=f"Pre-generated in batch {batch.id} for schedule {schedule.name}",
+                scheduled_at=slot
+            )
+            db.add(post)
+            db.flush()
+            # Index now so later results in the same batch are checked against it
+            duplicate_index.add(post)
+            posts.append(post)
+
+        return len(posts)
+
+# Global batch pre-generator instance
+batch_pregenerator = BatchPregenerator()
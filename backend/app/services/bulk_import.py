@@ -0,0 +1,196 @@
+import codecs
+import csv
+import json
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.services.change_versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+FORMATS = ("ndjson", "csv")
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """Pick the upload format from an explicit ?format= or the Content-Type."""
+    if requested:
+        return requested.lower() if requested.lower() in FORMATS else None
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    return None
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a byte stream into lines without buffering the whole body.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Yield (row_number, record, error) for each row of an NDJSON or CSV upload.
+
+    CSV rows are assembled until their quotes balance, so quoted fields
+    containing newlines are handled without reading ahead.
+    """
+    row_number = 0
+
+    if fmt == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, None, "Row must be a JSON object"
+                continue
+            yield row_number, record, None
+        return
+
+    header = None
+    pending = []
+    async for line in lines:
+        pending.append(line)
+        if "\n".join(pending).count('"') % 2:
+            continue
+        text = "\n".join(pending)
+        pending = []
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, {key: value for key, value in zip(header, values) if value != ""}, None
+
+    if pending:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+class BulkImporter:
+    def __init__(
+        self,
+        db: Session,
+        model,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        on_insert: Optional[Callable[[Session, List[Dict]], None]] = None
+    ):
+        """
+        Accumulates validated rows and writes them as multi-row INSERTs.
+
+        A failed batch is rolled back and retried row by row, so only the
+        rows the database rejects are reported, with its error, and the rest
+        of the upload still goes through.
+        `on_insert` runs in each batch's transaction, for bookkeeping the
+        session's flush hooks would otherwise do.
+        """
+        self.db = db
+        self.model = model
+        self.batch_size = batch_size
+        self.on_insert = on_insert
+        self.batch: List[Tuple[int, Dict]] = []
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+
+    def add(self, row_number: int, row: Dict):
+        self.batch.append((row_number, row))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def error(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            self._insert([row for _, row in batch])
+            self.imported += len(batch)
+            return
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Bulk insert of {len(batch)} rows into {self.model.__tablename__} failed, retrying row by row: {getattr(e, 'orig', None) or e}")
+
+        for row_number, row in batch:
+            try:
+                self._insert([row])
+                self.imported += 1
+            except Exception as e:
+                self.db.rollback()
+                # The driver's message, without the statement and parameters
+                self.error(row_number, f"Database insert failed: {getattr(e, 'orig', None) or e}")
+
+    def _insert(self, rows: List[Dict]):
+        self.db.execute(insert(self.model), rows)
+        bump_versions(self.db, self.model, {row["user_id"] for row in rows})
+        if self.on_insert:
+            self.on_insert(self.db, rows)
+        self.db.commit()
+
+    def report(self) -> Dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+async def run_import(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    importer: BulkImporter,
+    build_row: Callable[[Dict], Dict]
+) -> Dict:
+    """
+    Stream an upload through build_row into the importer.
+
+    build_row turns a raw record into insert values and raises ValueError
+    (or a pydantic ValidationError) to reject the row.
+    """
+    async for row_number, record, error in iter_records(iter_lines(chunks), fmt):
+        if error:
+            importer.error(row_number, error)
+            continue
+        try:
+            row = build_row(record)
+        except ValidationError as e:
+            importer.error(row_number, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+        except ValueError as e:
+            importer.error(row_number, str(e))
+            continue
+        importer.add(row_number, row)
+
+    importer.flush()
+    return importer.report()
@@ -0,0 +1,80 @@
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+from fastapi import Request, Response
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app.models.models import KnowledgeDoc, Post, Schedule, SocialAccount, User
+
+# Per-user version column bumped by any change to each model's rows
+VERSION_COLUMNS = {
+    Post: User.posts_version,
+    Schedule: User.schedules_version,
+    KnowledgeDoc: User.knowledge_version,
+    SocialAccount: User.social_version,
+}
+COLLECTION_COLUMNS = {
+    "posts": User.posts_version,
+    "schedules": User.schedules_version,
+    "knowledge": User.knowledge_version,
+    "social": User.social_version,
+}
+
+def bump_versions(db: Session, model, user_ids: Iterable[int]):
+    """
+    Mark `model`'s collection changed for these users.
+
+    ORM changes are tracked automatically; call this after writes that bypass
+    the session's unit of work, such as Core insert() or query().update().
+    The bump runs in the caller's transaction, so it commits or rolls back
+    together with the change itself.
+    """
+    _bump(db, {VERSION_COLUMNS[model]: set(user_ids)})
+
+def _bump(db: Session, changes: Dict):
+    connection = db.connection()
+    for column, user_ids in changes.items():
+        user_ids.discard(None)
+        if user_ids:
+            connection.execute(
+                update(User).where(User.id.in_(sorted(user_ids))).values({column: column + 1})
+            )
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_collections(session: Session, flush_context):
+    changes = defaultdict(set)
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+    for objects in (session.new, session.deleted, dirty):
+        for obj in objects:
+            column = VERSION_COLUMNS.get(type(obj))
+            if column is not None:
+                changes[column].add(obj.user_id)
+    if changes:
+        _bump(session, changes)
+
+def collection_etag(user: User, collection: str, request: Request, view: Optional[str] = None) -> str:
+    """
+    ETag for one of `user`'s list endpoints, taken from the user row alone.
+
+    The version identifies the collection's contents; the query string is
+    hashed in so differently filtered lists get different tags. Endpoints
+    deriving something else from the same collection pass a `view` name.
+    """
+    version = getattr(user, COLLECTION_COLUMNS[collection].key) or 0
+    query = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    return f'W/"{view or collection}-{user.id}-{version}-{query}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match names `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags: Set[str] = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    # Per-user data: browsers may keep it but must revalidate, shared caches must not
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
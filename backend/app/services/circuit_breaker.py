@@ -0,0 +1,147 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from app.services.metrics import CIRCUIT_BREAKER_OPEN, CIRCUIT_BREAKER_REJECTED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# A breaker opens once at least BREAKER_MIN_CALLS of its last BREAKER_WINDOW
+# calls were recorded and this share of them failed or were slow
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "50"))
+# How long an open breaker waits before its health probe is tried
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_PROBE_INTERVAL_SECONDS = float(os.getenv("BREAKER_PROBE_INTERVAL_SECONDS", "10"))
+BREAKER_PROBE_TIMEOUT_SECONDS = 5.0
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+
+class CircuitOpenError(Exception):
+    pass
+
+async def http_check(url: str, headers: Optional[Dict[str, str]] = None) -> bool:
+    """Health probe: the endpoint answers without a server error."""
+    try:
+        async with httpx.AsyncClient(timeout=BREAKER_PROBE_TIMEOUT_SECONDS) as client:
+            response = await client.get(url, headers=headers)
+            return response.status_code < 500
+    except httpx.HTTPError:
+        return False
+
+class CircuitBreaker:
+    def __init__(self, name: str, probe: Callable[[], Awaitable[bool]], slow_call_seconds: float):
+        """
+        Fails calls to a dependency fast while it is failing or too slow.
+
+        Callers check allow() before a call and record() its outcome. Calls
+        slower than `slow_call_seconds` count against the dependency like
+        errors. Once open, the breaker rejects calls until its health probe
+        succeeds, so no real traffic is spent finding out it has recovered.
+        """
+        self.name = name
+        self.probe = probe
+        self.slow_call_seconds = slow_call_seconds
+        self.state = STATE_CLOSED
+        # True for each recent call that failed or was slow
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.rejected = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == STATE_OPEN
+
+    def allow(self) -> bool:
+        """False while open; counts the rejected call."""
+        if not self.is_open:
+            return True
+        self.rejected += 1
+        CIRCUIT_BREAKER_REJECTED_TOTAL.labels(dependency=self.name).inc()
+        return False
+
+    def check(self):
+        """Raise CircuitOpenError while open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open), try again shortly")
+
+    def record(self, success: bool, seconds: float, error: Optional[str] = None):
+        """Record a call's outcome; client errors (4xx) should be recorded as successes."""
+        bad = not success or seconds > self.slow_call_seconds
+        if bad:
+            self.last_error = error or f"slow call: {seconds:.1f}s"
+        if self.state != STATE_CLOSED:
+            return
+        self.outcomes.append(bad)
+        if len(self.outcomes) >= BREAKER_MIN_CALLS and self.failure_rate >= BREAKER_FAILURE_RATE:
+            self._open()
+
+    @property
+    def failure_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    async def try_probe(self) -> Optional[bool]:
+        """Probe an open breaker whose wait is over; closes it on success. None if not due."""
+        if self.state != STATE_OPEN or time.monotonic() - self.opened_at < BREAKER_OPEN_SECONDS:
+            return None
+        try:
+            healthy = await self.probe()
+        except Exception as e:
+            logger.error(f"Health probe for {self.name} raised: {e}")
+            healthy = False
+        if healthy:
+            self._close()
+        else:
+            # Wait out another open period before the next probe
+            self.opened_at = time.monotonic()
+        return healthy
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 3),
+            "recent_calls": len(self.outcomes),
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+    def _open(self):
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        CIRCUIT_BREAKER_OPEN.labels(dependency=self.name).set(1)
+        logger.warning(f"Circuit for {self.name} opened: {self.failure_rate:.0%} of {len(self.outcomes)} recent calls failed or were slow ({self.last_error})")
+
+    def _close(self):
+        self.state = STATE_CLOSED
+        self.opened_at = None
+        self.outcomes.clear()
+        CIRCUIT_BREAKER_OPEN.labels(dependency=self.name).set(0)
+        logger.info(f"Circuit for {self.name} closed: health probe succeeded")
+
+class BreakerRegistry:
+    def __init__(self):
+        """All circuit breakers, for probing and reporting."""
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def register(self, name: str, probe: Callable[[], Awaitable[bool]], slow_call_seconds: float) -> CircuitBreaker:
+        breaker = CircuitBreaker(name, probe, slow_call_seconds)
+        self.breakers[name] = breaker
+        CIRCUIT_BREAKER_OPEN.labels(dependency=name).set(0)
+        return breaker
+
+    async def probe_open(self):
+        """Health-probe every open breaker that is due; run periodically by the scheduler."""
+        for breaker in list(self.breakers.values()):
+            await breaker.try_probe()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: breaker.to_dict() for name, breaker in sorted(self.breakers.items())}
+
+# Global circuit breaker registry instance
+circuit_breakers = BreakerRegistry()
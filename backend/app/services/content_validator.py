@@ -0,0 +1,182 @@
+import logging
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+from app.services.metrics import CONTENT_FIT_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Twitter's weighted length (twitter-text v3): code points in these ranges
+# (Latin, Greek, Cyrillic, common punctuation...) weigh 1 and everything else,
+# CJK included, weighs 2. A URL counts as 23 however long it is, and an emoji
+# sequence (skin tones, ZWJ families, flags, keycaps) as 2.
+TWITTER_MAX_WEIGHTED_LENGTH = 280
+TWITTER_URL_WEIGHT = 23
+TWITTER_EMOJI_WEIGHT = 2
+TWITTER_LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+# TikTok's post_info.title, counted in UTF-16 code units
+TIKTOK_MAX_CAPTION_LENGTH = 2200
+
+# Links Twitter shortens to t.co: explicit schemes, www., and bare domains on
+# common TLDs (an approximation of twitter-text's full TLD list)
+URL_PATTERN = (
+    r"(?:https?://|www\.)[^\s<>\"]+"
+    r"|(?<![\w@.])(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+"
+    r"(?:com|net|org|io|ai|co|dev|app|me|ly|tv|info|biz|edu|gov|us|uk|ca|de|fr|in)\b(?:/[^\s<>\"]*)?"
+)
+URL_TRAILING_PUNCTUATION = ".,!?;:'\")]}"
+EMOJI_BASE = (
+    "\u00a9\u00ae\u203c\u2049\u2122\u2139\u2194-\u2199\u21a9\u21aa\u231a-\u23ff\u24c2"
+    "\u25aa-\u27bf\u2934\u2935\u2b05-\u2b55\u3030\u303d\u3297\u3299\U0001f000-\U0001faff"
+)
+# Variation selector, skin tones, tag characters (subdivision flags) and the keycap mark
+EMOJI_MODIFIERS = "\ufe0f\U0001f3fb-\U0001f3ff\U000e0020-\U000e007f\u20e3"
+EMOJI_PATTERN = (
+    "[\U0001f1e6-\U0001f1ff]{2}"
+    "|[0-9#*]\ufe0f?\u20e3"
+    f"|[{EMOJI_BASE}][{EMOJI_MODIFIERS}]*(?:\u200d[{EMOJI_BASE}][{EMOJI_MODIFIERS}]*)*"
+)
+TOKEN_RE = re.compile(f"(?P<url>{URL_PATTERN})|(?P<emoji>{EMOJI_PATTERN})", re.IGNORECASE)
+
+TRAILING_HASHTAGS_RE = re.compile(r"(\s*)((?:#\w+\s*)+)$")
+HASHTAG_RE = re.compile(r"#\w+")
+# Where a post can be cut: after a sentence's closing punctuation, or at a line break
+BOUNDARY_RE = re.compile(r"[.!?\u2026]+[\"')\]]*(?=\s)|(?=\n)")
+# Trimming must keep at least this share of the body's length; shorter cuts
+# lose the post's point, so it is rewritten instead
+MIN_KEPT_SHARE = 0.5
+
+class ContentTooLongError(Exception):
+    pass
+
+def _char_weight(char: str) -> int:
+    code_point = ord(char)
+    for low, high in TWITTER_LIGHT_RANGES:
+        if low <= code_point <= high:
+            return 1
+    return 2
+
+def _text_weight(text: str) -> int:
+    return sum(map(_char_weight, text))
+
+def twitter_length(text: str) -> int:
+    """Length of a tweet as Twitter counts it against the 280 limit."""
+    text = unicodedata.normalize("NFC", text)
+    length = 0
+    last = 0
+    for match in TOKEN_RE.finditer(text):
+        length += _text_weight(text[last:match.start()])
+        token = match.group()
+        if match.lastgroup == "url":
+            url = token.rstrip(URL_TRAILING_PUNCTUATION)
+            length += TWITTER_URL_WEIGHT + _text_weight(token[len(url):])
+        elif len(token) == 1:
+            # A lone symbol such as © keeps its ordinary weight
+            length += _char_weight(token)
+        else:
+            length += TWITTER_EMOJI_WEIGHT
+        last = match.end()
+    return length + _text_weight(text[last:])
+
+def tiktok_caption_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+# Platform -> (length function, limit)
+PLATFORM_LIMITS: Dict[str, Tuple[Callable[[str], int], int]] = {
+    "twitter": (twitter_length, TWITTER_MAX_WEIGHTED_LENGTH),
+    "tiktok": (tiktok_caption_length, TIKTOK_MAX_CAPTION_LENGTH)
+}
+
+def content_length(platform: str, text: str) -> Optional[Tuple[int, int]]:
+    """(length, limit) of the text on a platform, or None if it has no limit here."""
+    if platform not in PLATFORM_LIMITS:
+        return None
+    measure, limit = PLATFORM_LIMITS[platform]
+    return measure(text), limit
+
+def _tidy(text: str) -> str:
+    lines = [" ".join(line.split()) for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+def _candidates(text: str, measure: Callable[[str], int]) -> List[str]:
+    """
+    Shorter versions of the text, least trimmed first.
+
+    Trailing hashtags are dropped from the end down to one, then whole
+    sentences (or lines) from the end of the body, then the last hashtag.
+    Words are never cut, and no candidate keeps less than MIN_KEPT_SHARE
+    of the body.
+    """
+    match = TRAILING_HASHTAGS_RE.search(text)
+    if match:
+        body, separator, hashtags = text[:match.start()], match.group(1), HASHTAG_RE.findall(match.group(2))
+    else:
+        body, separator, hashtags = text, "", []
+
+    def join(body_text: str, tags: List[str]) -> str:
+        if not tags:
+            return body_text
+        if not body_text:
+            return " ".join(tags)
+        return body_text + (separator or " ") + " ".join(tags)
+
+    prefixes = [body[:boundary.end()].rstrip() for boundary in BOUNDARY_RE.finditer(body)]
+    min_length = measure(body) * MIN_KEPT_SHARE
+    prefixes = sorted(
+        {prefix for prefix in prefixes if prefix and prefix != body and measure(prefix) >= min_length},
+        key=len,
+        reverse=True
+    )
+
+    candidates = [join(body, hashtags[:kept]) for kept in range(len(hashtags) - 1, 0, -1)]
+    candidates += [join(prefix, hashtags[:1]) for prefix in prefixes]
+    if hashtags and body:
+        candidates += [body] + prefixes
+    return candidates
+
+def fit_content(platform: str, text: str) -> Optional[str]:
+    """
+    The text, trimmed if needed to fit the platform's limit, or None if it
+    can't be trimmed at a hashtag or sentence boundary without losing most
+    of it.
+    """
+    text = _tidy(text)
+    if platform not in PLATFORM_LIMITS:
+        return text
+    measure, limit = PLATFORM_LIMITS[platform]
+    if measure(text) <= limit:
+        return text
+    for candidate in _candidates(text, measure):
+        if measure(candidate) <= limit:
+            return candidate
+    return None
+
+async def fit_for_platform(platform: str, content: str, ai_generator) -> str:
+    """
+    Make content fit the platform before it's published.
+
+    Over-long content is trimmed locally when possible. Otherwise the model
+    is asked once, through improve_post, to shorten it. If even that doesn't
+    fit, ContentTooLongError is raised rather than spending a publish call
+    that the platform would reject.
+    """
+    fitted = fit_content(platform, content)
+    if fitted is not None:
+        CONTENT_FIT_TOTAL.labels(platform=platform, outcome="ok" if fitted == _tidy(content) else "trimmed").inc()
+        return fitted
+
+    length, limit = content_length(platform, content)
+    logger.info(f"Content for {platform} is {length}/{limit} characters and can't be trimmed locally; asking for a shorter version")
+    rewritten = await ai_generator.improve_post(
+        content,
+        f"It is {length} characters as {platform} counts them, over the {limit}-character limit "
+        "(links count as 23 characters; emoji and CJK characters as 2). "
+        "Rewrite it to fit comfortably, keeping its main point and one or two hashtags."
+    )
+    fitted = fit_content(platform, rewritten)
+    if fitted is None:
+        CONTENT_FIT_TOTAL.labels(platform=platform, outcome="rejected").inc()
+        length, limit = content_length(platform, rewritten)
+        raise ContentTooLongError(f"Content is {length} characters, over the {limit}-character {platform} limit")
+    CONTENT_FIT_TOTAL.labels(platform=platform, outcome="rewritten").inc()
+    return fitted
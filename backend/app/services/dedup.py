@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import os
+import re
+import random
+import struct
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, update
+from app.database import SessionLocal
+from app.models.models import Post, PostStatus
+
+logger = logging.getLogger(__name__)
+
+# 20 bands of 5 rows: two posts with word-set Jaccard similarity J share a
+# band with probability 1 - (1 - J^5)^20. Requiring two matching bands puts
+# the cut-off around J = 0.6, where one- or two-word rewrites of a tweet
+# still land well above it and unrelated posts almost never get there.
+MINHASH_BANDS = 20
+MINHASH_ROWS = 5
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+DEDUP_MIN_BAND_MATCHES = int(os.getenv("DEDUP_MIN_BAND_MATCHES", "2"))
+DEDUP_MAX_REGENERATIONS = int(os.getenv("DEDUP_MAX_REGENERATIONS", "2"))
+# Signatures computed for older posts while loading are written back in batches this size
+DEDUP_BACKFILL_BATCH_SIZE = 1000
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101)  # Fixed seed: signatures are persisted
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+TOKEN_RE = re.compile(r"https?://\S+|[#@]?\w+")
+
+class DuplicateContentError(Exception):
+    pass
+
+def _tokens(text: str) -> set:
+    # Every link counts as the same token; shorteners make them unique
+    return {
+        "<url>" if token.startswith("http") else token
+        for token in TOKEN_RE.findall(text.lower())
+    }
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+def content_signature(text: str) -> List[int]:
+    """
+    MinHash LSH band keys for a post's content.
+
+    These are what gets stored on Post.content_signature, so the index can
+    be rebuilt from the table without re-hashing every post.
+    """
+    hashes = [_hash64(token.encode("utf-8")) for token in _tokens(text)] or [0]
+    mins = [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+    return [
+        # Keep band keys within signed 63 bits so they round-trip through JSON
+        _hash64(struct.pack(f"<{MINHASH_ROWS}Q", *mins[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])) >> 1
+        for band in range(MINHASH_BANDS)
+    ]
+
+class _AccountIndex:
+    def __init__(self):
+        self.bands: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(MINHASH_BANDS)]
+
+    def add(self, post_id: int, signature: List[int]):
+        for band, key in enumerate(signature):
+            bucket = self.bands[band][key]
+            if post_id not in bucket:
+                bucket.append(post_id)
+
+    def remove(self, post_id: int, signature: List[int]):
+        for band, key in enumerate(signature):
+            bucket = self.bands[band].get(key)
+            if bucket and post_id in bucket:
+                bucket.remove(post_id)
+                if not bucket:
+                    del self.bands[band][key]
+
+    def find(self, signature: List[int], min_matches: int) -> Optional[int]:
+        matches = Counter()
+        for band, key in enumerate(signature):
+            for post_id in self.bands[band].get(key, ()):
+                matches[post_id] += 1
+                if matches[post_id] >= min_matches:
+                    return post_id
+        return None
+
+class DuplicateIndex:
+    def __init__(self, min_band_matches: int = DEDUP_MIN_BAND_MATCHES):
+        """
+        Per-social-account MinHash LSH index over past post content.
+
+        An account's index is built from the posts table on first use, in a
+        worker thread, and then kept current through add/remove, so checks
+        never hit the database again. Failed posts were never published and
+        are left out.
+        """
+        self.min_band_matches = min_band_matches
+        self.accounts: Dict[int, _AccountIndex] = {}
+        # Account id -> in-flight build, shared by concurrent loads
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Account id -> (added, post id, signature) changes made during its build
+        self._pending: Dict[int, List[Tuple[bool, int, List[int]]]] = {}
+
+    async def load(self, social_account_id: int):
+        """Build an account's index unless it is already loaded."""
+        while social_account_id not in self.accounts:
+            task = self._loading.get(social_account_id)
+            if task is None:
+                task = asyncio.ensure_future(self._install(social_account_id))
+                self._loading[social_account_id] = task
+                self._pending[social_account_id] = []
+            await asyncio.shield(task)
+
+    async def _install(self, social_account_id: int):
+        task = asyncio.current_task()
+        try:
+            index = await asyncio.to_thread(self._build, social_account_id)
+            # Invalidated while building: the next load starts over
+            if self._loading.get(social_account_id) is not task:
+                return
+            # Posts created or deleted meanwhile may be missing from the rows read
+            for added, post_id, signature in self._pending[social_account_id]:
+                (index.add if added else index.remove)(post_id, signature)
+            self.accounts[social_account_id] = index
+        finally:
+            if self._loading.get(social_account_id) is task:
+                del self._loading[social_account_id]
+                del self._pending[social_account_id]
+
+    def _build(self, social_account_id: int) -> _AccountIndex:
+        """
+        Read an account's posts into a new index. Blocking; runs in a worker thread.
+
+        Posts stored without a signature (created before signatures were) are
+        hashed here once, and their signatures saved so later loads don't
+        hash them again.
+        """
+        index = _AccountIndex()
+        backfill = []
+        db = SessionLocal()
+        try:
+            rows = db.query(Post.id, Post.content, Post.content_signature).filter(
+                Post.social_account_id == social_account_id,
+                Post.status != PostStatus.FAILED
+            ).yield_per(5000)
+            count = 0
+            for row in rows:
+                signature = row.content_signature
+                if not signature:
+                    signature = content_signature(row.content)
+                    backfill.append({"post_id": row.id, "signature": signature})
+                index.add(row.id, signature)
+                count += 1
+
+            if backfill:
+                try:
+                    posts = Post.__table__
+                    statement = update(posts).where(
+                        posts.c.id == bindparam("post_id"),
+                        posts.c.content_signature.is_(None)
+                    ).values(content_signature=bindparam("signature"))
+                    for start in range(0, len(backfill), DEDUP_BACKFILL_BATCH_SIZE):
+                        db.execute(statement, backfill[start:start + DEDUP_BACKFILL_BATCH_SIZE])
+                    db.commit()
+                except Exception as e:
+                    # The index is complete either way; the next load hashes them again
+                    db.rollback()
+                    logger.warning(f"Could not save backfilled signatures for social account {social_account_id}: {e}")
+        finally:
+            db.close()
+        logger.info(f"Loaded duplicate index for social account {social_account_id} ({count} posts, {len(backfill)} signatures backfilled)")
+        return index
+
+    async def find_duplicate(self, social_account_id: int, signature: List[int]) -> Optional[int]:
+        """Return the id of a past post near-duplicating the given content signature, if any."""
+        await self.load(social_account_id)
+        return self.find_loaded(social_account_id, signature)
+
+    def find_loaded(self, social_account_id: int, signature: List[int]) -> Optional[int]:
+        """find_duplicate for an account already loaded with load(); never waits."""
+        return self.accounts[social_account_id].find(signature, self.min_band_matches)
+
+    def add(self, post: Post):
+        """Record a newly created post. No-op until the account is loaded."""
+        self._record(post, True)
+
+    def remove(self, post: Post):
+        self._record(post, False)
+
+    def _record(self, post: Post, added: bool):
+        index = self.accounts.get(post.social_account_id)
+        pending = self._pending.get(post.social_account_id)
+        if index is None and pending is None:
+            return
+        signature = post.content_signature or content_signature(post.content)
+        if index is not None:
+            (index.add if added else index.remove)(post.id, signature)
+        else:
+            pending.append((added, post.id, signature))
+
+    def invalidate(self, social_account_id: int):
+        """Drop an account's index so it is rebuilt on next use."""
+        self.accounts.pop(social_account_id, None)
+        self._loading.pop(social_account_id, None)
+        self._pending.pop(social_account_id, None)
+
+# Global duplicate index instance
+duplicate_index = DuplicateIndex()
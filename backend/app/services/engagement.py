@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, insert, update
+from app.database import SessionLocal
+from app.models.models import Post, PostMetric, PostStatus, SocialAccount, SocialPlatform
+from app.integrations.twitter import (
+    TwitterClient, twitter_breaker, TWEET_LOOKUP_MAX_IDS, TWITTER_RATE_LIMIT_WINDOW_SECONDS
+)
+from app.services.metrics import ENGAGEMENT_LOOKUPS_TOTAL, ENGAGEMENT_SAMPLES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+METRICS_COLLECTION_ENABLED = os.getenv("METRICS_COLLECTION_ENABLED", "true").lower() == "true"
+METRICS_INTERVAL_MINUTES = int(os.getenv("METRICS_INTERVAL_MINUTES", "5"))
+# A post is polled again after METRICS_AGE_RATIO of its age, within these bounds,
+# and no longer once it is older than METRICS_MAX_AGE_DAYS
+METRICS_AGE_RATIO = float(os.getenv("METRICS_AGE_RATIO", "0.25"))
+METRICS_MIN_INTERVAL_MINUTES = float(os.getenv("METRICS_MIN_INTERVAL_MINUTES", "5"))
+METRICS_MAX_INTERVAL_HOURS = float(os.getenv("METRICS_MAX_INTERVAL_HOURS", "24"))
+METRICS_MAX_AGE_DAYS = float(os.getenv("METRICS_MAX_AGE_DAYS", "7"))
+# Due posts handled per run, freshest first; the rest stay due for the next run
+METRICS_MAX_POSTS_PER_RUN = int(os.getenv("METRICS_MAX_POSTS_PER_RUN", "5000"))
+# Tweet lookups per account per 15-minute window; match your API tier's user limit
+METRICS_TWITTER_LOOKUPS_PER_WINDOW = int(os.getenv("METRICS_TWITTER_LOOKUPS_PER_WINDOW", "15"))
+METRICS_CONCURRENCY = int(os.getenv("METRICS_CONCURRENCY", "5"))
+
+# Core statement so polling bookkeeping doesn't count as a change to the
+# user's posts (and invalidate their dashboard ETags) every few minutes
+SET_NEXT_COLLECTION = update(Post).where(
+    Post.id == bindparam("post_id")
+).values(metrics_next_at=bindparam("next_at"))
+
+def next_collection_at(posted_at: datetime, now: datetime) -> Optional[datetime]:
+    """When to collect a post's engagement next, or None once it's too old to poll."""
+    age = now - posted_at
+    if age >= timedelta(days=METRICS_MAX_AGE_DAYS):
+        return None
+    interval = min(
+        max(age * METRICS_AGE_RATIO, timedelta(minutes=METRICS_MIN_INTERVAL_MINUTES)),
+        timedelta(hours=METRICS_MAX_INTERVAL_HOURS)
+    )
+    return now + interval
+
+class EngagementCollector:
+    def __init__(
+        self,
+        lookups_per_window: int = METRICS_TWITTER_LOOKUPS_PER_WINDOW,
+        concurrency: int = METRICS_CONCURRENCY
+    ):
+        """
+        Collects engagement metrics for published posts in the background.
+
+        Each run takes the posts whose metrics_next_at is due, freshest first,
+        looks them up 100 tweets per call with their account's tokens, and
+        appends one row per post to post_metrics. Polling spaces out as posts
+        age. Lookups stay within each account's rate-limit window, and an
+        account that gets a 429 is left alone until its limit resets.
+
+        TikTok posts store the publish id from the upload rather than the video
+        id its query API takes, so only Twitter is collected.
+        """
+        self.lookups_per_window = lookups_per_window
+        self.concurrency = concurrency
+        # Account id -> monotonic times of its lookups in the current window
+        self.lookups: Dict[int, Deque[float]] = defaultdict(deque)
+        # Account id -> Unix time its rate limit resets, after a 429
+        self.blocked_until: Dict[int, float] = {}
+
+    async def collect(self) -> Dict:
+        """
+        Collect metrics for every due post the rate limits allow.
+
+        Returns:
+            dict with sampled, stopped (no longer polled) and deferred counts
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            due = db.query(Post.id, Post.social_account_id, Post.platform_post_id, Post.posted_at).filter(
+                Post.platform == SocialPlatform.TWITTER,
+                Post.status == PostStatus.POSTED,
+                Post.platform_post_id.isnot(None),
+                Post.metrics_next_at <= now
+            ).order_by(Post.posted_at.desc()).limit(METRICS_MAX_POSTS_PER_RUN).all()
+            if not due:
+                return {"sampled": 0, "stopped": 0, "deferred": 0}
+
+            tokens = {
+                account.id: (account.access_token, account.refresh_token)
+                for account in db.query(SocialAccount).filter(
+                    SocialAccount.id.in_({row.social_account_id for row in due}),
+                    SocialAccount.is_active == True
+                )
+            }
+        finally:
+            db.close()
+
+        self._prune_windows()
+        by_account = defaultdict(list)
+        for row in due:
+            by_account[row.social_account_id].append(row)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*[
+            self._collect_account(account_id, tokens.get(account_id), rows, semaphore)
+            for account_id, rows in by_account.items()
+        ])
+
+        samples = [sample for account_samples, _ in results for sample in account_samples]
+        next_runs = [next_run for _, account_next_runs in results for next_run in account_next_runs]
+        self._store(samples, next_runs)
+
+        stopped = sum(1 for next_run in next_runs if next_run["next_at"] is None)
+        deferred = len(due) - len(next_runs)
+        logger.info(f"Engagement collection: {len(samples)} sampled, {stopped} stopped, {deferred} deferred")
+        return {"sampled": len(samples), "stopped": stopped, "deferred": deferred}
+
+    async def _collect_account(
+        self,
+        account_id: int,
+        tokens: Optional[Tuple[str, str]],
+        rows: List,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Look up one account's due posts; returns metric rows and next collection times."""
+        if tokens is None:
+            # Account removed or deactivated: its posts can't be looked up any more
+            return [], [{"post_id": row.id, "next_at": None} for row in rows]
+
+        access_token, access_token_secret = tokens
+        client = TwitterClient(access_token=access_token, access_token_secret=access_token_secret)
+        samples, next_runs = [], []
+        for start in range(0, len(rows), TWEET_LOOKUP_MAX_IDS):
+            # Posts left over when the budget runs out stay due for a later run
+            if twitter_breaker.is_open or not self._take_lookup(account_id):
+                break
+            chunk = rows[start:start + TWEET_LOOKUP_MAX_IDS]
+            async with semaphore:
+                result = await client.get_tweet_metrics([row.platform_post_id for row in chunk])
+            collected_at = datetime.utcnow()
+
+            if not result["success"]:
+                if "rate_limited_until" in result:
+                    self.blocked_until[account_id] = result["rate_limited_until"]
+                    ENGAGEMENT_LOOKUPS_TOTAL.labels(platform="twitter", outcome="rate_limited").inc()
+                    logger.warning(f"Engagement lookups for social account {account_id} rate limited: {result['error']}")
+                    break
+                ENGAGEMENT_LOOKUPS_TOTAL.labels(platform="twitter", outcome="error").inc()
+                logger.error(f"Engagement lookup failed for social account {account_id}: {result['error']}")
+                # Back off as if collected, so a broken account isn't retried every run
+                next_runs.extend(
+                    {"post_id": row.id, "next_at": next_collection_at(row.posted_at, collected_at)} for row in chunk
+                )
+                continue
+
+            ENGAGEMENT_LOOKUPS_TOTAL.labels(platform="twitter", outcome="ok").inc()
+            for row in chunk:
+                metrics = result["metrics"].get(row.platform_post_id)
+                if metrics is None:
+                    # Deleted or no longer visible
+                    next_runs.append({"post_id": row.id, "next_at": None})
+                    continue
+                samples.append({
+                    "post_id": row.id,
+                    "collected_at": collected_at,
+                    "impressions": metrics.get("impression_count"),
+                    "likes": metrics.get("like_count"),
+                    "replies": metrics.get("reply_count"),
+                    "reposts": metrics.get("retweet_count"),
+                    "quotes": metrics.get("quote_count"),
+                    "bookmarks": metrics.get("bookmark_count")
+                })
+                next_runs.append({"post_id": row.id, "next_at": next_collection_at(row.posted_at, collected_at)})
+        return samples, next_runs
+
+    def _take_lookup(self, account_id: int) -> bool:
+        """Spend one lookup from the account's window; False if it has none left."""
+        if self.blocked_until.get(account_id, 0) > time.time():
+            return False
+        self.blocked_until.pop(account_id, None)
+        window = self.lookups[account_id]
+        now = time.monotonic()
+        while window and window[0] <= now - TWITTER_RATE_LIMIT_WINDOW_SECONDS:
+            window.popleft()
+        if len(window) >= self.lookups_per_window:
+            return False
+        window.append(now)
+        return True
+
+    def _prune_windows(self):
+        cutoff = time.monotonic() - TWITTER_RATE_LIMIT_WINDOW_SECONDS
+        for account_id in [account_id for account_id, window in self.lookups.items() if not window or window[-1] <= cutoff]:
+            del self.lookups[account_id]
+
+    def _store(self, samples: List[Dict], next_runs: List[Dict]):
+        """Append samples with one multi-row INSERT and move each post's next collection time."""
+        if not samples and not next_runs:
+            return
+        db = SessionLocal()
+        try:
+            if samples:
+                db.execute(insert(PostMetric), samples)
+            if next_runs:
+                db.connection().execute(SET_NEXT_COLLECTION, next_runs)
+            db.commit()
+            ENGAGEMENT_SAMPLES_TOTAL.inc(len(samples))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store {len(samples)} engagement samples: {e}")
+        finally:
+            db.close()
+
+# Global engagement collector instance
+engagement_collector = EngagementCollector()
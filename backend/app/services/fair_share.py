@@ -0,0 +1,143 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+from app.services.metrics import SCHEDULED_POSTS_WAITING, TENANT_QUEUE_DEPTH, TENANT_QUEUE_WAIT_SECONDS
+
+def parse_weights(spec: str) -> Dict[int, int]:
+    """Parse "user_id:weight,..." (e.g. "12:3,40:2") into a weight map."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user_id, weight = item.split(":")
+        weights[int(user_id)] = max(1, int(weight))
+    return weights
+
+class FairShareExecutor:
+    def __init__(self, capacity: int, per_tenant_limit: int, weights: Optional[Dict[int, int]] = None):
+        """
+        Concurrency limiter that shares capacity fairly between tenants.
+
+        At most `capacity` executions run at once, and at most
+        `per_tenant_limit` per tenant. When work is waiting, freed slots go
+        to tenants in weighted round-robin order: each tenant with queued
+        work takes up to its weight (default 1) slots per turn, so a tenant
+        with hundreds of due posts can't starve one with a single post.
+        """
+        self.capacity = capacity
+        self.per_tenant_limit = per_tenant_limit
+        self.weights = weights or {}
+        self.active = 0
+        self.running: Dict[int, int] = defaultdict(int)
+        self.queues: Dict[int, Deque[asyncio.Future]] = {}
+        # Tenants with queued work, in turn order; the head is being served
+        self.rotation: Deque[int] = deque()
+        self.turn_grants = 0
+
+    @asynccontextmanager
+    async def slot(self, tenant: int):
+        """Hold an execution slot for `tenant` for the duration of the block."""
+        await self._acquire(tenant)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def queue_depth(self, tenant: int) -> int:
+        return len(self.queues.get(tenant, ()))
+
+    async def _acquire(self, tenant: int):
+        # Fast path only when nobody is waiting, so queued tenants keep their turn
+        if not self.rotation and self._has_room(tenant):
+            self._grant(tenant)
+            TENANT_QUEUE_WAIT_SECONDS.observe(0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        if tenant not in self.queues:
+            self.queues[tenant] = deque()
+            self.rotation.append(tenant)
+        self.queues[tenant].append(waiter)
+        self._update_depth(tenant)
+        # Queued tenants may all be at their caps while capacity is free
+        self._dispatch()
+        SCHEDULED_POSTS_WAITING.inc()
+        queued_at = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before cancellation: hand the slot on
+                self._release(tenant)
+            else:
+                self._forget(tenant, waiter)
+            raise
+        finally:
+            SCHEDULED_POSTS_WAITING.dec()
+        TENANT_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+
+    def _release(self, tenant: int):
+        self.active -= 1
+        self.running[tenant] -= 1
+        if not self.running[tenant]:
+            del self.running[tenant]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting tenants in weighted round-robin order."""
+        skipped = 0
+        while self.active < self.capacity and self.rotation and skipped < len(self.rotation):
+            tenant = self.rotation[0]
+            if not self._has_room(tenant):
+                # At its own cap: pass the turn without using it up
+                self._next_turn()
+                skipped += 1
+                continue
+
+            queue = self.queues[tenant]
+            self._grant(tenant)
+            queue.popleft().set_result(None)
+            self.turn_grants += 1
+            skipped = 0
+
+            if not queue:
+                del self.queues[tenant]
+                self.rotation.popleft()
+                self.turn_grants = 0
+            elif self.turn_grants >= self.weights.get(tenant, 1):
+                self._next_turn()
+            self._update_depth(tenant)
+
+    def _has_room(self, tenant: int) -> bool:
+        return self.active < self.capacity and self.running[tenant] < self.per_tenant_limit
+
+    def _grant(self, tenant: int):
+        self.active += 1
+        self.running[tenant] += 1
+
+    def _next_turn(self):
+        self.rotation.rotate(-1)
+        self.turn_grants = 0
+
+    def _forget(self, tenant: int, waiter: asyncio.Future):
+        queue = self.queues.get(tenant)
+        if queue is None:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self.queues[tenant]
+            if self.rotation[0] == tenant:
+                self.turn_grants = 0
+            self.rotation.remove(tenant)
+        self._update_depth(tenant)
+
+    def _update_depth(self, tenant: int):
+        depth = self.queue_depth(tenant)
+        if depth:
+            TENANT_QUEUE_DEPTH.labels(user_id=str(tenant)).set(depth)
+        else:
+            # Drop idle tenants so label cardinality tracks only queued ones
+            try:
+                TENANT_QUEUE_DEPTH.remove(str(tenant))
+            except KeyError:
+                pass
@@ -0,0 +1,118 @@
+import html
+import re
+from typing import Dict, Iterator, Optional
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# The standard library's pull parser is the fallback when lxml is
+# unavailable; it's stricter, so malformed feeds stop at the first error.
+
+# Bytes handed to the parser at a time; parsing stops between chunks once
+# enough entries have been read
+FEED_CHUNK_BYTES = 16 * 1024
+TAG_RE = re.compile(r"<[^>]+>")
+DIGITS_RE = re.compile(r"\d+")
+
+# Where each field may come from, most preferred first
+SUMMARY_ELEMENTS = ("description", "summary", "content")
+
+def _local_name(tag) -> str:
+    # Comments and processing instructions have a function as their tag
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+def strip_html(markup: str) -> str:
+    """Plain text of an HTML fragment, such as an escaped Atom <content type="html">."""
+    if "<" in markup:
+        markup = TAG_RE.sub(" ", markup)
+    return html.unescape(markup)
+
+def parse_traffic(text: Optional[str]) -> Optional[int]:
+    """Google Trends' "200,000+" approximate traffic as an int."""
+    if text is None:
+        return None
+    return int("".join(DIGITS_RE.findall(text)) or 0)
+
+def _entry_fields(entry) -> Dict[str, Optional[str]]:
+    fields = {"title": "", "link": "", "summary": "", "traffic": None}
+    summary_rank = len(SUMMARY_ELEMENTS)
+    link_is_alternate = False
+    # Direct children only: Google Trends nests news items with their own titles and links
+    for child in entry:
+        name = _local_name(child.tag)
+        if name == "title":
+            fields["title"] = child.text or ""
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                # RSS puts the URL in the element's text
+                fields["link"] = (child.text or "").strip()
+            elif not link_is_alternate and child.get("rel", "alternate") == "alternate":
+                # Atom: prefer the alternate link over enclosures, replies and the like
+                fields["link"] = href.strip()
+                link_is_alternate = True
+            elif not fields["link"]:
+                fields["link"] = href.strip()
+        elif name in SUMMARY_ELEMENTS:
+            rank = SUMMARY_ELEMENTS.index(name)
+            if rank < summary_rank:
+                fields["summary"] = child.text or ""
+                summary_rank = rank
+        elif name == "approx_traffic":
+            fields["traffic"] = child.text
+    return fields
+
+def _pull_parser():
+    """An incremental parser that reports closing tags, and the error it raises."""
+    if etree is not None:
+        parser = etree.XMLPullParser(
+            events=("end",),
+            tag=("{*}item", "{*}entry"),
+            recover=True,
+            resolve_entities=False,
+            no_network=True
+        )
+        return parser, etree.XMLSyntaxError
+    from xml.etree import ElementTree
+    return ElementTree.XMLPullParser(events=("end",)), ElementTree.ParseError
+
+def _read_entries(body: bytes) -> Iterator:
+    parser, parse_error = _pull_parser()
+    try:
+        for start in range(0, len(body), FEED_CHUNK_BYTES):
+            parser.feed(body[start:start + FEED_CHUNK_BYTES])
+            yield from (element for _, element in parser.read_events() if _local_name(element.tag) in ("item", "entry"))
+        parser.close()
+        yield from (element for _, element in parser.read_events() if _local_name(element.tag) in ("item", "entry"))
+    except parse_error:
+        # Nothing more is recoverable, e.g. an empty body; entries read so far still count
+        return
+
+def iter_feed_entries(body: bytes, limit: Optional[int] = None) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Yield the title, link, summary and traffic of each RSS <item> or Atom <entry>.
+
+    The document is fed to an incremental parser in chunks and each entry is
+    read and discarded as soon as its closing tag arrives. Parsing stops once
+    `limit` entries have been yielded, so a long feed costs only as much as
+    the entries actually used, and memory stays flat.
+
+    With lxml the parser recovers from malformed markup instead of failing
+    the whole feed. Entities are not resolved and nothing is fetched from
+    the network.
+    """
+    count = 0
+    for entry in _read_entries(body):
+        yield _entry_fields(entry)
+        count += 1
+        if limit is not None and count >= limit:
+            return
+        entry.clear()
+        # lxml elements know their parent, so entries already read can leave the tree
+        if etree is not None:
+            while entry.getprevious() is not None:
+                del entry.getparent()[0]
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+import logging
+import httpx
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlalchemy import insert, or_
+from app.models.models import KnowledgeDoc
+from app.services.change_versions import bump_versions
+from app.services.scraper import WebScraper
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+INGEST_MAX_URLS = int(os.getenv("INGEST_MAX_URLS", "500"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "20"))
+INGEST_PER_HOST_CONCURRENCY = int(os.getenv("INGEST_PER_HOST_CONCURRENCY", "2"))
+INGEST_PER_HOST_DELAY_SECONDS = float(os.getenv("INGEST_PER_HOST_DELAY_SECONDS", "0.5"))
+INGEST_INSERT_BATCH_SIZE = 100
+# Values per IN (...) when looking up existing documents
+INGEST_LOOKUP_BATCH_SIZE = 500
+INGEST_JOB_TTL_SECONDS = 3600
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref"}
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings of the same page
+    compare equal: lowercase scheme and host, default ports, fragments,
+    tracking parameters and trailing slashes are dropped, and the
+    remaining query parameters are sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PARAM_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def content_hash(content: str) -> str:
+    """SHA-256 of whitespace- and case-normalized content."""
+    normalized = " ".join(content.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class KnowledgeIngestor:
+    def __init__(self):
+        """
+        Bulk-ingests URLs into a user's knowledge base.
+
+        Jobs are tracked in memory, like the scheduler's job store, and are
+        dropped INGEST_JOB_TTL_SECONDS after they finish.
+        """
+        self.jobs: Dict[str, Dict] = {}
+        self.scraper = WebScraper()
+
+    def create_job(self, user_id: int, urls: List[str]) -> Dict:
+        """Register a new ingest job and return its progress record."""
+        self._prune_jobs()
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "user_id": user_id,
+            "status": "pending",
+            "total": len(urls),
+            "processed": 0,
+            "created": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "errors": [],
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "_finished": None
+        }
+        self.jobs[job_id] = job
+        return job
+
+    def get_job(self, job_id: str, user_id: int) -> Optional[Dict]:
+        """Return the public view of a job, or None if it isn't this user's."""
+        job = self.jobs.get(job_id)
+        if not job or job["user_id"] != user_id:
+            return None
+        return {key: value for key, value in job.items() if not key.startswith("_")}
+
+    async def run_job(
+        self,
+        job_id: str,
+        urls: List[str],
+        category: Optional[str] = None,
+        keywords: Optional[list] = None
+    ):
+        """
+        Fetch all URLs concurrently and insert the new documents.
+
+        Total concurrency is capped at INGEST_CONCURRENCY and each host gets
+        at most INGEST_PER_HOST_CONCURRENCY requests in flight, spaced by
+        INGEST_PER_HOST_DELAY_SECONDS. Duplicates are skipped by canonical
+        URL, before and after redirects, and by content hash, both within the
+        job and against the user's existing documents. Existing documents are
+        looked up only for the URLs requested and the pages fetched.
+        """
+        job = self.jobs[job_id]
+        job["status"] = "running"
+        user_id = job["user_id"]
+
+        db = SessionLocal()
+        try:
+            # Dedupe the request itself by canonical URL
+            canonical_urls = {}
+            for url in urls:
+                canonical = canonicalize_url(url)
+                if canonical in canonical_urls:
+                    job["duplicates"] += 1
+                    job["processed"] += 1
+                else:
+                    canonical_urls[canonical] = url
+
+            # As requested too, for documents added by hand with a non-canonical URL
+            seen_urls = self._existing_urls(db, user_id, set(canonical_urls) | set(canonical_urls.values()))
+            # Final URLs and hashes of the pages kept by this job
+            kept_urls = set()
+            seen_hashes = set()
+
+            pending = []
+            for canonical, url in canonical_urls.items():
+                if canonical in seen_urls:
+                    job["duplicates"] += 1
+                    job["processed"] += 1
+                else:
+                    pending.append((canonical, url))
+
+            global_limit = asyncio.Semaphore(INGEST_CONCURRENCY)
+            host_limits = defaultdict(lambda: asyncio.Semaphore(INGEST_PER_HOST_CONCURRENCY))
+            host_next_slot = defaultdict(float)
+            rows = []
+
+            async def fetch(canonical: str, url: str, client: httpx.AsyncClient):
+                host = urlsplit(canonical).netloc
+                async with host_limits[host]:
+                    # Space out requests to the same host
+                    wait = host_next_slot[host] - time.monotonic()
+                    host_next_slot[host] = max(host_next_slot[host], time.monotonic()) + INGEST_PER_HOST_DELAY_SECONDS
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    async with global_limit:
+                        return canonical, await self.scraper.scrape_url_content(url, client=client)
+
+            async with httpx.AsyncClient() as client:
+                tasks = [asyncio.create_task(fetch(canonical, url, client)) for canonical, url in pending]
+                try:
+                    for completed in asyncio.as_completed(tasks):
+                        canonical, result = await completed
+                        job["processed"] += 1
+
+                        if "error" in result or not result.get("content"):
+                            job["failed"] += 1
+                            job["errors"].append({"url": canonical, "error": result.get("error", "No content extracted")})
+                            continue
+
+                        # Stored under the URL redirects ended at
+                        final_url = canonicalize_url(result.get("final_url") or canonical)
+                        digest = content_hash(result["content"])
+                        if final_url in kept_urls or digest in seen_hashes:
+                            job["duplicates"] += 1
+                            continue
+                        kept_urls.add(final_url)
+                        seen_hashes.add(digest)
+
+                        rows.append({
+                            "user_id": user_id,
+                            "title": result.get("title") or final_url,
+                            "content": result["content"],
+                            "source_url": final_url,
+                            "category": category,
+                            "keywords": keywords or [],
+                            "content_hash": digest,
+                            "is_active": True,
+                            "created_at": datetime.utcnow()
+                        })
+
+                        if len(rows) >= INGEST_INSERT_BATCH_SIZE:
+                            self._insert_new(db, job, rows)
+                            rows = []
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+            if rows:
+                self._insert_new(db, job, rows)
+
+            job["status"] = "completed"
+            logger.info(
+                f"Ingest job {job_id}: {job['created']} created, "
+                f"{job['duplicates']} duplicates, {job['failed']} failed"
+            )
+        except Exception as e:
+            db.rollback()
+            job["status"] = "failed"
+            job["errors"].append({"url": None, "error": str(e)})
+            logger.error(f"Ingest job {job_id} failed: {e}")
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            job["_finished"] = time.monotonic()
+            db.close()
+
+    def _existing_urls(self, db, user_id: int, urls: Set[str]) -> Set[str]:
+        """Canonical forms of those of `urls` the user already has a document for."""
+        found = set()
+        urls = list(urls)
+        for start in range(0, len(urls), INGEST_LOOKUP_BATCH_SIZE):
+            matches = db.query(KnowledgeDoc.source_url).filter(
+                KnowledgeDoc.user_id == user_id,
+                KnowledgeDoc.source_url.in_(urls[start:start + INGEST_LOOKUP_BATCH_SIZE])
+            )
+            found.update(canonicalize_url(source_url) for (source_url,) in matches)
+        return found
+
+    def _insert_new(self, db, job: Dict, rows: List[Dict]):
+        """Insert the rows whose final URL or content the user doesn't already have."""
+        existing = db.query(KnowledgeDoc.source_url, KnowledgeDoc.content_hash).filter(
+            KnowledgeDoc.user_id == job["user_id"],
+            or_(
+                KnowledgeDoc.source_url.in_({row["source_url"] for row in rows}),
+                KnowledgeDoc.content_hash.in_({row["content_hash"] for row in rows})
+            )
+        ).all()
+        existing_urls = {row.source_url for row in existing}
+        existing_hashes = {row.content_hash for row in existing}
+        new_rows = [
+            row for row in rows
+            if row["source_url"] not in existing_urls and row["content_hash"] not in existing_hashes
+        ]
+        job["duplicates"] += len(rows) - len(new_rows)
+        if new_rows:
+            self._insert_rows(db, new_rows)
+            job["created"] += len(new_rows)
+
+    def _insert_rows(self, db, rows: List[Dict]):
+        """Insert a batch of documents as one multi-row INSERT."""
+        db.execute(insert(KnowledgeDoc), rows)
+        bump_versions(db, KnowledgeDoc, {row["user_id"] for row in rows})
+        db.commit()
+
+    def _prune_jobs(self):
+        cutoff = time.monotonic() - INGEST_JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["_finished"] is not None and job["_finished"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+# Global knowledge ingestor instance
+knowledge_ingestor = KnowledgeIngestor()
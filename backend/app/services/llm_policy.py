@@ -0,0 +1,245 @@
+import asyncio
+import os
+import time
+import logging
+from collections import deque
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.services.metrics import LLM_REQUESTS_TOTAL, LLM_WINNER_SECONDS
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers, http_check
+from app.integrations.openai_batch import OPENAI_BASE_URL
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "gpt-3.5-turbo")
+OPENAI_FALLBACK_BASE_URL = os.getenv("OPENAI_FALLBACK_BASE_URL")
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "1.5"))
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "6"))
+LLM_HEDGE_PERCENTILE = 95
+LLM_LATENCY_WINDOW = 200
+LLM_MIN_SAMPLES = 20
+
+PATH_PRIMARY = "primary"
+PATH_HEDGE = "hedge"
+PATH_FALLBACK = "fallback"
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+def _models_probe(base_url: str, api_key_env: str):
+    """Health probe listing models on an OpenAI-compatible endpoint."""
+    async def probe() -> bool:
+        api_key = os.getenv(api_key_env, os.getenv("OPENAI_API_KEY"))
+        return await http_check(f"{base_url.rstrip('/')}/models", {"Authorization": f"Bearer {api_key}"})
+    return probe
+
+class GenerationPolicy:
+    def __init__(
+        self,
+        model: str = OPENAI_MODEL,
+        fallback_model: Optional[str] = OPENAI_FALLBACK_MODEL,
+        deadline: float = LLM_DEADLINE_SECONDS
+    ):
+        """
+        Deadline-bounded chat completions with hedging and model fallback.
+
+        The primary request gets a hedged duplicate once it has been
+        outstanding longer than the recent p95 latency. If every primary
+        attempt fails, or half the deadline passes without an answer, the
+        fallback model (optionally on its own endpoint) joins the race.
+        The first success wins and the rest are cancelled.
+
+        Retries are disabled on the clients; hedging replaces them. Clients
+        are created on first use, since importing the openai SDK is the
+        single largest cost of app startup.
+
+        Each endpoint has a circuit breaker. While the primary's is open the
+        fallback is tried straight away; with both open, calls raise
+        CircuitOpenError without waiting.
+        """
+        self.model = model
+        self.fallback_model = fallback_model or None
+        self.deadline = deadline
+        # Calls slower than the point where fallback starts count against the endpoint
+        self.breaker = circuit_breakers.register("openai", _models_probe(OPENAI_BASE_URL, "OPENAI_API_KEY"), deadline / 2)
+        self.fallback_breaker = self.breaker
+        if OPENAI_FALLBACK_BASE_URL:
+            self.fallback_breaker = circuit_breakers.register(
+                "openai_fallback", _models_probe(OPENAI_FALLBACK_BASE_URL, "OPENAI_FALLBACK_API_KEY"), deadline / 2
+            )
+        self._client = None
+        self._fallback_client = None
+        self.latencies = deque(maxlen=LLM_LATENCY_WINDOW)
+        self.first_token_latencies = deque(maxlen=LLM_LATENCY_WINDOW)
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=self.deadline)
+        return self._client
+
+    @property
+    def fallback_client(self) -> "AsyncOpenAI":
+        if not OPENAI_FALLBACK_BASE_URL:
+            return self.client
+        if self._fallback_client is None:
+            from openai import AsyncOpenAI
+            self._fallback_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_FALLBACK_API_KEY", os.getenv("OPENAI_API_KEY")),
+                base_url=OPENAI_FALLBACK_BASE_URL,
+                max_retries=0,
+                timeout=self.deadline
+            )
+        return self._fallback_client
+
+    def hedge_delay(self, latencies: Optional[deque] = None) -> float:
+        """Recent p95 latency of successful primary calls, or a default until warmed up."""
+        latencies = self.latencies if latencies is None else latencies
+        if len(latencies) < LLM_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_SECONDS
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))]
+        return max(LLM_HEDGE_MIN_SECONDS, p95)
+
+    async def complete(self, messages: List[Dict], **params) -> Tuple[object, str]:
+        """
+        Run a chat completion under the policy.
+
+        Returns:
+            (response, path) where path is "primary", "hedge" or "fallback"
+        """
+        async def start(client, model):
+            return await client.chat.completions.create(model=model, messages=messages, **params)
+
+        return await self._race(start, self.latencies)
+
+    async def open_stream(self, messages: List[Dict], **params) -> Tuple[object, object, str]:
+        """
+        Start a streaming chat completion under the policy.
+
+        Attempts race to their first chunk, so hedging and fallback bound
+        time-to-first-token; once a stream wins it is read to completion.
+
+        Returns:
+            (first_chunk, stream, path)
+        """
+        async def start(client, model):
+            stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+            try:
+                return await stream.__anext__(), stream
+            except BaseException:
+                await stream.response.aclose()
+                raise
+
+        async def discard(result):
+            await result[1].response.aclose()
+
+        (first_chunk, stream), path = await self._race(start, self.first_token_latencies, discard)
+        return first_chunk, stream, path
+
+    async def _race(
+        self,
+        start: Callable[["AsyncOpenAI", str], Awaitable],
+        latencies: deque,
+        discard: Optional[Callable[[object], Awaitable]] = None
+    ) -> Tuple[object, str]:
+        """Run `start(client, model)` as primary, hedge and fallback attempts; first success wins."""
+        primary_up = self.breaker.allow()
+        fallback_up = bool(self.fallback_model) and not self.fallback_breaker.is_open
+        if not primary_up and not fallback_up:
+            raise CircuitOpenError("OpenAI is unavailable (circuit open), try again shortly")
+
+        started = time.perf_counter()
+        deadline = started + self.deadline
+        hedge_at = started + self.hedge_delay(latencies)
+        fallback_at = started + self.deadline / 2
+
+        tasks: Dict[asyncio.Task, str] = {}
+        launched_at: Dict[asyncio.Task, float] = {}
+        failures = []
+        winner = None
+        timed_out = False
+
+        def launch(path: str):
+            client, model = (self.fallback_client, self.fallback_model) if path == PATH_FALLBACK else (self.client, self.model)
+            task = asyncio.create_task(start(client, model))
+            # Losers may fail after we've returned; consume their errors quietly
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            tasks[task] = path
+            launched_at[task] = time.perf_counter()
+
+        def breaker_for(path: str) -> CircuitBreaker:
+            return self.fallback_breaker if path == PATH_FALLBACK else self.breaker
+
+        launch(PATH_PRIMARY if primary_up else PATH_FALLBACK)
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    timed_out = True
+                    raise LLMDeadlineExceeded(f"No completion within {self.deadline:.0f}s")
+
+                launched = set(tasks.values())
+                can_hedge = primary_up and PATH_HEDGE not in launched
+                can_fallback = fallback_up and PATH_FALLBACK not in launched
+                next_event = deadline
+                if can_hedge:
+                    next_event = min(next_event, hedge_at)
+                if can_fallback:
+                    next_event = min(next_event, fallback_at)
+
+                pending = [task for task in tasks if not task.done()]
+                if pending:
+                    done, _ = await asyncio.wait(pending, timeout=max(0.0, next_event - now), return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    done = set()
+
+                for task in done:
+                    path = tasks[task]
+                    took = time.perf_counter() - launched_at[task]
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = task
+                            breaker_for(path).record(True, took)
+                        continue
+                    failures.append(f"{path}: {task.exception()}")
+                    breaker_for(path).record(False, took, str(task.exception()))
+                    LLM_REQUESTS_TOTAL.labels(path=path, outcome="failed").inc()
+
+                if winner is not None:
+                    path = tasks[winner]
+                    elapsed = time.perf_counter() - started
+                    if path != PATH_FALLBACK:
+                        latencies.append(elapsed)
+                    LLM_REQUESTS_TOTAL.labels(path=path, outcome="won").inc()
+                    LLM_WINNER_SECONDS.labels(path=path).observe(elapsed)
+                    return winner.result(), path
+
+                now = time.perf_counter()
+                all_failed = all(task.done() for task in tasks)
+                if can_hedge and (now >= hedge_at or all_failed):
+                    launch(PATH_HEDGE)
+                elif can_fallback and (now >= fallback_at or all_failed):
+                    launch(PATH_FALLBACK)
+                elif all_failed:
+                    raise Exception("; ".join(failures))
+        finally:
+            for task, path in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    LLM_REQUESTS_TOTAL.labels(path=path, outcome="cancelled").inc()
+                    if timed_out:
+                        breaker_for(path).record(False, time.perf_counter() - launched_at[task], "deadline exceeded")
+                elif task is not winner and not task.cancelled() and task.exception() is None:
+                    # Finished in the same wakeup as the winner
+                    LLM_REQUESTS_TOTAL.labels(path=path, outcome="cancelled").inc()
+                    if discard:
+                        await discard(task.result())
+
+# Global generation policy instance
+generation_policy = GenerationPolicy()
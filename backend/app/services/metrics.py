@@ -0,0 +1,116 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets span fast API calls through multi-second LLM completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "scheduled_post_stage_duration_seconds",
+    "Latency of each stage of the scheduled post pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+POSTS_TOTAL = Counter(
+    "posts_published_total",
+    "Outcomes of publish attempts by platform and resulting post status",
+    ["platform", "status"]
+)
+
+SCHEDULER_JOBS = Gauge(
+    "scheduler_jobs",
+    "Schedules with a job registered in the scheduler"
+)
+
+SCHEDULED_POSTS_IN_PROGRESS = Gauge(
+    "scheduled_posts_in_progress",
+    "Scheduled post executions currently running"
+)
+
+SCHEDULED_POSTS_WAITING = Gauge(
+    "scheduled_posts_waiting",
+    "Scheduled post executions due but waiting for an execution slot"
+)
+
+TENANT_QUEUE_DEPTH = Gauge(
+    "scheduled_posts_tenant_queue_depth",
+    "Scheduled post executions waiting for a slot, per user with queued work",
+    ["user_id"]
+)
+
+TENANT_QUEUE_WAIT_SECONDS = Histogram(
+    "scheduled_post_queue_wait_seconds",
+    "Time scheduled post executions wait for a fair-share execution slot",
+    buckets=LATENCY_BUCKETS
+)
+
+SCHEDULE_DISPATCH_LAG_SECONDS = Histogram(
+    "schedule_dispatch_lag_seconds",
+    "Delay between a schedule's next_run_at and the database poller dispatching it",
+    buckets=LATENCY_BUCKETS
+)
+
+MISSED_RUNS_REPLAYED_TOTAL = Counter(
+    "scheduled_runs_replayed_total",
+    "Schedule slots missed during downtime and replayed by catch-up"
+)
+
+LLM_REQUESTS_TOTAL = Counter(
+    "llm_requests_total",
+    "LLM completion attempts by policy path (primary, hedge, fallback) and outcome",
+    ["path", "outcome"]
+)
+
+LLM_WINNER_SECONDS = Histogram(
+    "llm_completion_duration_seconds",
+    "Latency of policy-managed LLM completions, labelled by the path that won",
+    ["path"],
+    buckets=LATENCY_BUCKETS
+)
+
+CIRCUIT_BREAKER_OPEN = Gauge(
+    "circuit_breaker_open",
+    "1 while the circuit breaker for an external dependency is open",
+    ["dependency"]
+)
+
+CIRCUIT_BREAKER_REJECTED_TOTAL = Counter(
+    "circuit_breaker_rejected_total",
+    "Calls failed fast because the dependency's circuit breaker was open",
+    ["dependency"]
+)
+
+ENGAGEMENT_LOOKUPS_TOTAL = Counter(
+    "engagement_lookups_total",
+    "Batched engagement metric lookups by platform and outcome",
+    ["platform", "outcome"]
+)
+
+ENGAGEMENT_SAMPLES_TOTAL = Counter(
+    "engagement_samples_total",
+    "Engagement samples stored for published posts"
+)
+
+TREND_SOURCE_FETCHES_TOTAL = Counter(
+    "trend_source_fetches_total",
+    "Trend source fetches by source and outcome (ok, not_modified, timeout, error)",
+    ["source", "outcome"]
+)
+
+CONTENT_FIT_TOTAL = Counter(
+    "content_fit_total",
+    "Pre-publish length checks by platform and outcome (ok, trimmed, rewritten, rejected)",
+    ["platform", "outcome"]
+)
+
+# Stage names used with PIPELINE_STAGE_SECONDS
+STAGE_KB_QUERY = "kb_query"
+STAGE_TRENDS_FETCH = "trends_fetch"
+STAGE_LLM_GENERATION = "llm_generation"
+STAGE_PLATFORM_PUBLISH = "platform_publish"
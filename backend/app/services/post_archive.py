@@ -0,0 +1,292 @@
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Set, TextIO
+from sqlalchemy import DateTime, column, delete, func, select, table, text, tuple_
+from sqlalchemy.engine import Connection
+from app.database import SessionLocal, engine
+from app.models.models import Post, PostMetric, POSTS_PARTITIONED
+from app.services.change_versions import bump_versions
+from app.services.dedup import duplicate_index
+
+logger = logging.getLogger(__name__)
+
+# Moving old posts out of the database is opt-in: the archive directory must
+# be durable storage, not a container's scratch filesystem
+POSTS_ARCHIVE_ENABLED = os.getenv("POSTS_ARCHIVE_ENABLED", "false").lower() == "true"
+POSTS_ARCHIVE_DIR = os.getenv("POSTS_ARCHIVE_DIR", "./archive/posts")
+# Months kept in the database, not counting the current one
+POSTS_RETENTION_MONTHS = max(1, int(os.getenv("POSTS_RETENTION_MONTHS", "12")))
+# Monthly partitions created ahead of time, so inserts never land in the default one
+POSTS_PARTITIONS_AHEAD = int(os.getenv("POSTS_PARTITIONS_AHEAD", "2"))
+POSTS_ARCHIVE_MAINTENANCE_HOURS = int(os.getenv("POSTS_ARCHIVE_MAINTENANCE_HOURS", "24"))
+POSTS_ARCHIVE_BATCH_SIZE = 1000
+
+PARTITION_RE = re.compile(r"^posts_(\d{4})_(\d{2})$")
+MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+class PostArchiver:
+    def __init__(self, archive_dir: str = POSTS_ARCHIVE_DIR, retention_months: int = POSTS_RETENTION_MONTHS):
+        """
+        Keeps the posts table bounded: monthly partitions in, archived months out.
+
+        On PostgreSQL each month of posts is its own partition. Partitions are
+        created ahead of time, and a month past the retention window is
+        exported and then dropped whole, with no vacuum debt. SQLite, and
+        PostgreSQL databases created before partitioning, keep one table;
+        there the month is exported and then deleted in batches.
+
+        Archived months are written as gzipped NDJSON, one file per user
+        (<dir>/posts-YYYY-MM/user-<id>.ndjson.gz). Each record carries the
+        post's engagement samples, and a user's month can be read back on
+        demand.
+        """
+        self.archive_dir = archive_dir
+        self.retention_months = retention_months
+
+    def maintain(self, archive: bool = POSTS_ARCHIVE_ENABLED) -> Dict:
+        """Create upcoming partitions, then archive months past retention. Blocking; run off the event loop."""
+        now = datetime.utcnow()
+        created = self.ensure_partitions(now)
+        archived = []
+        if archive:
+            cutoff = add_months(month_start(now), -self.retention_months)
+            for month in self.months_before(cutoff):
+                self.archive_month(month)
+                archived.append(month.strftime("%Y-%m"))
+        return {"partitions_created": created, "archived": archived}
+
+    def is_partitioned(self, connection: Connection) -> bool:
+        if not POSTS_PARTITIONED:
+            return False
+        return connection.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'posts'::regclass"
+        )).first() is not None
+
+    def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Create the partitions for this month and the next POSTS_PARTITIONS_AHEAD; no-op without partitioning."""
+        now = now or datetime.utcnow()
+        created = []
+        with engine.begin() as connection:
+            if not self.is_partitioned(connection):
+                return created
+            existing = self._partitions(connection)
+            connection.execute(text("CREATE TABLE IF NOT EXISTS posts_default PARTITION OF posts DEFAULT"))
+            for offset in range(POSTS_PARTITIONS_AHEAD + 1):
+                month = add_months(month_start(now), offset)
+                if month in existing:
+                    continue
+                name = f"posts_{month:%Y_%m}"
+                connection.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF posts "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+        if created:
+            logger.info(f"Created posts partitions: {', '.join(created)}")
+        return created
+
+    def months_before(self, cutoff: date) -> List[date]:
+        """Months before `cutoff` that still have posts in the database."""
+        with engine.connect() as connection:
+            if self.is_partitioned(connection):
+                months = set(self._partitions(connection))
+                # Stray rows in the default partition are archived with their month too
+                months.update(self._months_with_posts(connection, "posts_default", cutoff))
+            else:
+                months = self._months_with_posts(connection, Post.__tablename__, cutoff)
+        return sorted(month for month in months if month < cutoff)
+
+    def archive_month(self, month: date):
+        """Export one month of posts to the archive, then remove it from the database."""
+        label = month.strftime("%Y-%m")
+        final_dir = os.path.join(self.archive_dir, f"posts-{label}")
+        # A finished export from an earlier run that stopped before the drop is reused
+        if os.path.isdir(final_dir):
+            user_ids, account_ids = self._archived_owners(final_dir)
+        else:
+            partial_dir = final_dir + ".partial"
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            os.makedirs(partial_dir)
+            user_ids, account_ids = self._export(month, partial_dir)
+            os.rename(partial_dir, final_dir)
+
+        self._remove(month)
+        # Their lists and near-duplicate indexes no longer include these posts
+        db = SessionLocal()
+        try:
+            bump_versions(db, Post, user_ids)
+            db.commit()
+        finally:
+            db.close()
+        for account_id in account_ids:
+            duplicate_index.invalidate(account_id)
+        logger.info(f"Archived posts from {label} for {len(user_ids)} users to {final_dir}")
+
+    def archived_months(self, user_id: int) -> List[str]:
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(
+            name[len("posts-"):] for name in os.listdir(self.archive_dir)
+            if name.startswith("posts-") and not name.endswith(".partial")
+            and os.path.exists(os.path.join(self.archive_dir, name, f"user-{user_id}.ndjson.gz"))
+        )
+
+    def read_archive(self, user_id: int, month: str) -> Optional[Iterator[str]]:
+        """NDJSON lines of a user's archived posts for "YYYY-MM", or None if there are none."""
+        if not MONTH_RE.match(month):
+            return None
+        path = os.path.join(self.archive_dir, f"posts-{month}", f"user-{user_id}.ndjson.gz")
+        if not os.path.exists(path):
+            return None
+
+        def lines() -> Iterator[str]:
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                yield from archive
+        return lines()
+
+    def _partitions(self, connection: Connection) -> List[date]:
+        names = connection.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'posts'::regclass"
+        )).scalars()
+        return [date(int(match.group(1)), int(match.group(2)), 1) for match in map(PARTITION_RE.match, names) if match]
+
+    def _months_with_posts(self, connection: Connection, name: str, cutoff: date) -> Set[date]:
+        """Distinct months before `cutoff` in table `name`, one min() lookup per month."""
+        created_at = column("created_at", DateTime)
+        posts = table(name, created_at)
+        months = set()
+        start = date.min
+        while True:
+            oldest = connection.execute(
+                select(func.min(created_at)).select_from(posts).where(created_at >= start, created_at < cutoff)
+            ).scalar()
+            if oldest is None:
+                return months
+            months.add(month_start(oldest))
+            start = add_months(month_start(oldest), 1)
+
+    def _month_filter(self, month: date):
+        return (Post.created_at >= month, Post.created_at < add_months(month, 1))
+
+    def _export(self, month: date, directory: str):
+        """Write each user's posts for the month, with their metrics, to its own gzipped NDJSON file."""
+        user_ids: Set[int] = set()
+        account_ids: Set[int] = set()
+        current_user = None
+        output: Optional[TextIO] = None
+        # Ownerless rows are exported as user 0 rather than skipped, since the month is dropped whole
+        owner = func.coalesce(Post.user_id, 0)
+        last = (-1, 0)
+        db = SessionLocal()
+        try:
+            while True:
+                # Keyset pages in (user_id, id) order, so each user's file is written in one pass
+                posts = db.query(Post).filter(
+                    *self._month_filter(month),
+                    tuple_(owner, Post.id) > tuple_(*last)
+                ).order_by(owner, Post.id).limit(POSTS_ARCHIVE_BATCH_SIZE).all()
+                if not posts:
+                    break
+                last = (posts[-1].user_id or 0, posts[-1].id)
+
+                samples = defaultdict(list)
+                for metric in db.query(PostMetric).filter(
+                    PostMetric.post_id.in_([post.id for post in posts])
+                ).order_by(PostMetric.post_id, PostMetric.collected_at):
+                    samples[metric.post_id].append({
+                        "collected_at": metric.collected_at.isoformat(),
+                        "impressions": metric.impressions,
+                        "likes": metric.likes,
+                        "replies": metric.replies,
+                        "reposts": metric.reposts,
+                        "quotes": metric.quotes,
+                        "bookmarks": metric.bookmarks
+                    })
+
+                for post in posts:
+                    if (post.user_id or 0) != current_user:
+                        if output:
+                            output.close()
+                        current_user = post.user_id or 0
+                        user_ids.add(current_user)
+                        output = gzip.open(os.path.join(directory, f"user-{current_user}.ndjson.gz"), "wt", encoding="utf-8")
+                    account_ids.add(post.social_account_id)
+                    output.write(json.dumps(self._record(post, samples[post.id])) + "\n")
+                db.expunge_all()
+        finally:
+            if output:
+                output.close()
+            db.close()
+        return user_ids, account_ids
+
+    def _record(self, post: Post, metrics: List[Dict]) -> Dict:
+        return {
+            "id": post.id,
+            "social_account_id": post.social_account_id,
+            "schedule_id": post.schedule_id,
+            "content": post.content,
+            "media_urls": post.media_urls,
+            "platform": post.platform.value,
+            "status": post.status.value if post.status else None,
+            "scheduled_at": _isoformat(post.scheduled_at),
+            "posted_at": _isoformat(post.posted_at),
+            "platform_post_id": post.platform_post_id,
+            "platform_post_url": post.platform_post_url,
+            "error_message": post.error_message,
+            "ai_generated": post.ai_generated,
+            "execution_ms": post.execution_ms,
+            "created_at": _isoformat(post.created_at),
+            "metrics": metrics
+        }
+
+    def _archived_owners(self, directory: str):
+        user_ids, account_ids = set(), set()
+        for name in os.listdir(directory):
+            user_ids.add(int(name[len("user-"):-len(".ndjson.gz")]))
+            with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as archive:
+                account_ids.update(json.loads(line)["social_account_id"] for line in archive)
+        return user_ids, account_ids
+
+    def _remove(self, month: date):
+        """
+        Drop the month's partition, or delete its rows in batches without partitioning.
+
+        Core statements, so the post_stats rollup keeps counting archived posts.
+        """
+        in_month = select(Post.id).where(*self._month_filter(month))
+        with engine.begin() as connection:
+            connection.execute(delete(PostMetric).where(PostMetric.post_id.in_(in_month)))
+            if self.is_partitioned(connection):
+                name = f"posts_{month:%Y_%m}"
+                if month in self._partitions(connection):
+                    connection.execute(text(f"ALTER TABLE posts DETACH PARTITION {name}"))
+                    connection.execute(text(f"DROP TABLE {name}"))
+                connection.execute(delete(Post).where(*self._month_filter(month)))
+                return
+
+        while True:
+            with engine.begin() as connection:
+                batch = connection.execute(in_month.limit(POSTS_ARCHIVE_BATCH_SIZE)).scalars().all()
+                if not batch:
+                    return
+                connection.execute(delete(Post).where(Post.id.in_(batch)))
+
+# Global post archiver instance
+post_archiver = PostArchiver()
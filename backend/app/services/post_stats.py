@@ -0,0 +1,134 @@
+import logging
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app.database import SessionLocal
+from app.models.models import Post, PostStat, PostStatus
+
+logger = logging.getLogger(__name__)
+
+# Day of the all-time row kept next to each user's daily rows
+ALL_TIME = date(1, 1, 1)
+
+# Rollup key: (user_id, day, platform, status)
+StatKey = Tuple[int, date, str, str]
+
+def _key(post: Post, status) -> StatKey:
+    created = post.created_at or datetime.utcnow()
+    return (post.user_id, created.date(), _value(post.platform), _value(status))
+
+def _value(enum_or_str) -> str:
+    return getattr(enum_or_str, "value", enum_or_str)
+
+def _upsert(db: Session, deltas: Counter):
+    """Add each delta to its daily and all-time rows with one INSERT ... ON CONFLICT."""
+    totals = Counter()
+    for (user_id, day, platform, status), delta in deltas.items():
+        if user_id is None:
+            continue
+        totals[(user_id, day, platform, status)] += delta
+        totals[(user_id, ALL_TIME, platform, status)] += delta
+    rows = [
+        {"user_id": user_id, "day": day, "platform": platform, "status": status, "post_count": delta}
+        for (user_id, day, platform, status), delta in sorted(totals.items()) if delta
+    ]
+    if not rows:
+        return
+
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(PostStat)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[PostStat.user_id, PostStat.day, PostStat.platform, PostStat.status],
+            set_={"post_count": PostStat.post_count + statement.excluded.post_count}
+        ),
+        rows
+    )
+
+def count_inserted_posts(db: Session, rows: Iterable[Dict]):
+    """Count posts written with a Core insert(), in the caller's transaction."""
+    _upsert(db, Counter(
+        (row["user_id"], row["created_at"].date(), _value(row["platform"]), _value(row["status"])) for row in rows
+    ))
+
+@event.listens_for(Post.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    # active_history loads the stored status before it's overwritten, so the
+    # flush hook can move the post out of its old bucket
+    pass
+
+@event.listens_for(Session, "before_flush")
+def _update_post_stats(session: Session, flush_context, instances):
+    # Before the flush, so deleted posts can still load their status if it was expired
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Post):
+            deltas[_key(obj, obj.status or PostStatus.DRAFT)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            deltas[_key(obj, get_history(obj, "status").non_added()[0])] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Post):
+            history = get_history(obj, "status")
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                deltas[_key(obj, history.deleted[0])] -= 1
+                deltas[_key(obj, history.added[0])] += 1
+    if deltas:
+        _upsert(session, deltas)
+
+def rebuild_post_stats(db: Session) -> int:
+    """Recount every user's rollup rows from the posts table; returns the daily buckets counted."""
+    db.query(PostStat).delete(synchronize_session=False)
+    day = func.date(Post.created_at)
+    counts = db.query(Post.user_id, day, Post.platform, Post.status, func.count()).group_by(
+        Post.user_id, day, Post.platform, Post.status
+    )
+    deltas = Counter()
+    for user_id, created_day, platform, status, count in counts:
+        if isinstance(created_day, str):
+            created_day = date.fromisoformat(created_day)
+        deltas[(user_id, created_day, _value(platform), _value(status))] += count
+    _upsert(db, deltas)
+    db.commit()
+    return len(deltas)
+
+def backfill_post_stats():
+    """Build the rollup once for databases whose posts predate it; run at startup."""
+    db = SessionLocal()
+    try:
+        if db.query(PostStat.user_id).first() is None and db.query(Post.id).first() is not None:
+            buckets = rebuild_post_stats(db)
+            logger.info(f"Built post stats rollup: {buckets} daily buckets")
+    finally:
+        db.close()
+
+def user_post_stats(db: Session, user_id: int, since: date) -> Dict:
+    """Totals by status and platform, plus daily counts from `since`; reads only rollup rows."""
+    rows: List[PostStat] = db.query(PostStat).filter(
+        PostStat.user_id == user_id,
+        (PostStat.day == ALL_TIME) | (PostStat.day >= since)
+    ).all()
+
+    by_status = Counter()
+    by_platform: Dict[str, Counter] = {}
+    by_day: Dict[date, Counter] = {}
+    for row in rows:
+        if row.day == ALL_TIME:
+            by_status[row.status] += row.post_count
+            by_platform.setdefault(row.platform, Counter())[row.status] += row.post_count
+        else:
+            by_day.setdefault(row.day, Counter())[row.status] += row.post_count
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": dict(by_status),
+        "by_platform": {platform: dict(counts) for platform, counts in sorted(by_platform.items())},
+        "by_day": [{"day": day.isoformat(), **counts} for day, counts in sorted(by_day.items())]
+    }
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, List, Optional
+from app.models.models import Schedule
+
+if TYPE_CHECKING:
+    from apscheduler.triggers.base import BaseTrigger
+
+def schedule_trigger(frequency_type: str, time_slots: List[str]) -> Optional["BaseTrigger"]:
+    """
+    One trigger firing at every "HH:MM" time slot of a schedule.
+
+    Slots sharing a minute collapse into a single cron expression
+    (09:00, 13:00 and 18:00 become hour="9,13,18", minute=0); differing
+    minutes are OR-ed together. Returns None for unsupported frequencies
+    or no slots.
+
+    Triggers are stateless, so schedules with the same slots share one
+    instance; compiling cron expressions dominates registering a job.
+    """
+    return _compiled_trigger(frequency_type, tuple(sorted(set(time_slots or []))))
+
+@lru_cache(maxsize=4096)
+def _compiled_trigger(frequency_type: str, time_slots: tuple) -> Optional["BaseTrigger"]:
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.combining import OrTrigger
+
+    hours_by_minute = defaultdict(set)
+    for time_slot in time_slots:
+        hour, minute = map(int, time_slot.split(":"))
+        hours_by_minute[minute].add(hour)
+    if not hours_by_minute:
+        return None
+
+    if frequency_type == "hourly":
+        return CronTrigger(minute=",".join(str(minute) for minute in sorted(hours_by_minute)))
+    if frequency_type == "daily":
+        extra = {}
+    elif frequency_type == "weekly":
+        # Default to Monday, can be made configurable
+        extra = {"day_of_week": "mon"}
+    else:
+        return None
+
+    triggers = [
+        CronTrigger(hour=",".join(str(hour) for hour in sorted(hours)), minute=minute, **extra)
+        for minute, hours in sorted(hours_by_minute.items())
+    ]
+    return triggers[0] if len(triggers) == 1 else OrTrigger(triggers)
+
+def next_fire_time(schedule: Schedule, after: datetime) -> Optional[datetime]:
+    """First fire time of `schedule` strictly after `after`, both naive UTC."""
+    trigger = schedule_trigger(schedule.frequency_type, schedule.time_slots)
+    if trigger is None:
+        return None
+    fire_time = trigger.get_next_fire_time(None, after.replace(tzinfo=timezone.utc) + timedelta(microseconds=1))
+    return fire_time.astimezone(timezone.utc).replace(tzinfo=None) if fire_time else None
+
+def upcoming_slots(schedule: Schedule, start: datetime, end: datetime) -> List[datetime]:
+    """
+    Fire times of `schedule` in [start, end).
+
+    Takes and returns naive UTC datetimes, like the rest of the models;
+    triggers themselves run in the scheduler's local timezone.
+    """
+    trigger = schedule_trigger(schedule.frequency_type, schedule.time_slots)
+    if trigger is None:
+        return []
+    window_end = end.replace(tzinfo=timezone.utc)
+    fire_times = []
+    fire_time = trigger.get_next_fire_time(None, start.replace(tzinfo=timezone.utc))
+    while fire_time and fire_time < window_end:
+        fire_times.append(fire_time.astimezone(timezone.utc).replace(tzinfo=None))
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return fire_times
@@ -1,85 +1,473 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
-from app.models.models import Schedule, Post, PostStatus, SocialAccount, User
+from app.models.models import Schedule, Post, PostStatus, SocialAccount, User, KnowledgeDoc
 from app.services.ai_generator import AIContentGenerator
-from app.services.scraper import WebScraper
+from app.services.dedup import duplicate_index, content_signature, DuplicateContentError, DEDUP_MAX_REGENERATIONS
+from app.services.content_validator import fit_for_platform
+from app.services.metrics import (
+    POSTS_TOTAL, SCHEDULER_JOBS, SCHEDULED_POSTS_IN_PROGRESS, SCHEDULE_DISPATCH_LAG_SECONDS,
+    MISSED_RUNS_REPLAYED_TOTAL,
+    STAGE_KB_QUERY, STAGE_TRENDS_FETCH, STAGE_LLM_GENERATION, STAGE_PLATFORM_PUBLISH
+)
+from app.services.tracing import ExecutionTrace
+from app.services.fair_share import FairShareExecutor, parse_weights
+from app.services.circuit_breaker import circuit_breakers, BREAKER_PROBE_INTERVAL_SECONDS
+from app.services.token_refresher import token_refresher, TOKEN_REFRESH_INTERVAL_MINUTES
+from app.services.post_archive import post_archiver, POSTS_ARCHIVE_MAINTENANCE_HOURS
+from app.services.trend_relevance import trend_matcher, TREND_REFRESH_MINUTES
+from app.services.engagement import (
+    engagement_collector, next_collection_at, METRICS_COLLECTION_ENABLED, METRICS_INTERVAL_MINUTES
+)
+from app.services.schedule_slots import schedule_trigger, next_fire_time, upcoming_slots
+from app.services.batch_pregen import (
+    batch_pregenerator, BATCH_PREGEN_ENABLED, BATCH_PREGEN_INTERVAL_MINUTES, PATH_BATCH
+)
 from app.integrations.twitter import TwitterClient
 from app.integrations.tiktok import TikTokClient
 from app.database import SessionLocal
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Each execution holds a DB session across its awaits, so this must stay
+# below the connection pool size (5 + 10 overflow by default) or checkouts
+# block the event loop while the sessions holding connections can't finish.
+SCHEDULER_MAX_CONCURRENT_POSTS = int(os.getenv("SCHEDULER_MAX_CONCURRENT_POSTS", "10"))
+# Per-user share of those slots, so one large account can't take them all
+SCHEDULER_MAX_CONCURRENT_PER_USER = int(os.getenv("SCHEDULER_MAX_CONCURRENT_PER_USER", "5"))
+# Round-robin weights as "user_id:weight,..."; unlisted users weigh 1
+SCHEDULER_TENANT_WEIGHTS = parse_weights(os.getenv("SCHEDULER_TENANT_WEIGHTS", ""))
+
+# "apscheduler" keeps one in-memory job per schedule; "database" stores each
+# schedule's next_run_at and polls for due rows
+ENGINE_APSCHEDULER = "apscheduler"
+ENGINE_DATABASE = "database"
+SCHEDULER_ENGINE = os.getenv("SCHEDULER_ENGINE", ENGINE_APSCHEDULER)
+SCHEDULE_POLL_SECONDS = float(os.getenv("SCHEDULE_POLL_SECONDS", "5"))
+SCHEDULE_POLL_BATCH = int(os.getenv("SCHEDULE_POLL_BATCH", "500"))
+
+# Slots missed while the process was down (or too busy) are replayed if no
+# older than the grace window; 0 only keeps runs at most a minute late
+CATCHUP_GRACE_MINUTES = float(os.getenv("CATCHUP_GRACE_MINUTES", "60"))
+# "latest" replays one run per schedule however many slots it missed; "all" replays each
+CATCHUP_COALESCE = os.getenv("CATCHUP_COALESCE", "latest")
+# Replays share execution slots with on-time runs; this caps how many they take
+CATCHUP_MAX_CONCURRENT = int(os.getenv("CATCHUP_MAX_CONCURRENT", "3"))
+# Runs later than this count as missed rather than merely late
+ON_TIME_TOLERANCE = timedelta(minutes=1)
+
+# Compare-and-set advance of a due schedule; built once so polls reuse the compiled statement
+ADVANCE_NEXT_RUN = update(Schedule).where(
+    Schedule.id == bindparam("schedule_id"),
+    Schedule.next_run_at == bindparam("due_at")
+).values(next_run_at=bindparam("next_run_at"))
+
 class PostScheduler:
-    def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+    def __init__(self, engine: str = SCHEDULER_ENGINE):
+        self.engine = engine
+        self._scheduler = None
+        # Schedule id -> (frequency, time slots) of its registered job
+        self.jobs: Dict[int, Tuple] = {}
         self.ai_generator = AIContentGenerator()
-        self.scraper = WebScraper()
+        self.executor = FairShareExecutor(
+            SCHEDULER_MAX_CONCURRENT_POSTS, SCHEDULER_MAX_CONCURRENT_PER_USER, SCHEDULER_TENANT_WEIGHTS
+        )
+        # Executions dispatched by the poller, referenced until they finish
+        self.tasks: Set[asyncio.Task] = set()
+        self.catchup_slots = asyncio.Semaphore(CATCHUP_MAX_CONCURRENT)
+        # When the startup load began; jobs fire from here and catch-up covers before it
+        self.loaded_at: Optional[datetime] = None
+    
+    @property
+    def scheduler(self):
+        """The APScheduler instance, created (and APScheduler imported) on first use."""
+        if self._scheduler is None:
+            from apscheduler.schedulers.asyncio import AsyncIOScheduler
+            self._scheduler = AsyncIOScheduler()
+        return self._scheduler
+    
+    @property
+    def running(self) -> bool:
+        return self._scheduler is not None and self._scheduler.running
     
     def start(self):
         """Start the scheduler."""
+        from apscheduler.triggers.interval import IntervalTrigger
+        
+        self.scheduler.add_job(
+            token_refresher.sweep,
+            trigger=IntervalTrigger(minutes=TOKEN_REFRESH_INTERVAL_MINUTES),
+            id="token_refresh_sweep",
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        self.scheduler.add_job(
+            circuit_breakers.probe_open,
+            trigger=IntervalTrigger(seconds=BREAKER_PROBE_INTERVAL_SECONDS),
+            id="circuit_breaker_probe",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        if BATCH_PREGEN_ENABLED:
+            self.scheduler.add_job(
+                batch_pregenerator.run,
+                trigger=IntervalTrigger(minutes=BATCH_PREGEN_INTERVAL_MINUTES),
+                id="batch_pregeneration",
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        # Per-user trend shortlists, read by every generation in between
+        self.scheduler.add_job(
+            trend_matcher.refresh,
+            trigger=IntervalTrigger(minutes=TREND_REFRESH_MINUTES),
+            id="trend_refresh",
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        # Creates next months' partitions and, if enabled, archives old months
+        self.scheduler.add_job(
+            post_archiver.maintain,
+            trigger=IntervalTrigger(hours=POSTS_ARCHIVE_MAINTENANCE_HOURS),
+            id="posts_maintenance",
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        if METRICS_COLLECTION_ENABLED:
+            self.scheduler.add_job(
+                engagement_collector.collect,
+                trigger=IntervalTrigger(minutes=METRICS_INTERVAL_MINUTES),
+                id="engagement_collection",
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        if self.engine == ENGINE_DATABASE:
+            self.scheduler.add_job(
+                self.poll_due_schedules,
+                trigger=IntervalTrigger(seconds=SCHEDULE_POLL_SECONDS),
+                id="schedule_poller",
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
         self.scheduler.start()
         logger.info("Scheduler started")
     
     def shutdown(self):
         """Shutdown the scheduler."""
+        if not self.running:
+            return
         self.scheduler.shutdown()
         logger.info("Scheduler stopped")
     
     def add_schedule(self, schedule_id: int, user_id: int):
         """
-        Add a schedule to the scheduler.
+        Add a schedule to the scheduler, or update its job in place.
+        
+        Inactive or missing schedules are removed instead.
         """
         db = SessionLocal()
         try:
             schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
             if not schedule or not schedule.is_active:
+                self.remove_schedule(schedule_id)
                 return
             
-            # Parse time slots and create cron triggers
-            if schedule.time_slots:
-                for time_slot in schedule.time_slots:
-                    hour, minute = map(int, time_slot.split(":"))
-                    
-                    # Create cron trigger based on frequency type
-                    if schedule.frequency_type == "daily":
-                        trigger = CronTrigger(hour=hour, minute=minute)
-                    elif schedule.frequency_type == "weekly":
-                        # Default to Monday, can be made configurable
-                        trigger = CronTrigger(day_of_week="mon", hour=hour, minute=minute)
-                    elif schedule.frequency_type == "hourly":
-                        trigger = CronTrigger(minute=minute)
-                    else:
-                        continue
-                    
-                    # Add job to scheduler
-                    job_id = f"schedule_{schedule_id}_{time_slot}"
-                    self.scheduler.add_job(
-                        self._execute_scheduled_post,
-                        trigger=trigger,
-                        args=[schedule_id, user_id],
-                        id=job_id,
-                        replace_existing=True
-                    )
-                    
-                    logger.info(f"Added job {job_id} for user {user_id}")
+            if self.engine == ENGINE_DATABASE:
+                schedule.next_run_at = next_fire_time(schedule, datetime.utcnow())
+                db.commit()
+                return
+            
+            if self._register(schedule):
+                logger.info(f"Registered job {self._job_id(schedule_id)} for user {user_id}")
+        finally:
+            db.close()
+    
+    def load_schedules(self):
+        """
+        Register jobs for every active schedule; run at startup.
+        
+        Safe to call from a worker thread once the scheduler is running,
+        so a large load doesn't block the event loop.
+        """
+        if self.engine == ENGINE_DATABASE:
+            self._backfill_next_runs()
+            return
+        
+        self.loaded_at = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            schedules = db.query(Schedule).filter(Schedule.is_active == True).yield_per(1000)
+            for schedule in schedules:
+                try:
+                    self._register(schedule, since=self.loaded_at)
+                except ValueError as e:
+                    logger.error(f"Skipping schedule {schedule.id} with invalid time slots: {e}")
         finally:
             db.close()
+        logger.info(f"Loaded {len(self.jobs)} schedules")
     
     def remove_schedule(self, schedule_id: int):
         """Remove a schedule from the scheduler."""
-        jobs = self.scheduler.get_jobs()
-        for job in jobs:
-            if job.id.startswith(f"schedule_{schedule_id}_"):
-                self.scheduler.remove_job(job.id)
-                logger.info(f"Removed job {job.id}")
+        if self.engine == ENGINE_DATABASE:
+            db = SessionLocal()
+            try:
+                db.query(Schedule).filter(Schedule.id == schedule_id).update({Schedule.next_run_at: None})
+                db.commit()
+            finally:
+                db.close()
+            return
+        
+        if self.jobs.pop(schedule_id, None) is None:
+            return
+        from apscheduler.jobstores.base import JobLookupError
+        try:
+            self.scheduler.remove_job(self._job_id(schedule_id))
+            logger.info(f"Removed job {self._job_id(schedule_id)}")
+        except JobLookupError:
+            pass
+    
+    async def poll_due_schedules(self) -> int:
+        """
+        Dispatch every active schedule whose next_run_at has passed.
+        
+        Due rows are fetched in fire-time order and advanced to their next
+        fire time before dispatch. The advance is a compare-and-set on the
+        old next_run_at, so concurrent pollers dispatch each run once. A
+        schedule overdue by several slots (e.g. after downtime) is replayed
+        under the catch-up policy.
+        
+        Returns:
+            Number of schedules dispatched
+        """
+        dispatched = 0
+        db = SessionLocal()
+        try:
+            while True:
+                now = datetime.utcnow()
+                due = db.query(
+                    Schedule.id, Schedule.user_id, Schedule.frequency_type, Schedule.time_slots, Schedule.next_run_at
+                ).filter(
+                    Schedule.next_run_at <= now,
+                    Schedule.is_active == True
+                ).order_by(Schedule.next_run_at).limit(SCHEDULE_POLL_BATCH).all()
+                
+                claimed = []
+                connection = db.connection()
+                for row in due:
+                    runs = self._missed_runs(row, row.next_run_at, now)
+                    try:
+                        next_run_at = next_fire_time(row, now)
+                    except ValueError as e:
+                        logger.error(f"Schedule {row.id} has invalid time slots, no longer polling it: {e}")
+                        next_run_at = None
+                    advanced = connection.execute(ADVANCE_NEXT_RUN, {
+                        "schedule_id": row.id,
+                        "due_at": row.next_run_at,
+                        "next_run_at": next_run_at
+                    })
+                    if advanced.rowcount:
+                        claimed.append((row, runs))
+                db.commit()
+                
+                # Dispatch only once the advance is committed: at most once per slot
+                for row, runs in claimed:
+                    if not runs:
+                        logger.warning(f"Dropping missed runs of schedule {row.id} due since {row.next_run_at}: older than the catch-up window")
+                        continue
+                    SCHEDULE_DISPATCH_LAG_SECONDS.observe((now - row.next_run_at).total_seconds())
+                    if now - row.next_run_at > ON_TIME_TOLERANCE:
+                        self._dispatch(self._replay(row.id, row.user_id, runs))
+                    else:
+                        self._dispatch(self._execute_scheduled_post(row.id, row.user_id))
+                    dispatched += 1
+                
+                if len(due) < SCHEDULE_POLL_BATCH:
+                    break
+                # Let dispatched executions and requests run between batches
+                await asyncio.sleep(0)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Schedule poll failed after dispatching {dispatched}: {e}")
+        finally:
+            db.close()
+        
+        if dispatched:
+            logger.info(f"Dispatched {dispatched} due schedules")
+        return dispatched
+    
+    async def catch_up_missed_runs(self) -> int:
+        """
+        Replay slots missed while the process was down; run once at startup.
+        
+        A schedule's slots since its last successful run (or creation) are
+        filtered by the grace window and coalescing policy, and replays are
+        capped at CATCHUP_MAX_CONCURRENT so a restart doesn't release a burst
+        of LLM and publish calls. The database engine's poller replays
+        overdue rows itself.
+        
+        Returns:
+            Number of runs scheduled for replay
+        """
+        if self.engine == ENGINE_DATABASE:
+            return 0
+        
+        missed = await asyncio.to_thread(self._find_missed_runs, self.loaded_at or datetime.utcnow())
+        for schedule_id, user_id, runs in missed:
+            self._dispatch(self._replay(schedule_id, user_id, runs))
+        
+        replayed = sum(len(runs) for _, _, runs in missed)
+        logger.info(f"Replaying {replayed} missed runs across {len(missed)} schedules")
+        return replayed
+    
+    def update_metrics(self):
+        """Refresh scheduler gauges; called when metrics are scraped."""
+        SCHEDULER_JOBS.set(len(self.jobs))
+    
+    def _missed_runs(self, schedule, since: datetime, now: datetime) -> List[datetime]:
+        """Fire times of `schedule` in [since, now] to replay under the grace window and coalescing policy."""
+        cutoff = now - max(timedelta(minutes=CATCHUP_GRACE_MINUTES), ON_TIME_TOLERANCE)
+        try:
+            runs = upcoming_slots(schedule, max(since, cutoff), now + timedelta(microseconds=1))
+        except ValueError:
+            return []
+        return runs if CATCHUP_COALESCE == "all" else runs[-1:]
+    
+    def _find_missed_runs(self, now: datetime) -> List[Tuple[int, int, List[datetime]]]:
+        """(schedule id, user id, runs to replay) for active schedules that missed slots."""
+        missed = []
+        db = SessionLocal()
+        try:
+            schedules = db.query(
+                Schedule.id, Schedule.user_id, Schedule.frequency_type, Schedule.time_slots,
+                Schedule.last_run, Schedule.created_at
+            ).filter(Schedule.is_active == True).yield_per(1000)
+            for row in schedules:
+                since = row.last_run or row.created_at
+                if since is None:
+                    continue
+                # Start just after the last run so the slot it served isn't replayed
+                runs = self._missed_runs(row, since + timedelta(microseconds=1), now)
+                if runs:
+                    missed.append((row.id, row.user_id, runs))
+        finally:
+            db.close()
+        return missed
+    
+    def _dispatch(self, execution: Awaitable):
+        """Run an execution in the background, keeping a reference until it finishes."""
+        task = asyncio.ensure_future(execution)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def _replay(self, schedule_id: int, user_id: int, runs: List[datetime]):
+        """Replay missed runs of one schedule in order, within the catch-up concurrency cap."""
+        for run in runs:
+            logger.info(f"Replaying run of schedule {schedule_id} missed at {run}")
+            async with self.catchup_slots:
+                await self._execute_scheduled_post(schedule_id, user_id)
+            MISSED_RUNS_REPLAYED_TOTAL.inc()
+    
+    def _backfill_next_runs(self):
+        """Compute next_run_at for active schedules that don't have one yet."""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            last_id = 0
+            backfilled = 0
+            while True:
+                # Keyset pages, so memory stays flat however many schedules exist
+                page = db.query(Schedule.id, Schedule.frequency_type, Schedule.time_slots).filter(
+                    Schedule.is_active == True,
+                    Schedule.next_run_at.is_(None),
+                    Schedule.id > last_id
+                ).order_by(Schedule.id).limit(1000).all()
+                if not page:
+                    break
+                
+                updates = []
+                for row in page:
+                    try:
+                        updates.append({"id": row.id, "next_run_at": next_fire_time(row, now)})
+                    except ValueError as e:
+                        logger.error(f"Skipping schedule {row.id} with invalid time slots: {e}")
+                if updates:
+                    db.execute(update(Schedule), updates)
+                db.commit()
+                backfilled += len(updates)
+                last_id = page[-1].id
+        finally:
+            db.close()
+        logger.info(f"Backfilled next_run_at for {backfilled} schedules")
+    
+    def _job_id(self, schedule_id: int) -> str:
+        return f"schedule_{schedule_id}"
+    
+    def _register(self, schedule: Schedule, since: Optional[datetime] = None) -> bool:
+        """
+        Create or reschedule the single job for a schedule.
+        
+        A new job's first run is the first slot after `since` (naive UTC)
+        if given, so slots passing during a long load still fire.
+        Returns False when nothing changed.
+        """
+        key = (schedule.frequency_type, tuple(sorted(set(schedule.time_slots or []))))
+        if self.jobs.get(schedule.id) == key:
+            return False
+        
+        # All time slots compile into one trigger, so each schedule is one job
+        trigger = schedule_trigger(schedule.frequency_type, schedule.time_slots)
+        if trigger is None:
+            self.remove_schedule(schedule.id)
+            return False
+        
+        job_id = self._job_id(schedule.id)
+        if schedule.id in self.jobs:
+            self.scheduler.reschedule_job(job_id, trigger=trigger)
+        else:
+            options = {}
+            if since is not None:
+                options["next_run_time"] = trigger.get_next_fire_time(None, since.replace(tzinfo=timezone.utc))
+            self.scheduler.add_job(
+                self._execute_scheduled_post,
+                trigger=trigger,
+                args=[schedule.id, schedule.user_id],
+                id=job_id,
+                # Late runs (e.g. a stalled loop) follow the catch-up policy too
+                misfire_grace_time=int(max(timedelta(minutes=CATCHUP_GRACE_MINUTES), ON_TIME_TOLERANCE).total_seconds()),
+                coalesce=CATCHUP_COALESCE != "all",
+                replace_existing=True,
+                **options
+            )
+        self.jobs[schedule.id] = key
+        return True
     
     async def _execute_scheduled_post(self, schedule_id: int, user_id: int):
+        """
+        Execute a scheduled post once the fair-share executor grants its user a slot.
+        """
+        async with self.executor.slot(user_id):
+            await self._run_scheduled_post(schedule_id, user_id)
+    
+    async def _run_scheduled_post(self, schedule_id: int, user_id: int):
         """
         Execute a scheduled post - generate content and post to platform.
         """
+        SCHEDULED_POSTS_IN_PROGRESS.inc()
+        trace = ExecutionTrace()
         db = SessionLocal()
         try:
             schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
@@ -101,61 +489,122 @@ class PostScheduler:
                 logger.error(f"No active social account for user {user_id} on {schedule.platform}")
                 return
             
-            # Gather context for content generation
-            knowledge_base = []
-            if schedule.use_knowledge_base:
-                kb_docs = db.query(KnowledgeDoc).filter(
-                    KnowledgeDoc.user_id == user_id,
-                    KnowledgeDoc.is_active == True
-                ).limit(3).all()
-                knowledge_base = [doc.content for doc in kb_docs]
-            
-            trending_topics = []
-            if schedule.use_trending_data:
-                trends = await self.scraper.get_trending_topics()
-                trending_topics = [f"{t['topic']}: {t['description']}" for t in trends[:3]]
-            
-            # Generate content
-            content = await self.ai_generator.generate_post(
-                platform=schedule.platform.value,
-                knowledge_base=knowledge_base,
-                trending_topics=trending_topics,
-                custom_prompt=schedule.content_template
-            )
-            
-            # Create post record
-            post = Post(
-                user_id=user_id,
-                social_account_id=social_account.id,
-                content=content,
-                platform=schedule.platform,
-                status=PostStatus.SCHEDULED,
-                ai_generated=True,
-                generation_prompt=f"Auto-generated from schedule {schedule.name}",
-                scheduled_at=datetime.utcnow()
-            )
-            db.add(post)
-            db.commit()
-            db.refresh(post)
+            # Use the draft pre-generated by the batch job for this slot, if any
+            post = batch_pregenerator.claim_draft(schedule, social_account, db)
+            if post:
+                trace.record_usage(self.ai_generator.model, None, PATH_BATCH)
+            else:
+                post = await self._generate_post(schedule, social_account, trace, db)
+                if post is None:
+                    return
             
             # Post to platform
-            await self._post_to_platform(post, social_account, db)
+            with trace.span(STAGE_PLATFORM_PUBLISH):
+                await self._post_to_platform(post, social_account, db)
             
-            # Update schedule last_run
+            # Update schedule last_run and persist the execution trace
             schedule.last_run = datetime.utcnow()
+            post.execution_ms = int(trace.total_ms)
+            post.execution_trace = trace.to_dict()
             db.commit()
             
-            logger.info(f"Successfully executed scheduled post {post.id} for user {user_id}")
+            logger.info(f"Successfully executed scheduled post {post.id} for user {user_id} in {trace.summary()}")
         except Exception as e:
-            logger.error(f"Failed to execute scheduled post: {e}")
+            logger.error(f"Failed to execute scheduled post for schedule {schedule_id} after {trace.summary()}: {e}")
         finally:
             db.close()
+            SCHEDULED_POSTS_IN_PROGRESS.dec()
+    
+    async def _generate_post(
+        self,
+        schedule: Schedule,
+        social_account: SocialAccount,
+        trace: ExecutionTrace,
+        db: Session
+    ) -> Optional[Post]:
+        """
+        Generate content for a schedule slot and store it as a scheduled post.
+        
+        Returns None when no non-duplicate content could be generated.
+        """
+        # Gather context for content generation
+        knowledge_base = []
+        if schedule.use_knowledge_base:
+            with trace.span(STAGE_KB_QUERY):
+                kb_docs = db.query(KnowledgeDoc).filter(
+                    KnowledgeDoc.user_id == schedule.user_id,
+                    KnowledgeDoc.is_active == True
+                ).limit(3).all()
+            knowledge_base = [doc.content for doc in kb_docs]
+        
+        trending_topics = []
+        if schedule.use_trending_data:
+            with trace.span(STAGE_TRENDS_FETCH):
+                trending_topics = await trend_matcher.topics_for(schedule.user_id, schedule.user.knowledge_version)
+        
+        # Generate content, regenerating if it repeats a past post
+        custom_prompt = schedule.content_template
+        for attempt in range(DEDUP_MAX_REGENERATIONS + 1):
+            with trace.span(STAGE_LLM_GENERATION):
+                content = await self.ai_generator.generate_post(
+                    platform=schedule.platform.value,
+                    knowledge_base=knowledge_base,
+                    trending_topics=trending_topics,
+                    custom_prompt=custom_prompt,
+                    trace=trace
+                )
+            signature = content_signature(content)
+            duplicate_of = await duplicate_index.find_duplicate(social_account.id, signature)
+            if duplicate_of is None:
+                break
+            logger.warning(f"Generated content for schedule {schedule.id} duplicates post {duplicate_of} (attempt {attempt + 1})")
+            custom_prompt = "\n".join(filter(None, [
+                schedule.content_template,
+                f"Write something clearly different from this earlier post: {content}"
+            ]))
+        else:
+            logger.warning(f"Skipping schedule {schedule.id}: could not generate non-duplicate content")
+            return None
+        
+        # Create post record
+        post = Post(
+            user_id=schedule.user_id,
+            social_account_id=social_account.id,
+            schedule_id=schedule.id,
+            content=content,
+            content_signature=signature,
+            platform=schedule.platform,
+            status=PostStatus.SCHEDULED,
+            ai_generated=True,
+            generation_prompt=f"Auto-generated from schedule {schedule.name}",
+            scheduled_at=datetime.utcnow()
+        )
+        db.add(post)
+        db.commit()
+        db.refresh(post)
+        duplicate_index.add(post)
+        return post
     
     async def _post_to_platform(self, post: Post, social_account: SocialAccount, db: Session):
         """
         Post content to the appropriate platform.
+        
+        Content over the platform's length limit is trimmed or rewritten
+        first; what still doesn't fit, or now repeats a past post, fails here
+        without a publish call.
         """
         try:
+            content = await fit_for_platform(post.platform.value, post.content, self.ai_generator)
+            if content != post.content:
+                # Re-indexed under the new content, checked against every other post
+                duplicate_index.remove(post)
+                post.content = content
+                post.content_signature = content_signature(content)
+                duplicate_of = await duplicate_index.find_duplicate(post.social_account_id, post.content_signature)
+                if duplicate_of is not None:
+                    raise DuplicateContentError(f"Shortened content duplicates post {duplicate_of}")
+                duplicate_index.add(post)
+            
             if post.platform.value == "twitter":
                 client = TwitterClient(
                     access_token=social_account.access_token,
@@ -168,6 +617,7 @@ class PostScheduler:
                     post.posted_at = datetime.utcnow()
                     post.platform_post_id = result["tweet_id"]
                     post.platform_post_url = result["tweet_url"]
+                    post.metrics_next_at = next_collection_at(post.posted_at, post.posted_at)
                 else:
                     post.status = PostStatus.FAILED
                     post.error_message = result.get("error", "Unknown error")
@@ -185,6 +635,11 @@ class PostScheduler:
             post.error_message = str(e)
             db.commit()
             logger.error(f"Failed to post to {post.platform}: {e}")
+        finally:
+            if post.status == PostStatus.FAILED:
+                # Never published, so it shouldn't block similar content
+                duplicate_index.remove(post)
+            POSTS_TOTAL.labels(platform=post.platform.value, status=post.status.value).inc()
 
 # Global scheduler instance
 post_scheduler = PostScheduler()
@@ -1,106 +1,181 @@
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Dict
-from datetime import datetime, timedelta
+import asyncio
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+from datetime import datetime
+from app.services.trend_sources import trend_sources
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_MAX_BYTES = int(os.getenv("SCRAPER_MAX_BYTES", str(2 * 1024 * 1024)))
+SCRAPER_MAX_CONTENT_CHARS = 5000
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "2"))
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+CONTENT_TAGS = ("article", "main", "p")
+
+# Outermost article/main/p elements only, so a paragraph inside an article
+# is not counted twice.
+CONTENT_XPATH = "|".join(
+    f"//{tag}[not(ancestor::article or ancestor::main or ancestor::p)]"
+    for tag in CONTENT_TAGS
+)
+
+# BeautifulSoup is the fallback when lxml is unavailable; it's imported
+# where used to keep app startup fast.
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(max_workers=SCRAPER_WORKERS)
+    return _extraction_pool
+
+def _join_limited(texts, max_chars: int) -> str:
+    parts = []
+    length = 0
+    for text in texts:
+        text = " ".join(text.split())
+        if not text:
+            continue
+        parts.append(text)
+        length += len(text) + 1
+        if length >= max_chars:
+            break
+    return " ".join(parts)[:max_chars]
+
+def extract_html_content(body: bytes, encoding: Optional[str] = None, max_chars: int = SCRAPER_MAX_CONTENT_CHARS) -> Dict:
+    """
+    Extract the title and main text from an HTML document.
+    
+    CPU-bound, so it runs in the extraction worker pool rather than on the
+    event loop.
+    """
+    if lxml is not None:
+        parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+        doc = lxml.html.document_fromstring(body, parser=parser)
+        etree.strip_elements(doc, "script", "style", with_tail=False)
+        
+        title_text = (doc.findtext(".//title") or "").strip()
+        content = _join_limited(
+            (" ".join(el.itertext()) for el in doc.xpath(CONTENT_XPATH)), max_chars
+        )
+        return {"title": title_text, "content": content}
+    
+    from bs4 import BeautifulSoup, SoupStrainer
+    
+    # Only these tags are built into the parse tree, which skips most of
+    # the cost on large pages.
+    strainer = SoupStrainer(["title", *CONTENT_TAGS])
+    soup = BeautifulSoup(body, "html.parser", parse_only=strainer, from_encoding=encoding)
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    title = soup.find("title")
+    title_text = title.get_text().strip() if title else ""
+    
+    # The strainer keeps matched tags as top-level nodes with nested
+    # matches as their children, so the top level reads each paragraph once.
+    content = _join_limited(
+        (tag.get_text(" ") for tag in soup.find_all(list(CONTENT_TAGS), recursive=False)), max_chars
+    )
+    return {"title": title_text, "content": content}
 
 class WebScraper:
     async def get_trending_topics(self, sources: List[str] = None) -> List[Dict]:
         """
-        Scrape trending topics from various sources.
+        Trending topics from several sources, fetched concurrently.
         
         Args:
-            sources: List of sources to scrape (e.g., ["twitter", "google"])
+            sources: Registered trend source names (e.g., ["google", "hackernews"]);
+                defaults to TREND_SOURCES
         
         Returns:
-            List of trending topics with descriptions
+            Trends merged across sources, best first by normalized volume
         """
-        if sources is None:
-            sources = ["google"]
-        
-        all_trends = []
-        
-        for source in sources:
-            if source == "google":
-                trends = await self._scrape_google_trends()
-                all_trends.extend(trends)
-        
-        return all_trends
+        return await trend_sources.fetch(sources)
     
-    async def _scrape_google_trends(self) -> List[Dict]:
-        """
-        Scrape Google Trends daily trends.
-        """
-        try:
-            url = "https://trends.google.com/trends/trendingsearches/daily/rss?geo=US"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=10.0)
-                
-                if response.status_code != 200:
-                    return []
-                
-                soup = BeautifulSoup(response.content, "xml")
-                items = soup.find_all("item")
-                
-                trends = []
-                for item in items[:10]:  # Get top 10
-                    title = item.find("title").text if item.find("title") else ""
-                    description = item.find("description").text if item.find("description") else ""
-                    link = item.find("link").text if item.find("link") else ""
-                    
-                    # Extract traffic volume if available
-                    traffic = item.find("ht:approx_traffic")
-                    volume = int(traffic.text.replace("+", "").replace(",", "")) if traffic else 0
-                    
-                    trends.append({
-                        "platform": "google",
-                        "topic": title,
-                        "description": description,
-                        "url": link,
-                        "volume": volume,
-                        "scraped_at": datetime.utcnow(),
-                        "expires_at": datetime.utcnow() + timedelta(hours=24)
-                    })
-                
-                return trends
-        except Exception as e:
-            print(f"Google Trends scraping failed: {e}")
-            return []
-    
-    async def scrape_url_content(self, url: str) -> Dict:
+    async def scrape_url_content(
+        self,
+        url: str,
+        max_bytes: int = SCRAPER_MAX_BYTES,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> Dict:
         """
         Scrape content from a specific URL.
         Useful for users who want to extract content from articles/blogs.
+        
+        The body is streamed and reading stops at max_bytes, so oversized
+        pages never get buffered in full. Non-HTML responses are rejected
+        from their headers without reading the body. Pass a shared client
+        to reuse connections across many URLs.
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=10.0, follow_redirects=True)
-                
-                if response.status_code != 200:
-                    return {"error": "Failed to fetch URL"}
-                
-                soup = BeautifulSoup(response.content, "html.parser")
-                
-                # Remove script and style elements
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                
-                # Get title
-                title = soup.find("title")
-                title_text = title.text if title else ""
-                
-                # Get main content (try common article tags)
-                content_tags = soup.find_all(["article", "main", "p"])
-                content = " ".join([tag.get_text() for tag in content_tags])
-                
-                # Clean up whitespace
-                content = " ".join(content.split())
-                
-                return {
-                    "url": url,
-                    "title": title_text,
-                    "content": content[:5000],  # Limit to 5000 chars
-                    "scraped_at": datetime.utcnow().isoformat()
-                }
+            if client is None:
+                async with httpx.AsyncClient() as own_client:
+                    return await self._scrape_with_client(own_client, url, max_bytes)
+            return await self._scrape_with_client(client, url, max_bytes)
         except Exception as e:
             return {"error": str(e)}
+    
+    async def _scrape_with_client(self, client: httpx.AsyncClient, url: str, max_bytes: int) -> Dict:
+        started = time.perf_counter()
+        async with client.stream("GET", url, timeout=10.0, follow_redirects=True) as response:
+            if response.status_code != 200:
+                return {"error": "Failed to fetch URL"}
+            
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                return {"error": f"Unsupported content type: {content_type}"}
+            
+            chunks = []
+            received = 0
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= max_bytes:
+                    truncated = True
+                    break
+            
+            body = b"".join(chunks)[:max_bytes]
+            encoding = response.charset_encoding
+            final_url = str(response.url)
+        
+        fetched = time.perf_counter()
+        
+        loop = asyncio.get_running_loop()
+        extracted = await loop.run_in_executor(
+            _get_extraction_pool(), extract_html_content, body, encoding
+        )
+        
+        finished = time.perf_counter()
+        timings = {
+            "fetch_ms": round((fetched - started) * 1000, 1),
+            "extract_ms": round((finished - fetched) * 1000, 1),
+            "total_ms": round((finished - started) * 1000, 1)
+        }
+        logger.info(f"Scraped {url}: {len(body)} bytes, fetch {timings['fetch_ms']}ms, extract {timings['extract_ms']}ms")
+        
+        return {
+            "url": url,
+            "final_url": final_url,
+            "title": extracted["title"],
+            "content": extracted["content"],
+            "bytes": len(body),
+            "truncated": truncated,
+            "timings": timings,
+            "scraped_at": datetime.utcnow().isoformat()
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict
+from app.models.models import SocialAccount, SocialPlatform
+from app.integrations.tiktok import refresh_tiktok_token
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Twitter uses OAuth 1.0a tokens that don't expire, so only OAuth 2.0
+# platforms need a refresh function here.
+REFRESHERS = {
+    SocialPlatform.TIKTOK: refresh_tiktok_token,
+}
+
+TOKEN_REFRESH_INTERVAL_MINUTES = int(os.getenv("TOKEN_REFRESH_INTERVAL_MINUTES", "15"))
+TOKEN_REFRESH_LEAD_MINUTES = int(os.getenv("TOKEN_REFRESH_LEAD_MINUTES", "60"))
+TOKEN_REFRESH_BATCH_SIZE = int(os.getenv("TOKEN_REFRESH_BATCH_SIZE", "100"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "10"))
+
+class TokenRefresher:
+    def __init__(
+        self,
+        lead_minutes: int = TOKEN_REFRESH_LEAD_MINUTES,
+        batch_size: int = TOKEN_REFRESH_BATCH_SIZE,
+        concurrency: int = TOKEN_REFRESH_CONCURRENCY
+    ):
+        """
+        Refreshes OAuth tokens in the background before they expire.
+
+        The sweep runs every TOKEN_REFRESH_INTERVAL_MINUTES and picks up
+        every token expiring within lead_minutes, so as long as the lead is
+        larger than the interval a token is always renewed before the next
+        scheduled post needs it and publishing never refreshes inline.
+        """
+        self.lead = timedelta(minutes=lead_minutes)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def sweep(self) -> Dict:
+        """
+        Refresh all tokens expiring within the lead window, in batches.
+
+        Returns:
+            dict with refreshed and failed counts
+        """
+        refreshed = 0
+        failed = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        cutoff = datetime.utcnow() + self.lead
+        last_id = 0
+
+        while True:
+            db = SessionLocal()
+            try:
+                # Keyset pagination on id keeps each batch query cheap and
+                # skips accounts that failed earlier in this sweep.
+                accounts = db.query(SocialAccount).filter(
+                    SocialAccount.platform.in_(list(REFRESHERS.keys())),
+                    SocialAccount.is_active == True,
+                    SocialAccount.refresh_token.isnot(None),
+                    SocialAccount.token_expires_at.isnot(None),
+                    SocialAccount.token_expires_at <= cutoff,
+                    SocialAccount.id > last_id
+                ).order_by(SocialAccount.id).limit(self.batch_size).all()
+
+                if not accounts:
+                    break
+                last_id = accounts[-1].id
+
+                results = await asyncio.gather(
+                    *[self._refresh(account, semaphore) for account in accounts]
+                )
+
+                now = datetime.utcnow()
+                for account, result in zip(accounts, results):
+                    if "error" in result:
+                        failed += 1
+                        logger.error(f"Token refresh failed for social account {account.id}: {result['error']}")
+                        continue
+
+                    account.access_token = result["access_token"]
+                    if result.get("refresh_token"):
+                        account.refresh_token = result["refresh_token"]
+                    if result.get("expires_in"):
+                        account.token_expires_at = now + timedelta(seconds=int(result["expires_in"]))
+                    else:
+                        account.token_expires_at = None
+                    refreshed += 1
+
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Token refresh sweep failed: {e}")
+                break
+            finally:
+                db.close()
+
+            if len(accounts) < self.batch_size:
+                break
+
+        if refreshed or failed:
+            logger.info(f"Token refresh sweep: {refreshed} refreshed, {failed} failed")
+        return {"refreshed": refreshed, "failed": failed}
+
+    async def _refresh(self, account: SocialAccount, semaphore: asyncio.Semaphore) -> Dict:
+        """Refresh a single account's token, bounded by the shared semaphore."""
+        refresher = REFRESHERS[account.platform]
+        async with semaphore:
+            return await refresher(account.refresh_token)
+
+# Global token refresher instance
+token_refresher = TokenRefresher()
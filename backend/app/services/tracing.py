@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.services.metrics import PIPELINE_STAGE_SECONDS
+
+class ExecutionTrace:
+    def __init__(self):
+        """
+        Records timed spans and LLM token usage for one post execution.
+
+        Every span also feeds the per-stage latency histogram, so the
+        persisted trace and /metrics always agree.
+        """
+        self.started_at = datetime.utcnow()
+        self._start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.model: Optional[str] = None
+        self.llm_paths: List[str] = []
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a stage; repeated stages (e.g. regenerations) get one span each."""
+        offset = time.perf_counter() - self._start
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            PIPELINE_STAGE_SECONDS.labels(stage=name).observe(duration)
+            span = {
+                "name": name,
+                "start_ms": round(offset * 1000, 1),
+                "duration_ms": round(duration * 1000, 1)
+            }
+            if error:
+                span["error"] = error
+            self.spans.append(span)
+
+    def record_usage(self, model: str, usage, path: Optional[str] = None) -> None:
+        """Add token usage from an OpenAI response's usage object."""
+        self.model = model
+        if path:
+            self.llm_paths.append(path)
+        if usage is None:
+            return
+        for key in self.usage:
+            self.usage[key] += getattr(usage, key, 0) or 0
+
+    @property
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 1)
+
+    def stage_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span["name"]] = round(totals.get(span["name"], 0) + span["duration_ms"], 1)
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "total_ms": self.total_ms,
+            "stages": self.stage_totals(),
+            "spans": self.spans,
+            "model": self.model,
+            "llm_paths": self.llm_paths,
+            "usage": self.usage
+        }
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {ms}ms" for name, ms in self.stage_totals().items())
+        return f"{self.total_ms}ms ({stages}; {self.usage['total_tokens']} tokens)"
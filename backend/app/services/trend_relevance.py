@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.database import SessionLocal
+from app.models.models import KnowledgeDoc, User
+from app.services.trend_sources import trend_sources
+
+logger = logging.getLogger(__name__)
+
+TREND_REFRESH_MINUTES = int(os.getenv("TREND_REFRESH_MINUTES", "30"))
+# After a failed refresh, reads wait this long before trying one themselves
+TREND_REFRESH_RETRY_SECONDS = int(os.getenv("TREND_REFRESH_RETRY_SECONDS", "60"))
+# Trends put into each generation prompt
+TREND_SHORTLIST_SIZE = int(os.getenv("TREND_SHORTLIST_SIZE", "3"))
+
+# Where a term appears in a trend decides how much a match counts
+TOPIC_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+MIN_TERM_LENGTH = 3
+TERM_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "the and for with from that this are was were has have had not but you your our their its "
+    "about into over after before more most new how why what when who will can all any out".split()
+)
+
+# Inverted index: term -> {trend position: weight of the term in that trend}
+TrendIndex = Dict[str, Dict[int, float]]
+
+def terms(text: str) -> List[str]:
+    return [
+        term for term in TERM_RE.findall(text.lower())
+        if len(term) >= MIN_TERM_LENGTH and term not in STOPWORDS and not term.isdigit()
+    ]
+
+def build_trend_index(trends: List[Dict]) -> TrendIndex:
+    """
+    Index trends by the terms of their topic and description.
+
+    Weights are scaled by inverse document frequency, so a term shared by
+    many current trends ("news", "update") counts for less than a rare one.
+    """
+    index: TrendIndex = defaultdict(dict)
+    for position, trend in enumerate(trends):
+        for term in terms(trend.get("description") or ""):
+            index[term][position] = DESCRIPTION_WEIGHT
+        for term in terms(trend.get("topic") or ""):
+            index[term][position] = TOPIC_WEIGHT
+    for postings in index.values():
+        idf = math.log(1 + len(trends) / len(postings))
+        for position in postings:
+            postings[position] *= idf
+    return dict(index)
+
+def knowledge_profile(docs: Iterable[Tuple[Optional[list], Optional[str]]]) -> Dict[str, float]:
+    """Term weights for one user from their documents' (keywords, category)."""
+    profile = Counter()
+    for keywords, category in docs:
+        if isinstance(keywords, list):
+            for keyword in keywords:
+                for term in terms(str(keyword)):
+                    profile[term] = max(profile[term], 1.0)
+        for term in terms(category or ""):
+            profile[term] = max(profile[term], CATEGORY_WEIGHT)
+    return dict(profile)
+
+def rank_for_profile(index: TrendIndex, profile: Dict[str, float], size: int) -> List[int]:
+    """
+    Positions of the `size` trends most relevant to a profile, best first.
+
+    Only the index postings of the profile's own terms are visited, so the
+    cost is independent of how many trends don't match. Equal relevance
+    keeps the trends' own ranking.
+    """
+    scores = Counter()
+    for term, weight in profile.items():
+        for position, trend_weight in index.get(term, {}).items():
+            scores[position] += weight * trend_weight
+    return sorted(scores, key=lambda position: (-scores[position], position))[:size]
+
+class TrendMatcher:
+    def __init__(self, shortlist_size: int = TREND_SHORTLIST_SIZE):
+        """
+        Precomputed, per-user shortlists of the current trends.
+
+        Each refresh fetches the trends once, indexes them by term, and scores
+        them against every user's knowledge base keywords and categories.
+        Generating a post then only reads the user's shortlist. A user whose
+        knowledge base changed since the refresh is rescored on their next
+        read. Users without keywords get the overall top trends; users with
+        keywords get only the trends that match them, possibly none.
+
+        Concurrent refreshes, such as the first reads after startup, share
+        one run.
+        """
+        self.shortlist_size = shortlist_size
+        self.trends: List[Dict] = []
+        self.index: TrendIndex = {}
+        # User id -> trend positions, best first; absent for users without keywords
+        self.shortlists: Dict[int, List[int]] = {}
+        # User id -> knowledge_version the shortlist was computed from
+        self.versions: Dict[int, int] = {}
+        self.refreshed_at: Optional[datetime] = None
+        self.failed_at: Optional[datetime] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> Dict:
+        """Fetch the trends and rebuild every user's shortlist, or join the refresh in progress."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh())
+            self._refreshing.add_done_callback(self._refresh_done)
+        return await asyncio.shield(self._refreshing)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshing = None
+
+    async def _refresh(self) -> Dict:
+        try:
+            trends = await trend_sources.fetch()
+            if not trends and self.trends:
+                # Every source failed; keep matching against the last trends until they recover
+                trends = self.trends
+            index = build_trend_index(trends)
+            shortlists, versions = await asyncio.to_thread(self._score_users, index)
+        except Exception:
+            self.failed_at = datetime.utcnow()
+            raise
+        # Swapped in together on the event loop, so readers never see a mix
+        self.trends, self.index, self.shortlists, self.versions = trends, index, shortlists, versions
+        self.refreshed_at = datetime.utcnow()
+        matched = sum(1 for shortlist in shortlists.values() if shortlist)
+        logger.info(f"Trend shortlists refreshed: {len(trends)} trends, {matched} of {len(shortlists)} users matched")
+        return {"trends": len(trends), "users": len(shortlists), "matched": matched}
+
+    async def topics_for(self, user_id: int, knowledge_version: Optional[int] = None) -> List[str]:
+        """
+        The user's shortlisted trends as prompt lines ("topic: description").
+
+        Pass the user's knowledge_version to pick up knowledge base edits made
+        since the last refresh; without it the precomputed shortlist is used as is.
+        Until a refresh succeeds, reads get no trends, and retry the refresh at
+        most every TREND_REFRESH_RETRY_SECONDS.
+        """
+        if self.refreshed_at is None and not self._failed_recently():
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Trend refresh failed: {e}")
+        if knowledge_version is not None and self.versions.get(user_id, 0) != knowledge_version:
+            docs = await asyncio.to_thread(self._load_knowledge, user_id)
+            # Ranked against whichever index is current once the docs are in
+            self._shortlist(self.shortlists, self.index, user_id, docs)
+            self.versions[user_id] = knowledge_version
+
+        positions = self.shortlists.get(user_id)
+        trends = self.trends
+        if positions is None:
+            selected = trends[:self.shortlist_size]
+        else:
+            selected = [trends[position] for position in positions if position < len(trends)]
+        return [f"{trend['topic']}: {trend['description']}" for trend in selected]
+
+    def _failed_recently(self) -> bool:
+        return self.failed_at is not None and (datetime.utcnow() - self.failed_at).total_seconds() < TREND_REFRESH_RETRY_SECONDS
+
+    def _score_users(self, index: TrendIndex) -> Tuple[Dict[int, List[int]], Dict[int, int]]:
+        """Shortlists for every user with keywords. Blocking; runs in a worker thread."""
+        shortlists: Dict[int, List[int]] = {}
+        db = SessionLocal()
+        try:
+            versions = dict(db.query(User.id, User.knowledge_version))
+            rows = db.query(KnowledgeDoc.user_id, KnowledgeDoc.keywords, KnowledgeDoc.category).filter(
+                KnowledgeDoc.is_active == True
+            ).order_by(KnowledgeDoc.user_id).yield_per(1000)
+            # Rows arrive grouped by user, so one profile is held at a time
+            current_user, docs = None, []
+            for user_id, keywords, category in rows:
+                if user_id != current_user:
+                    self._shortlist(shortlists, index, current_user, docs)
+                    current_user, docs = user_id, []
+                docs.append((keywords, category))
+            self._shortlist(shortlists, index, current_user, docs)
+        finally:
+            db.close()
+        return shortlists, versions
+
+    def _shortlist(self, shortlists: Dict[int, List[int]], index: TrendIndex, user_id: Optional[int], docs: List):
+        if user_id is None:
+            return
+        profile = knowledge_profile(docs)
+        if profile:
+            shortlists[user_id] = rank_for_profile(index, profile, self.shortlist_size)
+        else:
+            shortlists.pop(user_id, None)
+
+    def _load_knowledge(self, user_id: int) -> List[Tuple[Optional[list], Optional[str]]]:
+        db = SessionLocal()
+        try:
+            return db.query(KnowledgeDoc.keywords, KnowledgeDoc.category).filter(
+                KnowledgeDoc.user_id == user_id,
+                KnowledgeDoc.is_active == True
+            ).all()
+        finally:
+            db.close()
+
+# Global trend matcher instance
+trend_matcher = TrendMatcher()
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import httpx
+from app.services.circuit_breaker import circuit_breakers, http_check
+from app.services.feed_parser import iter_feed_entries, parse_traffic, strip_html
+from app.services.metrics import TREND_SOURCE_FETCHES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated source names fetched when callers don't name any
+TREND_SOURCES = [name.strip() for name in os.getenv("TREND_SOURCES", "google").split(",") if name.strip()]
+GOOGLE_TRENDS_RSS_URL = os.getenv(
+    "GOOGLE_TRENDS_RSS_URL",
+    "https://trends.google.com/trends/trendingsearches/daily/rss?geo=US"
+)
+REDDIT_RSS_URL = os.getenv("REDDIT_RSS_URL", "https://www.reddit.com/r/popular/.rss")
+HACKER_NEWS_URL = os.getenv("HACKER_NEWS_URL", "https://hn.algolia.com/api/v1/search?tags=front_page&hitsPerPage=30")
+# Extra RSS/Atom feeds as "name=url,..."; each becomes a source of that name
+TREND_FEEDS = os.getenv("TREND_FEEDS", "")
+# Each source gets this long; whatever has arrived by then is returned
+TREND_SOURCE_DEADLINE_SECONDS = float(os.getenv("TREND_SOURCE_DEADLINE_SECONDS", "3"))
+TREND_SOURCE_MAX_ITEMS = int(os.getenv("TREND_SOURCE_MAX_ITEMS", "20"))
+TREND_TTL = timedelta(hours=24)
+# Reddit rejects requests without a descriptive User-Agent
+TREND_USER_AGENT = "posting-agent/1.0 (trend aggregation)"
+MAX_DESCRIPTION_CHARS = 300
+
+def _trend(source: str, topic: str, description: str, url: str, volume: Optional[int]) -> Dict:
+    now = datetime.utcnow()
+    return {
+        "platform": source,
+        "topic": topic.strip(),
+        "description": " ".join(description.split())[:MAX_DESCRIPTION_CHARS],
+        "url": url,
+        "volume": volume,
+        "scraped_at": now,
+        "expires_at": now + TREND_TTL
+    }
+
+def parse_feed(source: str, body: bytes) -> List[Dict]:
+    """
+    Any RSS 2.0 or Atom feed, parsed incrementally up to TREND_SOURCE_MAX_ITEMS entries.
+
+    Google Trends' approximate traffic becomes the volume; other feeds carry
+    none, so their entries rank by position.
+    """
+    return [
+        _trend(source, entry["title"], strip_html(entry["summary"]), entry["link"], parse_traffic(entry["traffic"]))
+        for entry in iter_feed_entries(body, limit=TREND_SOURCE_MAX_ITEMS)
+    ]
+
+def parse_hacker_news(source: str, body: bytes) -> List[Dict]:
+    """Hacker News front page from the Algolia search API; volume is the story's points."""
+    trends = []
+    for hit in json.loads(body).get("hits", [])[:TREND_SOURCE_MAX_ITEMS]:
+        trends.append(_trend(
+            source,
+            hit.get("title") or "",
+            f"{hit.get('points') or 0} points, {hit.get('num_comments') or 0} comments on Hacker News",
+            hit.get("url") or f"https://news.ycombinator.com/item?id={hit.get('objectID')}",
+            hit.get("points") or 0
+        ))
+    return trends
+
+class TrendSource:
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        parse: Callable[[str, bytes], List[Dict]],
+        deadline_seconds: float = TREND_SOURCE_DEADLINE_SECONDS
+    ):
+        """
+        One place trends come from, with its own parser, deadline and circuit breaker.
+
+        Fetches are conditional: the source's last ETag and Last-Modified are
+        sent back, and a 304 reuses the trends parsed last time instead of
+        downloading and parsing the feed again.
+        """
+        self.name = name
+        self.url = url
+        self.parse = parse
+        self.deadline_seconds = deadline_seconds
+        self.breaker = circuit_breakers.register(
+            f"{name}_trends", lambda: http_check(url), slow_call_seconds=deadline_seconds
+        )
+        # Validators and trends of the last successful parse
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.cached: List[Dict] = []
+
+    def _conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    async def fetch(self, client: httpx.AsyncClient) -> List[Dict]:
+        """
+        Fetch and parse the source's trends within its deadline.
+
+        Any failure returns no trends, so one bad source never fails the
+        others; while the breaker is open it returns without a request.
+        """
+        if not self.breaker.allow():
+            return []
+
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                client.get(self.url, headers=self._conditional_headers(), timeout=self.deadline_seconds),
+                self.deadline_seconds
+            )
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self.breaker.record(False, time.perf_counter() - started, "deadline exceeded")
+            TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="timeout").inc()
+            logger.warning(f"Trend source {self.name} missed its {self.deadline_seconds}s deadline")
+            return []
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started, str(e))
+            TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="error").inc()
+            logger.warning(f"Trend source {self.name} failed: {e}")
+            return []
+        self.breaker.record(response.status_code < 500, time.perf_counter() - started, f"HTTP {response.status_code}")
+
+        if response.status_code == 304 and self.cached:
+            TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="not_modified").inc()
+            now = datetime.utcnow()
+            return [{**trend, "scraped_at": now, "expires_at": now + TREND_TTL} for trend in self.cached]
+        if response.status_code != 200:
+            TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="error").inc()
+            logger.warning(f"Trend source {self.name} returned HTTP {response.status_code}")
+            return []
+        try:
+            trends = self.parse(self.name, response.content)[:TREND_SOURCE_MAX_ITEMS]
+        except Exception as e:
+            TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="error").inc()
+            logger.error(f"Failed to parse trends from {self.name}: {e}")
+            return []
+
+        TREND_SOURCE_FETCHES_TOTAL.labels(source=self.name, outcome="ok").inc()
+        self.etag = response.headers.get("etag")
+        self.last_modified = response.headers.get("last-modified")
+        self.cached = trends
+        return trends
+
+def topic_key(topic: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive key for spotting the same topic twice."""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())
+
+def normalize_volumes(trends: List[Dict]) -> List[float]:
+    """
+    Score one source's trends in [0, 1]: volume relative to its largest, or
+    by position when the source reports no volumes (first = 1).
+    """
+    volumes = [trend["volume"] or 0 for trend in trends]
+    top = max(volumes, default=0)
+    if top > 0:
+        return [volume / top for volume in volumes]
+    return [1 - index / len(trends) for index in range(len(trends))]
+
+def merge_trends(results: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge every source's trends into one list ranked by normalized volume.
+
+    The same topic from several sources becomes one trend that keeps the
+    best-scoring source's details, scores the sum of its sources' scores,
+    and lists them all in `sources`.
+    """
+    merged: Dict[str, Dict] = {}
+    for trends in results:
+        for trend, score in zip(trends, normalize_volumes(trends)):
+            key = topic_key(trend["topic"])
+            if not key:
+                continue
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = {**trend, "score": score, "sources": [trend["platform"]], "_best": score}
+                continue
+            if trend["platform"] not in existing["sources"]:
+                existing["sources"].append(trend["platform"])
+                existing["score"] += score
+            if score > existing["_best"]:
+                existing.update({field: trend[field] for field in ("platform", "topic", "description", "url", "volume")})
+                existing["_best"] = score
+
+    ranked = sorted(merged.values(), key=lambda trend: trend["score"], reverse=True)
+    for trend in ranked:
+        del trend["_best"]
+        trend["score"] = round(trend["score"], 4)
+    return ranked
+
+class TrendSourceRegistry:
+    def __init__(self):
+        """Trend sources by name; new kinds of source plug in through register()."""
+        self.sources: Dict[str, TrendSource] = {}
+
+    def register(self, source: TrendSource) -> TrendSource:
+        self.sources[source.name] = source
+        return source
+
+    async def fetch(self, names: Optional[List[str]] = None) -> List[Dict]:
+        """Fetch the named sources (default TREND_SOURCES) concurrently and merge what arrives in time."""
+        sources = []
+        for name in names or TREND_SOURCES:
+            if name in self.sources:
+                sources.append(self.sources[name])
+            else:
+                logger.warning(f"Unknown trend source: {name}")
+        if not sources:
+            return []
+
+        async with httpx.AsyncClient(headers={"User-Agent": TREND_USER_AGENT}, follow_redirects=True) as client:
+            results = await asyncio.gather(*[source.fetch(client) for source in sources])
+        return merge_trends(results)
+
+def _parse_feed_list(spec: str) -> Dict[str, str]:
+    """TREND_FEEDS as {name: url}. Runs at import, so malformed entries are skipped, not raised."""
+    feeds = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, url = item.partition("=")
+        if not name.strip() or not url.strip():
+            logger.warning(f"Ignoring TREND_FEEDS entry {item!r}: expected name=url")
+            continue
+        feeds[name.strip()] = url.strip()
+    return feeds
+
+# Global trend source registry instance
+trend_sources = TrendSourceRegistry()
+trend_sources.register(TrendSource("google", GOOGLE_TRENDS_RSS_URL, parse_feed))
+trend_sources.register(TrendSource("reddit", REDDIT_RSS_URL, parse_feed))
+trend_sources.register(TrendSource("hackernews", HACKER_NEWS_URL, parse_hacker_news))
+for feed_name, feed_url in _parse_feed_list(TREND_FEEDS).items():
+    trend_sources.register(TrendSource(feed_name, feed_url, parse_feed))
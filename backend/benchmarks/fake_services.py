@@ -0,0 +1,378 @@
+"""
+Local stand-ins for OpenAI (chat and batch), Twitter, TikTok and the trend sources.
+
+One FastAPI app serves every upstream the backend talks to, with injected
+latency and error rates, so load tests run fully offline:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+    TWITTER_API_BASE_URL=http://127.0.0.1:9100
+    TIKTOK_API_BASE_URL=http://127.0.0.1:9100/v2
+    GOOGLE_TRENDS_RSS_URL=http://127.0.0.1:9100/trends/rss
+    REDDIT_RSS_URL=http://127.0.0.1:9100/reddit/popular.rss
+    HACKER_NEWS_URL=http://127.0.0.1:9100/hn/front_page
+
+Run standalone with `python -m benchmarks.fake_services --port 9100`.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from typing import Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+WORDS = (
+    "growth launch team customers product insight data cloud coffee design "
+    "remote hiring tips story weekend focus habit learn build ship feedback "
+    "community event update news trend future simple quality"
+).split()
+# Wide enough that random posts don't trip the near-duplicate check
+VOCABULARY = [word + suffix for word in WORDS for suffix in ("", "s", "ing", "ed", "er", "ly", "ful", "ish")]
+
+@dataclass
+class ServiceProfile:
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+
+    async def apply(self):
+        """Sleep for a log-normally jittered latency; return an error response or None."""
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms * random.lognormvariate(0, 0.4) / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+        return None
+
+@dataclass
+class FakeConfig:
+    services: Dict[str, ServiceProfile] = field(default_factory=lambda: {
+        "openai": ServiceProfile(800, 0.0),
+        "twitter": ServiceProfile(150, 0.0),
+        "tiktok": ServiceProfile(150, 0.0),
+        "trends": ServiceProfile(200, 0.0),
+        "reddit": ServiceProfile(200, 0.0),
+        "hackernews": ServiceProfile(200, 0.0),
+    })
+    trend_items: int = 20
+    # Delay between streamed completion chunks, after the first one
+    token_interval_ms: float = 15.0
+    # Time from batch creation to completion
+    batch_completion_ms: float = 2000.0
+    # Tweet lookups allowed per 15-minute window before 429s; 0 for unlimited
+    tweet_lookup_limit: int = 0
+    # Share of looked-up tweets reported as deleted
+    deleted_tweet_rate: float = 0.0
+    # RSS/Atom feeds change this often and answer If-None-Match with 304 in
+    # between; 0 serves a new document every request
+    feed_update_seconds: float = 300.0
+
+def _sentence(words: int = 18) -> str:
+    return " ".join(random.choice(VOCABULARY) for _ in range(words))
+
+def _trends_rss(items: int) -> str:
+    entries = "".join(
+        f"""<item><title>Trend {i} {random.choice(WORDS)}</title>
+<ht:approx_traffic>{random.randint(1, 500) * 1000:,}+</ht:approx_traffic>
+<description>{_sentence(12)}</description><link>https://example.com/{i}</link></item>"""
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:ht="https://trends.google.com/trends/trendingsearches/daily">'
+        f"<channel><title>Daily Search Trends</title>{entries}</channel></rss>"
+    )
+
+def _reddit_atom(items: int) -> str:
+    entries = "".join(
+        f"""<entry><title>{random.choice(WORDS).title()} {_sentence(6)}</title>
+<link href="https://www.reddit.com/r/{random.choice(WORDS)}/comments/{i}/"/>
+<content type="html">&lt;p&gt;{_sentence(12)}&lt;/p&gt;</content><updated>2024-01-01T00:00:00+00:00</updated></entry>"""
+        for i in range(items)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>popular</title>{entries}</feed>'
+
+def _hacker_news(items: int) -> Dict:
+    return {"hits": [
+        {
+            "objectID": str(i),
+            "title": f"Show HN: {_sentence(6)}",
+            "url": f"https://example.com/hn/{i}",
+            "points": random.randint(10, 900),
+            "num_comments": random.randint(0, 400)
+        }
+        for i in range(items)
+    ]}
+
+def _completion(completion_id: str, model: str, text: str) -> Dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 180, "completion_tokens": 40, "total_tokens": 220}
+    }
+
+def _post_text() -> str:
+    return f"{_sentence()} #{random.choice(WORDS)} #{random.choice(WORDS)}"
+
+def _chunk_event(completion_id: str, model: str, delta: Dict, finish_reason) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+def create_fake_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake upstream services")
+    ids = itertools.count(1_000_000)
+    stats = {name: 0 for name in config.services}
+    app.state.config = config
+    app.state.stats = stats
+    # Feed name -> (version, document, Last-Modified)
+    feeds = {}
+
+    def _feed_response(name: str, request: Request, render, media_type: str) -> Response:
+        if config.feed_update_seconds:
+            version = int(time.time() // config.feed_update_seconds)
+        else:
+            version = next(ids)
+        if feeds.get(name, (None,))[0] != version:
+            feeds[name] = (version, render(config.trend_items), formatdate(usegmt=True))
+        _, document, last_modified = feeds[name]
+        headers = {"ETag": f'"{name}-{version}"', "Last-Modified": last_modified}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(document, media_type=media_type, headers=headers)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats["openai"] += 1
+        body = await request.json()
+        error = await config.services["openai"].apply()
+        if error:
+            return error
+        text = _post_text()
+        completion_id = f"chatcmpl-{next(ids)}"
+        model = body.get("model", "gpt-4o-mini")
+        if body.get("stream"):
+            return StreamingResponse(_stream_chunks(completion_id, model, text), media_type="text/event-stream")
+        return _completion(completion_id, model, text)
+
+    async def _stream_chunks(completion_id: str, model: str, text: str):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(config.token_interval_ms / 1000)
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield _chunk_event(completion_id, model, delta, None)
+        yield _chunk_event(completion_id, model, {}, "stop")
+        yield "data: [DONE]\n\n"
+
+    files: Dict[str, str] = {}
+    batches: Dict[str, Dict] = {}
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        form = await request.form()
+        content = (await form["file"].read()).decode()
+        file_id = f"file-{next(ids)}"
+        files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "purpose": form.get("purpose")}
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        stats["openai"] += 1
+        body = await request.json()
+        if body["input_file_id"] not in files:
+            return JSONResponse({"error": "unknown input file"}, status_code=404)
+        lines = [json.loads(line) for line in files[body["input_file_id"]].splitlines() if line.strip()]
+        batch = {
+            "id": f"batch_{next(ids)}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0}
+        }
+        batches[batch["id"]] = batch
+        asyncio.get_running_loop().call_later(config.batch_completion_ms / 1000, _finish_batch, batch, lines)
+        return batch
+
+    def _finish_batch(batch: Dict, lines):
+        profile = config.services["openai"]
+        output = []
+        for line in lines:
+            if profile.error_rate and random.random() < profile.error_rate:
+                response = {"status_code": 500, "body": {"error": {"message": "injected failure"}}}
+                batch["request_counts"]["failed"] += 1
+            else:
+                model = line["body"].get("model", "gpt-4o-mini")
+                response = {"status_code": 200, "body": _completion(f"chatcmpl-{next(ids)}", model, _post_text())}
+                batch["request_counts"]["completed"] += 1
+            output.append(json.dumps({"id": f"batch_req_{next(ids)}", "custom_id": line["custom_id"], "response": response, "error": None}))
+        file_id = f"file-{next(ids)}"
+        files[file_id] = "\n".join(output) + "\n"
+        batch["output_file_id"] = file_id
+        batch["status"] = "completed"
+
+    @app.get("/v1/batches/{batch_id}")
+    async def get_batch(batch_id: str):
+        if batch_id not in batches:
+            return JSONResponse({"error": "unknown batch"}, status_code=404)
+        return batches[batch_id]
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in files:
+            return JSONResponse({"error": "unknown file"}, status_code=404)
+        return Response(files[file_id], media_type="application/jsonl")
+
+    @app.post("/2/tweets")
+    async def create_tweet(request: Request):
+        stats["twitter"] += 1
+        body = await request.json()
+        error = await config.services["twitter"].apply()
+        if error:
+            return error
+        return JSONResponse({"data": {"id": str(next(ids)), "text": body.get("text", "")}}, status_code=201)
+
+    lookup_window = {"started": time.time(), "calls": 0}
+
+    @app.get("/2/tweets")
+    async def lookup_tweets(ids: str):
+        stats["twitter"] += 1
+        if config.tweet_lookup_limit:
+            if time.time() - lookup_window["started"] >= 900:
+                lookup_window.update(started=time.time(), calls=0)
+            lookup_window["calls"] += 1
+            if lookup_window["calls"] > config.tweet_lookup_limit:
+                reset = int(lookup_window["started"] + 900)
+                return JSONResponse(
+                    {"title": "Too Many Requests", "status": 429},
+                    status_code=429,
+                    headers={"x-rate-limit-limit": str(config.tweet_lookup_limit), "x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset)}
+                )
+        error = await config.services["twitter"].apply()
+        if error:
+            return error
+
+        data, errors = [], []
+        for tweet_id in ids.split(",")[:100]:
+            if config.deleted_tweet_rate and random.random() < config.deleted_tweet_rate:
+                errors.append({"value": tweet_id, "resource_id": tweet_id, "resource_type": "tweet", "title": "Not Found Error", "detail": f"Could not find tweet with ids: [{tweet_id}]."})
+                continue
+            impressions = random.randint(100, 50_000)
+            data.append({
+                "id": tweet_id,
+                "text": _sentence(),
+                "edit_history_tweet_ids": [tweet_id],
+                "public_metrics": {
+                    "impression_count": impressions,
+                    "like_count": impressions // random.randint(20, 100),
+                    "reply_count": impressions // random.randint(200, 1000),
+                    "retweet_count": impressions // random.randint(100, 500),
+                    "quote_count": impressions // random.randint(500, 2000),
+                    "bookmark_count": impressions // random.randint(200, 1000)
+                }
+            })
+        body = {"data": data} if data else {}
+        if errors:
+            body["errors"] = errors
+        return body
+
+    @app.get("/2/users/me")
+    async def twitter_me():
+        stats["twitter"] += 1
+        error = await config.services["twitter"].apply()
+        if error:
+            return error
+        return {"data": {"id": "1", "name": "Bench", "username": "bench"}}
+
+    @app.post("/v2/oauth/token/")
+    async def tiktok_token():
+        stats["tiktok"] += 1
+        error = await config.services["tiktok"].apply()
+        if error:
+            return error
+        return {
+            "access_token": f"act.{next(ids)}",
+            "refresh_token": f"rft.{next(ids)}",
+            "expires_in": 86400,
+            "token_type": "Bearer"
+        }
+
+    @app.post("/v2/post/publish/video/init/")
+    async def tiktok_publish():
+        stats["tiktok"] += 1
+        error = await config.services["tiktok"].apply()
+        if error:
+            return error
+        return {"data": {"publish_id": str(next(ids)), "upload_url": "http://127.0.0.1/upload"}}
+
+    @app.get("/trends/rss")
+    async def trends_rss(request: Request):
+        stats["trends"] += 1
+        error = await config.services["trends"].apply()
+        if error:
+            return error
+        return _feed_response("trends", request, _trends_rss, "application/rss+xml")
+
+    @app.get("/reddit/popular.rss")
+    async def reddit_popular(request: Request):
+        stats["reddit"] += 1
+        error = await config.services["reddit"].apply()
+        if error:
+            return error
+        return _feed_response("reddit", request, _reddit_atom, "application/atom+xml")
+
+    @app.get("/hn/front_page")
+    async def hacker_news_front_page():
+        stats["hackernews"] += 1
+        error = await config.services["hackernews"].apply()
+        if error:
+            return error
+        return _hacker_news(config.trend_items)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def add_service_arguments(parser: argparse.ArgumentParser):
+    defaults = FakeConfig().services
+    for name, profile in defaults.items():
+        parser.add_argument(f"--{name}-latency-ms", type=float, default=profile.latency_ms)
+        parser.add_argument(f"--{name}-error-rate", type=float, default=profile.error_rate)
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    config = FakeConfig()
+    for name, profile in config.services.items():
+        profile.latency_ms = getattr(args, f"{name}_latency_ms")
+        profile.error_rate = getattr(args, f"{name}_error_rate")
+    return config
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_service_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_fake_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
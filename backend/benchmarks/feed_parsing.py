@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for the RSS/Atom trend feed parser.
+
+Times the incremental parser in app.services.feed_parser against the
+BeautifulSoup "xml" parsing it replaced, on generated Google Trends RSS and
+Atom feeds of increasing size. Reported times are for the whole feed and
+for the first TREND_SOURCE_MAX_ITEMS entries, which is what a fetch uses:
+
+    python -m benchmarks.feed_parsing --items 20 1000 10000
+
+Exits non-zero if the two parsers disagree on a feed's entries.
+"""
+import argparse
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+from app.services.feed_parser import iter_feed_entries
+from app.services.trend_sources import TREND_SOURCE_MAX_ITEMS
+from benchmarks.fake_services import _reddit_atom, _trends_rss
+
+FEEDS = {"rss": _trends_rss, "atom": _reddit_atom}
+
+def parse_with_soup(body: bytes, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    """The previous parser: a full BeautifulSoup tree, then find() per field."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(body, "xml")
+    entries = []
+    for entry in soup.find_all(["item", "entry"], limit=limit):
+        link = entry.find("link")
+        summary = entry.find("description") or entry.find("summary") or entry.find("content")
+        entries.append((
+            entry.find("title").text if entry.find("title") else "",
+            (link.get("href") or link.text).strip() if link else ""
+        ))
+        # Read like the old parser did, so it isn't timed for less work
+        summary.text if summary else ""
+        entry.find("ht:approx_traffic") or entry.find("approx_traffic")
+    return entries
+
+def parse_incrementally(body: bytes, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    return [(entry["title"], entry["link"]) for entry in iter_feed_entries(body, limit=limit)]
+
+def best_ms(parse: Callable, body: bytes, limit: Optional[int], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        parse(body, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 1000, 10000], help="Entries per generated feed")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement; the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'feed':<6}{'entries':>8}{'KiB':>9}{'soup all':>11}{'iter all':>11}"
+          f"{'soup first':>12}{'iter first':>12}{'speedup':>9}")
+    speedups = []
+    for kind, render in FEEDS.items():
+        for items in args.items:
+            body = render(items).encode()
+            if parse_with_soup(body) != parse_incrementally(body):
+                print(f"{kind} feed with {items} entries: parsers disagree", file=sys.stderr)
+                return 1
+
+            runs = max(1, args.runs if items <= 1000 else args.runs // 2)
+            soup_all = best_ms(parse_with_soup, body, None, runs)
+            iter_all = best_ms(parse_incrementally, body, None, runs)
+            soup_first = best_ms(parse_with_soup, body, TREND_SOURCE_MAX_ITEMS, runs)
+            iter_first = best_ms(parse_incrementally, body, TREND_SOURCE_MAX_ITEMS, runs)
+            speedups.append(soup_first / iter_first)
+            print(f"{kind:<6}{items:>8}{len(body) / 1024:>9.0f}{soup_all:>9.2f}ms{iter_all:>9.2f}ms"
+                  f"{soup_first:>10.2f}ms{iter_first:>10.2f}ms{soup_first / iter_first:>8.0f}x")
+
+    print(f"Median speedup for the first {TREND_SOURCE_MAX_ITEMS} entries: {statistics.median(speedups):.0f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
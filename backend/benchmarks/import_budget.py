@@ -0,0 +1,105 @@
+"""
+Import-time budget check for the API.
+
+Imports app.main in fresh interpreters and exits non-zero if the best run
+exceeds the budget, if integrations meant to load on first use were imported
+eagerly, or if importing touched the database:
+
+    python -m benchmarks.import_budget --budget-ms 3000
+
+On failure it prints the slowest modules from `python -X importtime`. The
+backend deploy workflow runs it before building the image. The default
+budget is about twice a local import today, so slower CI machines pass
+while a regression such as a heavy module loading eagerly does not.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+# Heavy integrations that must not load until first use
+DEFERRED_MODULES = ("openai", "tweepy", "bs4", "apscheduler")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "eager": [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+}}))
+"""
+
+IMPORTTIME_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)")
+
+def _env(database_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "OPENAI_API_KEY": "budget",
+    })
+    return env
+
+def _backend_dir() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(database_path: str) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=_backend_dir(), env=_env(database_path), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def slowest_imports(database_path: str, top: int) -> List[Tuple[int, str]]:
+    """Top-level-ish modules by cumulative import time, in microseconds."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=_backend_dir(), env=_env(database_path), capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        # Only modules imported directly or one level down, to avoid listing a chain twice
+        if match and len(match.group(2)) <= 3:
+            modules.append((int(match.group(1)), match.group(3)))
+    return sorted(modules, reverse=True)[:top]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "3000")))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time; the best run is compared")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list on failure")
+    args = parser.parse_args(argv)
+
+    database_path = os.path.join(tempfile.mkdtemp(), "budget.db")
+    runs = [measure(database_path) for _ in range(args.runs)]
+    best = min(run["ms"] for run in runs)
+    eager = sorted({name for run in runs for name in run["eager"]})
+
+    failures = []
+    if best > args.budget_ms:
+        failures.append(f"import took {best:.0f}ms, budget is {args.budget_ms:.0f}ms")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if os.path.exists(database_path):
+        failures.append("importing app.main touched the database")
+
+    print(f"import app.main: best {best:.0f}ms of {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    if not failures:
+        print("OK")
+        return 0
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("Slowest imports:")
+    for micros, name in slowest_imports(database_path, args.top):
+        print(f"  {micros / 1000:8.1f}ms  {name}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
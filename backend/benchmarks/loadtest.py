@@ -0,0 +1,380 @@
+"""
+Offline load test for the Posting Agent API.
+
+Starts the fake upstreams and the FastAPI app in-process on local ports,
+then drives three scenarios and reports throughput, p50/p99 latency and
+event-loop lag of the app:
+
+  dashboard  - virtual users polling GET /api/posts
+  generate   - a burst of concurrent POST /api/posts/generate
+  schedules  - N scheduled posts all firing in the same minute; with
+               --big-tenant-share, one user owns that share of them and
+               big/small tenants get end-to-end latency rows of their own
+
+Run from backend/:
+
+    python -m benchmarks.loadtest --schedules 2000 --openai-latency-ms 800
+
+Defaults to a throwaway SQLite database; pass --database-url to test
+against Postgres. Use --json to get machine-readable output for CI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_services import add_service_arguments, config_from_args, create_fake_app
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class ServerThread:
+    def __init__(self, app, port: int):
+        """Runs a uvicorn server on its own event loop in a background thread."""
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+    def submit(self, coro):
+        """Run a coroutine on the server's loop and return a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05):
+        """Samples how late the app's event loop wakes up from a short sleep."""
+        self.interval = interval
+        self.samples: List[float] = []
+        self.running = False
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def take(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+class Recorder:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    async def call(self, client: httpx.AsyncClient, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                self.errors += 1
+        except httpx.HTTPError:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - started)
+
+    def report(self, lag: List[float]) -> Dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            "scenario": self.name,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(len(self.latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(_percentile(self.latencies, 50) * 1000, 1),
+            "p99_ms": round(_percentile(self.latencies, 99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0) * 1000, 1),
+            "loop_lag_p50_ms": round(_percentile(lag, 50) * 1000, 1),
+            "loop_lag_p99_ms": round(_percentile(lag, 99) * 1000, 1),
+            "loop_lag_max_ms": round(max(lag, default=0) * 1000, 1),
+        }
+
+def _wait_ready(base: str, timeout: float = 30.0):
+    """Block until /ready reports the app initialized (schema created, scheduler running)."""
+    deadline = time.perf_counter() + timeout
+    while httpx.get(f"{base}/ready").status_code != 200:
+        if time.perf_counter() > deadline:
+            raise RuntimeError("App did not become ready")
+        time.sleep(0.1)
+
+async def _register(client: httpx.AsyncClient, base: str, index: int) -> Dict:
+    response = await client.post(f"{base}/api/auth/register", json={
+        "email": f"bench{index}@example.com",
+        "username": f"bench{index}",
+        "password": "benchmark"
+    })
+    response.raise_for_status()
+    return response.json()
+
+def _schedule_owner(user_ids: List[int], index: int, schedules: int, big_tenant_share: float) -> int:
+    """The first user owns `big_tenant_share` of the schedules; the rest are spread round-robin."""
+    big = int(schedules * big_tenant_share)
+    if index < big or len(user_ids) == 1:
+        return user_ids[0]
+    others = user_ids[1:] if big else user_ids
+    return others[(index - big) % len(others)]
+
+def _seed(user_ids: List[int], posts_per_user: int, schedules: int, big_tenant_share: float = 0.0):
+    """Insert social accounts, posts and schedules directly for speed."""
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models.models import (
+        SocialAccount, SocialPlatform, Post, PostStatus, Schedule, FrequencyType, KnowledgeDoc
+    )
+    from benchmarks.fake_services import _sentence
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.execute(insert(SocialAccount), [
+            {"user_id": uid, "platform": SocialPlatform.TWITTER, "access_token": "bench", "refresh_token": "bench",
+             "is_active": True, "created_at": now}
+            for uid in user_ids
+        ])
+        db.execute(insert(KnowledgeDoc), [
+            {"user_id": uid, "title": f"Doc {i}", "content": _sentence(60), "keywords": [], "is_active": True,
+             "created_at": now}
+            for uid in user_ids for i in range(3)
+        ])
+        accounts = {row.user_id: row.id for row in db.query(SocialAccount.id, SocialAccount.user_id)}
+        db.execute(insert(Post), [
+            {"user_id": uid, "social_account_id": accounts[uid], "content": _sentence(), "platform": SocialPlatform.TWITTER,
+             "status": PostStatus.POSTED, "created_at": now - timedelta(minutes=i), "updated_at": now}
+            for uid in user_ids for i in range(posts_per_user)
+        ])
+        if schedules:
+            db.execute(insert(Schedule), [
+                {"user_id": _schedule_owner(user_ids, i, schedules, big_tenant_share), "name": f"Bench {i}", "platform": SocialPlatform.TWITTER,
+                 "frequency_type": FrequencyType.DAILY, "time_slots": ["09:00"], "is_active": True,
+                 "use_trending_data": True, "use_knowledge_base": True, "created_at": now}
+                for i in range(schedules)
+            ])
+        db.commit()
+        return [(row.id, row.user_id) for row in db.query(Schedule.id, Schedule.user_id)]
+    finally:
+        db.close()
+
+async def dashboard_scenario(base: str, tokens: List[str], users: int, duration: float, interval: float) -> Recorder:
+    recorder = Recorder("dashboard")
+    deadline = time.perf_counter() + duration
+
+    async def poller(token: str):
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            while time.perf_counter() < deadline:
+                await recorder.call(client, "GET", f"{base}/api/posts/", headers={"Authorization": f"Bearer {token}"})
+                await asyncio.sleep(interval)
+
+    await asyncio.gather(*[poller(tokens[i % len(tokens)]) for i in range(users)])
+    recorder.finished = time.perf_counter()
+    return recorder
+
+async def generate_scenario(base: str, tokens: List[str], burst: int) -> Recorder:
+    recorder = Recorder("generate")
+    limits = httpx.Limits(max_connections=burst)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        await asyncio.gather(*[
+            recorder.call(
+                client, "POST", f"{base}/api/posts/generate",
+                headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"},
+                json={"platform": "twitter"}
+            )
+            for i in range(burst)
+        ])
+    recorder.finished = time.perf_counter()
+    return recorder
+
+def schedules_scenario(app_server: ServerThread, schedules: List, timeout: float, big_user: Optional[int] = None) -> List[Recorder]:
+    """
+    Fire every schedule through APScheduler at the same instant and wait for the posts.
+
+    The main row times each execution once it holds a slot. With `big_user`,
+    extra rows time big- and small-tenant posts from the fire time to
+    publication, which includes waiting for a fair-share slot.
+    """
+    from app.database import SessionLocal
+    from app.models.models import Post
+    from app.services.scheduler import post_scheduler
+
+    recorder = Recorder("schedules")
+    run_at = datetime.now() + timedelta(seconds=2)
+    run_at_utc = datetime.utcnow() + (run_at - datetime.now())
+
+    async def enqueue():
+        for schedule_id, user_id in schedules:
+            post_scheduler.scheduler.add_job(
+                post_scheduler._execute_scheduled_post,
+                trigger="date",
+                run_date=run_at,
+                args=[schedule_id, user_id],
+                id=f"bench_{schedule_id}",
+                misfire_grace_time=None
+            )
+
+    app_server.submit(enqueue()).result()
+    recorder.started = time.perf_counter() + max(0.0, (run_at - datetime.now()).total_seconds())
+
+    db = SessionLocal()
+    try:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            done = db.query(Post).filter(Post.execution_ms.isnot(None)).count()
+            if done >= len(schedules):
+                break
+            time.sleep(0.5)
+        recorder.finished = time.perf_counter()
+        rows = db.query(Post.execution_ms, Post.status, Post.user_id, Post.posted_at).filter(Post.execution_ms.isnot(None)).all()
+        recorder.latencies = [row.execution_ms / 1000 for row in rows]
+        recorder.errors = len(schedules) - sum(1 for row in rows if row.status.value == "posted")
+    finally:
+        db.close()
+    if big_user is None:
+        return [recorder]
+
+    recorders = [recorder]
+    for name, is_big in (("schedules:big", True), ("schedules:small", False)):
+        tenant = Recorder(name)
+        tenant.started, tenant.finished = recorder.started, recorder.finished
+        expected = sum(1 for _, user_id in schedules if (user_id == big_user) == is_big)
+        tenant.latencies = [
+            (row.posted_at - run_at_utc).total_seconds()
+            for row in rows if (row.user_id == big_user) == is_big and row.posted_at
+        ]
+        tenant.errors = expected - len(tenant.latencies)
+        recorders.append(tenant)
+    return recorders
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the Posting Agent API")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--users", type=int, default=20, help="Registered users (tenants)")
+    parser.add_argument("--posts-per-user", type=int, default=200)
+    parser.add_argument("--pollers", type=int, default=50, help="Concurrent dashboard pollers")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--duration", type=float, default=20.0, help="Dashboard scenario duration (s)")
+    parser.add_argument("--generate-burst", type=int, default=50)
+    parser.add_argument("--schedules", type=int, default=1000, help="Schedules firing in the same minute")
+    parser.add_argument("--schedule-timeout", type=float, default=300.0)
+    parser.add_argument("--big-tenant-share", type=float, default=0.0, help="Share of schedules owned by a single user")
+    parser.add_argument("--scenarios", default="dashboard,generate,schedules")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    add_service_arguments(parser)
+    args = parser.parse_args(argv)
+
+    fake_port = _free_port()
+    app_port = _free_port()
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "TWITTER_API_KEY": "bench",
+        "TWITTER_API_SECRET": "bench",
+        "TWITTER_API_BASE_URL": f"http://127.0.0.1:{fake_port}",
+        "TIKTOK_API_BASE_URL": f"http://127.0.0.1:{fake_port}/v2",
+        "GOOGLE_TRENDS_RSS_URL": f"http://127.0.0.1:{fake_port}/trends/rss",
+        "REDDIT_RSS_URL": f"http://127.0.0.1:{fake_port}/reddit/popular.rss",
+        "HACKER_NEWS_URL": f"http://127.0.0.1:{fake_port}/hn/front_page",
+        "TREND_SOURCES": "google,reddit,hackernews",
+    })
+
+    fake_server = ServerThread(create_fake_app(config_from_args(args)), fake_port)
+    fake_server.start()
+
+    # Imported only now so the app picks up the environment above
+    from app.main import app
+    app_server = ServerThread(app, app_port)
+    app_server.start()
+    _wait_ready(f"http://127.0.0.1:{app_port}")
+
+    monitor = LoopLagMonitor()
+    app_server.submit(monitor.run())
+    base = f"http://127.0.0.1:{app_port}"
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    results = []
+
+    try:
+        async def register_all():
+            # Setup, not measurement: stay well inside the app's connection pool
+            limit = asyncio.Semaphore(5)
+
+            async def register(client: httpx.AsyncClient, index: int):
+                async with limit:
+                    return await _register(client, base, index)
+
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                return await asyncio.gather(*[register(client, i) for i in range(args.users)])
+
+        registered = asyncio.run(register_all())
+        tokens = [r["access_token"] for r in registered]
+        schedules = _seed(
+            [r["user"]["id"] for r in registered],
+            args.posts_per_user,
+            args.schedules if "schedules" in scenarios else 0,
+            args.big_tenant_share
+        )
+        big_user = registered[0]["user"]["id"] if args.big_tenant_share else None
+        monitor.take()
+
+        for name in scenarios:
+            if name == "dashboard":
+                recorders = [asyncio.run(dashboard_scenario(base, tokens, args.pollers, args.duration, args.poll_interval))]
+            elif name == "generate":
+                recorders = [asyncio.run(generate_scenario(base, tokens, args.generate_burst))]
+            elif name == "schedules":
+                recorders = schedules_scenario(app_server, schedules, args.schedule_timeout, big_user)
+            else:
+                print(f"Unknown scenario: {name}", file=sys.stderr)
+                return 2
+            lag = monitor.take()
+            results.extend(recorder.report(lag) for recorder in recorders)
+    finally:
+        monitor.running = False
+        app_server.stop()
+        fake_server.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        columns = list(results[0].keys()) if results else []
+        print("  ".join(f"{c:>16}" for c in columns))
+        for row in results:
+            print("  ".join(f"{str(row[c]):>16}" for c in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())